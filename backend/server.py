@@ -1,45 +1,467 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, WebSocket, WebSocketDisconnect
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, OperationFailure
 import os
+import atexit
+import copy
+import pstats
 import logging
+import logging.handlers
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict
 import uuid
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import jwt
-from passlib.context import CryptContext
 import random
-import string
+import secrets
+import socket
+import threading
 import asyncio
-from collections import defaultdict
+import cProfile
+import contextvars
+import hashlib
+import queue
+import re
+import time
+import zlib
+from bisect import bisect_left
+import gzip
+import json
+import orjson
+from collections import defaultdict, OrderedDict, deque
+from contextlib import contextmanager
+from functools import lru_cache, wraps
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Lightweight request tracing: spans kept in a ring buffer and optionally appended to a JSON-lines file
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', '0.01'))
+TRACE_BUFFER_SIZE = int(os.environ.get('TRACE_BUFFER_SIZE', '5000'))
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', '')
+TRACEPARENT_PATTERN = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "start", "start_perf", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[dict] = None):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.start = time.time()
+        self.start_perf = time.perf_counter()
+        self.attributes = attributes or {}
+
+    def context(self) -> dict:
+        """Trace context carried in websocket payloads so receivers can link back to this span"""
+        return {"trace_id": self.trace_id, "span_id": self.span_id}
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+class Tracer:
+    """
+    Spans only exist inside a sampled trace: without an active span, span() yields None and
+    records nothing. Finished spans go to a ring buffer served by /api/admin/traces and, with
+    TRACE_EXPORT_PATH set, to a JSON-lines file for offline analysis. The file is written by
+    the same kind of queued writer thread as the logs, never from the event loop.
+    """
+    def __init__(self, sample_rate: float, buffer_size: int, export_path: str):
+        self.sample_rate = sample_rate
+        self.spans = deque(maxlen=buffer_size)
+        self.export_path = export_path
+        self.export_handler = None
+        self.export_listener = None
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None) -> Optional[Span]:
+        """
+        Root span for an incoming request, continuing a W3C traceparent when one is sent.
+        A malformed header, or one with an all-zero id, is ignored in favour of local sampling.
+        """
+        match = TRACEPARENT_PATTERN.match(traceparent) if traceparent else None
+        if match and match.group(1).strip("0") and match.group(2).strip("0"):
+            if not int(match.group(3), 16) & 1:
+                return None
+            return Span(name, match.group(1), match.group(2))
+        if random.random() >= self.sample_rate:
+            return None
+        return Span(name, f"{random.getrandbits(128):032x}")
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        parent = current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        token = current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.attributes["error"] = str(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.finish(span)
+
+    def finish(self, span: Span, duration: Optional[float] = None):
+        if duration is None:
+            duration = time.perf_counter() - span.start_perf
+        record = {
+            "trace_id": span.trace_id,
+            "span_id": span.span_id,
+            "parent_id": span.parent_id,
+            "name": span.name,
+            "start": span.start,
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": span.attributes
+        }
+        self.spans.append(record)
+        if self.export_handler is not None:
+            self.export(record)
+
+    def record(self, name: str, parent: Span, duration: float, attributes: dict):
+        """Span for work timed elsewhere, such as a Mongo command reported by the driver"""
+        span = Span(name, parent.trace_id, parent.span_id, attributes)
+        span.start -= duration
+        self.finish(span, duration)
+
+    def start(self):
+        """Open the export file and start its writer thread; called at startup"""
+        if not self.export_path or self.export_listener is not None:
+            return
+        try:
+            file_handler = logging.FileHandler(self.export_path)
+        except OSError as e:
+            logger.error(f"Error opening trace export file: {str(e)}")
+            return
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self.export_handler, self.export_listener = build_log_pipeline(file_handler, burst=0)
+        self.export_listener.start()
+
+    def export(self, record: dict):
+        # Only serialization happens here; a full queue drops the span instead of waiting
+        line = orjson.dumps(record, default=str).decode()
+        self.export_handler.handle(logging.makeLogRecord({"name": "pulse.traces", "levelno": logging.INFO, "msg": line}))
+
+    def close(self):
+        if self.export_listener is not None:
+            self.export_listener.stop()
+            for handler in self.export_listener.handlers:
+                handler.close()
+            self.export_handler = self.export_listener = None
+
+    def get_trace(self, trace_id: str) -> List[dict]:
+        return sorted((s for s in list(self.spans) if s["trace_id"] == trace_id), key=lambda s: s["start"])
+
+    def recent_traces(self, limit: int = 50) -> List[dict]:
+        roots = [s for s in list(self.spans) if s["attributes"].get("root")]
+        return [
+            {"trace_id": s["trace_id"], "name": s["name"], "start": s["start"], "duration_ms": s["duration_ms"], "status": s["attributes"].get("status")}
+            for s in reversed(roots[-limit:])
+        ]
+
+tracer = Tracer(TRACE_SAMPLE_RATE, TRACE_BUFFER_SIZE, TRACE_EXPORT_PATH)
+
+def traced(name: str):
+    """Run an async function inside a child span of the current trace"""
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Records are queued by the caller and written by a background thread, so slow log I/O
+# never blocks the event loop; a full queue drops records instead of waiting
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # "json" or "text"
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', '10000'))
+LOG_SAMPLE_BURST = int(os.environ.get('LOG_SAMPLE_BURST', '20'))
+LOG_SAMPLE_WINDOW_SECONDS = float(os.environ.get('LOG_SAMPLE_WINDOW_SECONDS', '10'))
+
+# Correlation ids for the current request, set by RequestContextMiddleware and get_current_user
+log_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default=None)
+
+class LogContextFilter(logging.Filter):
+    """Copy correlation ids onto the record in the calling thread, before it is queued"""
+    def filter(self, record):
+        context = log_context.get()
+        record.request_id = context["request_id"] if context else None
+        record.couple_id = context.get("couple_id") if context else None
+        span = current_span.get()
+        record.trace_id = span.trace_id if span else None
+        return True
+
+class LogSampler(logging.Filter):
+    """
+    Pass the first `burst` records from each call site per window and drop the rest.
+    Messages are f-strings, so the call site rather than the text identifies a message.
+    The next record let through reports how many were suppressed.
+    """
+    def __init__(self, burst: int, window_seconds: float):
+        super().__init__()
+        self.burst = burst
+        self.window_seconds = window_seconds
+        self.sites: Dict[tuple, list] = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if self.burst <= 0:
+            return True
+        now = time.monotonic()
+        with self.lock:
+            site = self.sites.get((record.pathname, record.lineno))
+            if site is None:
+                site = self.sites[(record.pathname, record.lineno)] = [now, 0, 0]  # window start, passed, suppressed
+            if now - site[0] >= self.window_seconds:
+                site[0], site[1] = now, 0
+            if site[1] >= self.burst:
+                site[2] += 1
+                return False
+            site[1] += 1
+            record.suppressed, site[2] = site[2], 0
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Resolve the message and traceback here; formatting happens on the writer thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.utcfromtimestamp(record.created).isoformat(timespec="milliseconds") + "Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.msg
+        }
+        for key in ("request_id", "couple_id", "trace_id", "suppressed"):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def build_log_pipeline(handler: logging.Handler, queue_size: int = LOG_QUEUE_SIZE, burst: int = LOG_SAMPLE_BURST, window_seconds: float = LOG_SAMPLE_WINDOW_SECONDS):
+    """Queue handler for loggers plus the listener thread that drains it into `handler`"""
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    queue_handler.addFilter(LogSampler(burst, window_seconds))
+    queue_handler.addFilter(LogContextFilter())
+    listener = logging.handlers.QueueListener(queue_handler.queue, handler, respect_handler_level=True)
+    return queue_handler, listener
+
+def configure_logging():
+    stream_handler = logging.StreamHandler()
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    queue_handler, listener = build_log_pipeline(stream_handler)
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    listener.start()
+    atexit.register(listener.stop)
+    return queue_handler, listener
+
+log_queue_handler, log_listener = configure_logging()
 logger = logging.getLogger(__name__)
 
+# Mongo command monitoring: per-collection timings, query-shape stats and a slow-query log
+MONGO_COMMAND_MONITORING = os.environ.get('MONGO_COMMAND_MONITORING', 'true').lower() == 'true'
+MONGO_SLOW_QUERY_MS = float(os.environ.get('MONGO_SLOW_QUERY_MS', '100'))
+MONGO_SLOW_QUERY_LOG_SIZE = int(os.environ.get('MONGO_SLOW_QUERY_LOG_SIZE', '100'))
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# Commands that touch a collection; handshakes, pings and auth are not recorded
+MONITORED_COMMANDS = {"find", "getMore", "aggregate", "count", "distinct", "insert", "update", "delete", "findAndModify"}
+
+# Set per HTTP request by RequestMetricsMiddleware; Motor copies the context into its executor threads
+request_db_time: contextvars.ContextVar = contextvars.ContextVar("request_db_time", default=None)
+
+def query_shape(value):
+    """Replace literal values with "?" so queries differing only in values share a shape"""
+    if isinstance(value, dict):
+        return {key: query_shape(v) for key, v in value.items()}
+    if isinstance(value, list) and value and all(isinstance(v, dict) for v in value):
+        return [query_shape(v) for v in value]
+    return "?"
+
+def command_fingerprint(name: str, command) -> str:
+    if name == "find":
+        shape = query_shape(command.get("filter", {}))
+        sort = command.get("sort")
+        return f"find {json.dumps(shape)}" + (f" sort {json.dumps(dict(sort))}" if sort else "")
+    if name == "aggregate":
+        return f"aggregate {json.dumps([{stage: query_shape(spec) if stage == '$match' else '?' for stage, spec in s.items()} for s in command.get('pipeline', [])])}"
+    if name in ("update", "delete"):
+        statements = command.get(f"{name}s") or [{}]
+        return f"{name} {json.dumps(query_shape(statements[0].get('q', {})))}"
+    if name in ("count", "distinct", "findAndModify"):
+        return f"{name} {json.dumps(query_shape(command.get('query', {})))}"
+    return name
+
+def documents_returned(reply) -> int:
+    cursor = reply.get("cursor")
+    if cursor:
+        return len(cursor.get("firstBatch") or cursor.get("nextBatch") or [])
+    if "value" in reply:
+        return 1 if reply["value"] else 0
+    return reply.get("n", 0)
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """
+    Records every collection command issued through the client: a latency histogram and
+    document counts per (collection, command), totals per query shape, and the slowest
+    commands. Events arrive on Motor's executor threads, so aggregates are updated under a lock.
+    """
+    def __init__(self, slow_ms: float, slow_log_size: int):
+        self.slow_ms = slow_ms
+        self.lock = threading.Lock()
+        self.pending: Dict[tuple, tuple] = {}
+        self.operations: Dict[tuple, dict] = {}
+        self.shapes: Dict[tuple, dict] = {}
+        self.slow_queries = deque(maxlen=slow_log_size)
+
+    def started(self, event):
+        if event.command_name not in MONITORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get("collection") if event.command_name == "getMore" else command.get(event.command_name)
+        self.pending[(event.connection_id, event.request_id)] = (
+            str(collection),
+            command_fingerprint(event.command_name, command),
+            request_db_time.get(),
+            current_span.get()
+        )
+
+    def succeeded(self, event):
+        self._record(event, documents_returned(event.reply), failed=False)
+
+    def failed(self, event):
+        self._record(event, 0, failed=True)
+
+    def _record(self, event, documents: int, failed: bool):
+        pending = self.pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        collection, fingerprint, accumulator, parent_span = pending
+        seconds = event.duration_micros / 1_000_000
+        slow = seconds * 1000 >= self.slow_ms
+        if parent_span is not None:
+            attributes = {"shape": fingerprint, "documents": documents}
+            if failed:
+                attributes["error"] = str(event.failure)
+            tracer.record(f"mongo.{event.command_name} {collection}", parent_span, seconds, attributes)
+
+        with self.lock:
+            operation = self.operations.get((collection, event.command_name))
+            if operation is None:
+                operation = self.operations[(collection, event.command_name)] = {
+                    "counts": [0] * (len(MONGO_LATENCY_BUCKETS) + 1), "sum": 0.0, "count": 0, "documents": 0, "errors": 0, "slow": 0
+                }
+            operation["counts"][bisect_left(MONGO_LATENCY_BUCKETS, seconds)] += 1
+            operation["sum"] += seconds
+            operation["count"] += 1
+            operation["documents"] += documents
+            operation["errors"] += failed
+            operation["slow"] += slow
+
+            shape = self.shapes.get((collection, fingerprint))
+            if shape is None:
+                shape = self.shapes[(collection, fingerprint)] = {
+                    "collection": collection, "shape": fingerprint, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "documents": 0
+                }
+            shape["count"] += 1
+            shape["total_ms"] += seconds * 1000
+            shape["max_ms"] = max(shape["max_ms"], seconds * 1000)
+            shape["documents"] += documents
+
+            if accumulator is not None:
+                accumulator["seconds"] += seconds
+                accumulator["operations"] += 1
+
+        if slow:
+            path = accumulator["path"] if accumulator else None
+            self.slow_queries.append({
+                "collection": collection, "shape": fingerprint, "duration_ms": round(seconds * 1000, 2),
+                "documents": documents, "failed": failed, "path": path, "at": datetime.utcnow()
+            })
+            logger.warning(f"Slow Mongo {event.command_name} on {collection} took {seconds * 1000:.1f}ms ({documents} docs, path {path}): {fingerprint}")
+
+    def get_stats(self, top: int = 20) -> dict:
+        with self.lock:
+            shapes = sorted(self.shapes.values(), key=lambda s: s["total_ms"], reverse=True)[:top]
+            operations = {
+                f"{collection}.{name}": {
+                    "count": op["count"],
+                    "total_ms": round(op["sum"] * 1000, 2),
+                    "avg_ms": round(op["sum"] * 1000 / op["count"], 3) if op["count"] else 0.0,
+                    "documents": op["documents"],
+                    "errors": op["errors"],
+                    "slow": op["slow"]
+                }
+                for (collection, name), op in self.operations.items()
+            }
+            return {
+                "slow_query_ms": self.slow_ms,
+                "operations": operations,
+                "top_shapes": [{**s, "total_ms": round(s["total_ms"], 2), "max_ms": round(s["max_ms"], 2)} for s in shapes],
+                "slow_queries": list(self.slow_queries)
+            }
+
+mongo_monitor = MongoCommandMonitor(MONGO_SLOW_QUERY_MS, MONGO_SLOW_QUERY_LOG_SIZE)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '4'))
+MONGO_WARMUP_TIMEOUT_SECONDS = float(os.environ.get('MONGO_WARMUP_TIMEOUT_SECONDS', '5'))
+client = AsyncIOMotorClient(
+    mongo_url,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    event_listeners=[mongo_monitor] if MONGO_COMMAND_MONITORING else []
+)
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 SECRET_KEY = "your-secret-key-here"  # In production, use env variable
 ALGORITHM = "HS256"
@@ -71,18 +493,51 @@ class ConnectionManager:
                 user_ids.remove(user_id)
                 break
     
+    @staticmethod
+    def encode(message: dict) -> Optional[str]:
+        """
+        Encode outside the send's error handling: a payload that cannot be serialized is a bug
+        in the message, not a dead socket, so it is logged and dropped without disconnecting
+        """
+        try:
+            return encode_message(message)
+        except Exception as e:
+            logger.error(f"Error encoding {message.get('type')} message: {str(e)}")
+            return None
+    
+    async def send_to_user(self, user_id: str, message: dict):
+        if user_id in self.active_connections:
+            with tracer.span("ws.send_to_user", message_type=message.get("type")) as span:
+                if span is not None:
+                    message = {**message, "trace": span.context()}
+                payload = self.encode(message)
+                if payload is None:
+                    return
+                try:
+                    await self.active_connections[user_id].send_text(payload)
+                except Exception:
+                    self.disconnect(user_id)
+    
     async def send_to_partner(self, user_id: str, message: dict):
-        user = await db.users.find_one({"id": user_id})
-        if user and user.get("couple_id"):
-            couple_id = user["couple_id"]
-            partner_ids = [uid for uid in self.couple_connections[couple_id] if uid != user_id]
-            
-            for partner_id in partner_ids:
-                if partner_id in self.active_connections:
-                    try:
-                        await self.active_connections[partner_id].send_json(message)
-                    except:
-                        self.disconnect(partner_id)
+        with tracer.span("ws.send_to_partner", message_type=message.get("type")) as span:
+            user = await db.users.find_one({"id": user_id})
+            if user and user.get("couple_id"):
+                couple_id = user["couple_id"]
+                partner_ids = [uid for uid in self.couple_connections[couple_id] if uid != user_id]
+                if span is not None:
+                    span.attributes["recipients"] = sum(1 for uid in partner_ids if uid in self.active_connections)
+                    message = {**message, "trace": span.context()}
+                # Encoded once and shared by every partner connection
+                payload = self.encode(message)
+                if payload is None:
+                    return
+                
+                for partner_id in partner_ids:
+                    if partner_id in self.active_connections:
+                        try:
+                            await self.active_connections[partner_id].send_text(payload)
+                        except Exception:
+                            self.disconnect(partner_id)
 
 manager = ConnectionManager()
 
@@ -115,6 +570,12 @@ class Couple(BaseModel):
 class PairingRequest(BaseModel):
     pairing_code: str
 
+class PairingCode(BaseModel):
+    code: str
+    user_id: str
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime
+
 class Mood(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     couple_id: str
@@ -148,6 +609,8 @@ class Task(BaseModel):
     approved_at: Optional[datetime] = None
     tokens_earned: int = 5  # Default token reward per task
     approval_message: Optional[str] = None  # Message from approver
+    intensity: Optional[int] = None  # Mood settings of the suggestion the task came from, when known
+    is_extreme_mode: Optional[bool] = None
 
 class TaskCreate(BaseModel):
     title: str
@@ -155,6 +618,8 @@ class TaskCreate(BaseModel):
     reward: Optional[str] = None
     duration_minutes: int = 60
     tokens_earned: int = 5
+    intensity: Optional[int] = None
+    is_extreme_mode: Optional[bool] = None
 
 class TaskProof(BaseModel):
     proof_text: Optional[str] = None
@@ -192,6 +657,98 @@ class RewardCreate(BaseModel):
 class RewardRedeem(BaseModel):
     reward_id: str
 
+class AISuggestionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    couple_id: str
+    user_id: str
+    mood_id: str
+    mood_type: str
+    intensity: int
+    is_extreme_mode: bool = False
+    status: str = "pending"  # pending, ready
+    suggestion: Optional[dict] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    completed_at: Optional[datetime] = None
+
+# Response models; FastAPI serializes these with pydantic-core instead of jsonable_encoder
+class MessageResponse(BaseModel):
+    message: str
+
+class UserPublic(BaseModel):
+    id: str
+    email: str
+    name: str
+    couple_id: Optional[str] = None
+
+class AuthResponse(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    user: UserPublic
+
+class PairingCodeResponse(BaseModel):
+    pairing_code: str
+
+class PairingCodeGenerated(BaseModel):
+    pairing_code: str
+    message: str
+
+class PairingLinkResponse(BaseModel):
+    message: str
+    couple_id: str
+
+class MoodCreated(BaseModel):
+    mood: Mood
+    ai_suggestion: Optional[dict] = None
+    ai_suggestion_job_id: Optional[str] = None
+
+class TaskApprovalResponse(BaseModel):
+    message: str
+    tokens_awarded: Optional[int] = None
+
+class ActiveTask(Task):
+    time_remaining_minutes: int
+    is_expired: bool
+
+class TaskStatusResponse(BaseModel):
+    task: Task
+    time_remaining_minutes: int
+    is_expired: bool
+    can_submit_proof: bool
+    can_approve: bool
+
+class ExpiryCheckResponse(BaseModel):
+    expired_count: int
+
+class TokenBalance(BaseModel):
+    tokens: int
+    lifetime_tokens: int
+
+class CoupleTokenBalances(BaseModel):
+    your_tokens: int
+    partner_tokens: int
+    partner_name: str
+
+class RewardRedemption(BaseModel):
+    message: str
+    reward: Reward
+    tokens_spent: int
+    new_balance: int
+
+class AISuggestion(BaseModel):
+    title: str
+    description: str
+    default_duration_minutes: int
+    reused_task_id: Optional[str] = None
+    similarity: Optional[float] = None
+
+class HealthResponse(BaseModel):
+    status: str
+    timestamp: datetime
+
+def encode_message(message: dict) -> str:
+    """Serialize a websocket message once with orjson; datetimes come out as ISO 8601 like the HTTP responses"""
+    return orjson.dumps(message, default=lambda value: value.model_dump(mode="json") if isinstance(value, BaseModel) else str(value)).decode()
+
 # Helper functions
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -200,15 +757,87 @@ def create_access_token(data: dict):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+@lru_cache(maxsize=1)
+def get_pwd_context():
+    """bcrypt context, imported on first login or registration rather than at startup"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+async def insert_document(collection, model: BaseModel) -> dict:
+    """Insert `model` and return its dict; insert_one adds _id to what it is given, so it gets a copy"""
+    doc = model.dict()
+    await collection.insert_one({**doc})
+    return doc
+
+# Pairing codes live in their own collection, unique on code and user, expired by TTL
+PAIRING_CODE_LENGTH = 6
+PAIRING_CODE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"  # no 0/O or 1/I lookalikes
+PAIRING_CODE_TTL_SECONDS = int(os.environ.get('PAIRING_CODE_TTL_SECONDS', '86400'))
+PAIRING_CODE_MAX_ATTEMPTS = 10
+MONGO_TRANSACTIONS = os.environ.get('MONGO_TRANSACTIONS', 'true').lower() == 'true'
 
 def generate_pairing_code():
-    return ''.join(random.choices(string.digits, k=6))
+    return ''.join(secrets.choice(PAIRING_CODE_ALPHABET) for _ in range(PAIRING_CODE_LENGTH))
+
+def normalize_pairing_code(code: str) -> str:
+    return code.strip().upper()
 
+async def allocate_pairing_code(user_id: str, regenerate: bool = False) -> str:
+    """
+    Return the user's active pairing code, allocating a new one when there is none or when
+    `regenerate` is set. Collisions are rejected by the unique index on code and retried.
+    """
+    now = datetime.utcnow()
+    if not regenerate:
+        existing = await db.pairing_codes.find_one({"user_id": user_id, "expires_at": {"$gt": now}}, {"_id": 0, "code": 1})
+        if existing:
+            return existing["code"]
+    
+    for _ in range(PAIRING_CODE_MAX_ATTEMPTS):
+        pairing_code = PairingCode(
+            code=generate_pairing_code(),
+            user_id=user_id,
+            created_at=now,
+            expires_at=now + timedelta(seconds=PAIRING_CODE_TTL_SECONDS)
+        )
+        try:
+            await db.pairing_codes.update_one(
+                {"user_id": user_id},
+                {"$set": pairing_code.dict()},
+                upsert=True
+            )
+            return pairing_code.code
+        except DuplicateKeyError:
+            continue
+    
+    raise RuntimeError(f"Could not allocate a unique pairing code in {PAIRING_CODE_MAX_ATTEMPTS} attempts")
+
+async def run_in_transaction(operation):
+    """
+    Run `operation(session)` inside a multi-document transaction. Standalone mongod does not
+    support transactions, so there (or with MONGO_TRANSACTIONS=false) it runs with no session
+    and `operation` must compensate for partial writes itself.
+    """
+    global MONGO_TRANSACTIONS
+    if MONGO_TRANSACTIONS:
+        try:
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    return await operation(session)
+        except OperationFailure as e:
+            if e.code != 20:  # IllegalOperation: not a replica set member or mongos
+                raise
+            logger.warning("MongoDB does not support transactions here, falling back to compensating writes")
+            MONGO_TRANSACTIONS = False
+    return await operation(None)
+
+@traced("auth.get_current_user")
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
@@ -218,10 +847,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
+        context = log_context.get()
+        if context is not None:
+            context["couple_id"] = user.get("couple_id")
         return user
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
+async def require_admin_token(x_pulse_profile: Optional[str] = Header(None)):
+    """Diagnostics expose request paths and ids, so they need the PROFILING_ADMIN_TOKEN header"""
+    if not (PROFILING_ADMIN_TOKEN and x_pulse_profile and secrets.compare_digest(x_pulse_profile.encode(), PROFILING_ADMIN_TOKEN.encode())):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
 # Token management helper functions
 async def get_user_tokens(user_id: str, couple_id: str) -> int:
     """Get current token balance for a user"""
@@ -270,30 +907,679 @@ async def get_couple_tokens(couple_id: str) -> Dict[str, int]:
     
     return result
 
-# OpenAI integration for AI suggestions
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+# Two-tier AI suggestion cache: in-memory LRU in front of a Mongo collection with TTL
+SUGGESTION_CACHE_SIZE = int(os.environ.get('SUGGESTION_CACHE_SIZE', '1024'))
+SUGGESTION_CACHE_VARIANTS = int(os.environ.get('SUGGESTION_CACHE_VARIANTS', '5'))
+SUGGESTION_CACHE_TTL_SECONDS = int(os.environ.get('SUGGESTION_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
 
-# Enhanced AI suggestion function with mood-based context
-async def get_ai_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> dict:
+class SuggestionCache:
     """
-    Generate AI-powered HeatTask suggestions using OpenAI GPT-4o
-    Enhanced with mood-based context and extreme mode support
+    Caches LLM suggestions keyed by a normalized hash of mood, intensity, boundaries and extreme mode.
+    Each key holds up to `variants_per_key` distinct suggestions; a key is only served from cache
+    once that many have been generated for it, so the first requests still add variety from the LLM.
+    """
+    def __init__(self, max_keys: int, variants_per_key: int, ttl_seconds: int):
+        self.max_keys = max_keys
+        self.variants_per_key = variants_per_key
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0}
+    
+    @staticmethod
+    def make_key(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> str:
+        normalized = {
+            "mood_type": mood_type.strip().lower(),
+            "intensity": int(intensity),
+            "boundaries": sorted({b.strip().lower() for b in boundaries or [] if b and b.strip()}),
+            "is_extreme_mode": bool(is_extreme_mode)
+        }
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    
+    def _get_memory(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= datetime.utcnow():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry
+    
+    def _put_memory(self, key: str, variants: List[dict], generated: int, expires_at: datetime):
+        self.entries[key] = {"variants": variants, "generated": generated, "expires_at": expires_at}
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_keys:
+            self.entries.popitem(last=False)
+    
+    async def get(self, key: str, exclude=None) -> Optional[dict]:
+        """
+        Return a random cached variant for the key, or None when the key is not fully warm.
+        Variants matching the optional `exclude` predicate are skipped.
+        """
+        entry = self._get_memory(key)
+        source = "memory_hits"
+        
+        if entry is None:
+            source = "mongo_hits"
+            try:
+                doc = await db.ai_suggestion_cache.find_one(
+                    {"key": key, "expires_at": {"$gt": datetime.utcnow()}},
+                    {"_id": 0, "variants": 1, "generated": 1, "expires_at": 1}
+                )
+            except Exception as e:
+                logger.warning(f"Suggestion cache lookup failed: {str(e)}")
+                doc = None
+            
+            if doc:
+                # Entries written before suggestions were type-checked may hold unusable variants
+                variants = [v for v in map(clean_suggestion, doc["variants"]) if v is not None]
+                self._put_memory(key, variants, doc.get("generated", 0), doc["expires_at"])
+                entry = self.entries[key]
+        
+        variants = [v for v in entry["variants"] if not exclude(v)] if entry and exclude else (entry or {}).get("variants")
+        if entry and variants and entry["generated"] >= self.variants_per_key:
+            self.stats[source] += 1
+            return dict(random.choice(variants))
+        
+        self.stats["misses"] += 1
+        return None
+    
+    def missing_variants(self, key: str) -> int:
+        """How many more generated suggestions the key needs before it is served from cache"""
+        entry = self._get_memory(key)
+        return max(0, self.variants_per_key - (entry["generated"] if entry else 0))
+    
+    async def add(self, key: str, suggestion: dict):
+        """Store a freshly generated suggestion as another variant for the key"""
+        entry = self._get_memory(key)
+        if entry is None:
+            entry = {"variants": [], "generated": 0, "expires_at": datetime.utcnow() + timedelta(seconds=self.ttl_seconds)}
+        
+        # Repeated titles still count towards warming the key but are not stored twice
+        is_duplicate = any(v.get("title") == suggestion.get("title") for v in entry["variants"])
+        variants = entry["variants"] if is_duplicate else (entry["variants"] + [suggestion])[-self.variants_per_key:]
+        self._put_memory(key, variants, entry["generated"] + 1, entry["expires_at"])
+        self.stats["stores"] += 1
+        
+        update = {
+            "$inc": {"generated": 1},
+            "$setOnInsert": {"created_at": datetime.utcnow(), "expires_at": entry["expires_at"]}
+        }
+        if not is_duplicate:
+            update["$push"] = {"variants": {"$each": [suggestion], "$slice": -self.variants_per_key}}
+        
+        try:
+            await db.ai_suggestion_cache.update_one({"key": key}, update, upsert=True)
+        except Exception as e:
+            logger.warning(f"Suggestion cache store failed: {str(e)}")
+    
+    def get_stats(self) -> dict:
+        hits = self.stats["memory_hits"] + self.stats["mongo_hits"]
+        lookups = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_keys": len(self.entries),
+            "max_keys": self.max_keys,
+            "variants_per_key": self.variants_per_key,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+suggestion_cache = SuggestionCache(SUGGESTION_CACHE_SIZE, SUGGESTION_CACHE_VARIANTS, SUGGESTION_CACHE_TTL_SECONDS)
+
+# Global budget of concurrent LLM calls shared by request handlers and background refills
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '4'))
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+llm_in_flight = {"calls": 0}
+
+# Latency budget and circuit breaker for the LLM path
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '8'))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('LLM_QUEUE_TIMEOUT_SECONDS', '2'))
+LLM_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('LLM_BREAKER_FAILURE_THRESHOLD', '5'))
+LLM_BREAKER_RECOVERY_SECONDS = float(os.environ.get('LLM_BREAKER_RECOVERY_SECONDS', '30'))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with one series per label"""
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.series: Dict[str, dict] = {}
+    
+    def observe(self, label: str, seconds: float):
+        series = self.series.get(label)
+        if series is None:
+            series = self.series[label] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+        series["counts"][bisect_left(self.buckets, seconds)] += 1
+        series["sum"] += seconds
+        series["count"] += 1
+    
+    def _quantile(self, counts: List[int], total: int, q: float) -> Optional[float]:
+        rank = q * total
+        seen = 0
+        for i, n in enumerate(counts):
+            seen += n
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else None
+        return None
+    
+    def snapshot(self) -> dict:
+        result = {}
+        for label, series in self.series.items():
+            cumulative, running = {}, 0
+            for bound, n in zip(list(self.buckets) + ["+Inf"], series["counts"]):
+                running += n
+                cumulative[str(bound)] = running
+            result[label] = {
+                "count": series["count"],
+                "sum_seconds": round(series["sum"], 6),
+                "buckets": cumulative,
+                "p50_le": self._quantile(series["counts"], series["count"], 0.5),
+                "p95_le": self._quantile(series["counts"], series["count"], 0.95),
+                "p99_le": self._quantile(series["counts"], series["count"], 0.99)
+            }
+        return result
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures so callers fail fast to the mock
+    catalog, then lets a single probe through once `recovery_seconds` have passed.
+    """
+    def __init__(self, failure_threshold: int, recovery_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.state = "closed"  # closed, open, half_open
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+    
+    def allow_request(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.recovery_seconds:
+            self.state = "half_open"
+        if self.state == "half_open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+    
+    def record_success(self):
+        if self.state != "closed":
+            logger.info("LLM circuit breaker closed")
+        self.state = "closed"
+        self.failures = 0
+        self.probe_in_flight = False
+    
+    def release_probe(self):
+        """Free the half-open probe slot when a guarded call ends without a provider outcome"""
+        self.probe_in_flight = False
+    
+    def record_failure(self):
+        self.failures += 1
+        self.probe_in_flight = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+    
+    def get_stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "failure_threshold": self.failure_threshold,
+            "recovery_seconds": self.recovery_seconds
+        }
+
+llm_circuit_breaker = CircuitBreaker(LLM_BREAKER_FAILURE_THRESHOLD, LLM_BREAKER_RECOVERY_SECONDS)
+llm_latency = LatencyHistogram()
+
+# Pre-generated suggestion pools for popular moods
+SUGGESTION_POOL_MOODS = [m.strip() for m in os.environ.get('SUGGESTION_POOL_MOODS', 'horny,feeling_spicy,teasing').split(',') if m.strip()]
+SUGGESTION_POOL_SIZE = int(os.environ.get('SUGGESTION_POOL_SIZE', '3'))
+SUGGESTION_POOL_MAX_AGE_SECONDS = int(os.environ.get('SUGGESTION_POOL_MAX_AGE_SECONDS', '3600'))
+SUGGESTION_POOL_REFILL_INTERVAL_SECONDS = int(os.environ.get('SUGGESTION_POOL_REFILL_INTERVAL_SECONDS', '30'))
+
+INTENSITY_BANDS = {"low": (1, 2), "medium": (3, 3), "high": (4, 5)}
+
+def get_intensity_band(intensity: int) -> str:
+    for band, (low, high) in INTENSITY_BANDS.items():
+        if low <= intensity <= high:
+            return band
+    return "low" if intensity < 1 else "high"
+
+class SuggestionPool:
+    """
+    Keeps up to `size` fresh LLM suggestions per (mood_type, intensity band, extreme mode) bucket.
+    Requests pop from the pool and a background worker replenishes it, so pooled moods never
+    wait on the LLM. Pools are generated without boundaries and only serve users who have none.
+    """
+    def __init__(self, moods: List[str], size: int, max_age_seconds: int, refill_interval_seconds: int):
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self.refill_interval_seconds = refill_interval_seconds
+        self.pools: Dict[tuple, deque] = {
+            (mood_type, band, is_extreme_mode): deque()
+            for mood_type in moods
+            for band in INTENSITY_BANDS
+            for is_extreme_mode in (False, True)
+        }
+        self.stats = {"hits": 0, "empty": 0, "refills": 0, "refill_failures": 0}
+        self.requested: Dict[tuple, None] = {}  # Buckets drained by requests, refilled first
+        self.worker: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+    
+    def bucket_for(self, mood_type: str, intensity: int, is_extreme_mode: bool = False) -> Optional[tuple]:
+        bucket = (mood_type, get_intensity_band(intensity), bool(is_extreme_mode))
+        return bucket if bucket in self.pools else None
+    
+    def _evict_stale(self, pool: deque):
+        cutoff = datetime.utcnow() - timedelta(seconds=self.max_age_seconds)
+        while pool and pool[0]["created_at"] < cutoff:
+            pool.popleft()
+    
+    def pop(self, bucket: tuple) -> Optional[dict]:
+        pool = self.pools[bucket]
+        self._evict_stale(pool)
+        
+        self.requested[bucket] = None
+        if self.wakeup:
+            self.wakeup.set()
+        
+        if not pool:
+            self.stats["empty"] += 1
+            return None
+        
+        self.stats["hits"] += 1
+        return pool.popleft()["suggestion"]
+    
+    async def refill_bucket(self, bucket: tuple, missing: int):
+        mood_type, band, is_extreme_mode = bucket
+        low, high = INTENSITY_BANDS[band]
+        
+        intensity = random.randint(low, high)
+        suggestions = await generate_llm_suggestions_batch(mood_type, intensity, [], is_extreme_mode, count=missing)
+        if not suggestions:
+            self.stats["refill_failures"] += 1
+            return
+        
+        cache_key = SuggestionCache.make_key(mood_type, intensity, [], is_extreme_mode)
+        for suggestion in suggestions:
+            self.pools[bucket].append({"suggestion": suggestion, "created_at": datetime.utcnow()})
+            self.stats["refills"] += 1
+            await suggestion_cache.add(cache_key, suggestion)
+    
+    def _next_bucket(self) -> Optional[tuple]:
+        """Pick the next under-filled bucket, preferring ones that requests found drained"""
+        while self.requested:
+            bucket = next(iter(self.requested))
+            del self.requested[bucket]
+            self._evict_stale(self.pools[bucket])
+            if len(self.pools[bucket]) < self.size:
+                return bucket
+        
+        for bucket, pool in self.pools.items():
+            self._evict_stale(pool)
+            if len(pool) < self.size:
+                return bucket
+        return None
+    
+    async def run(self):
+        while True:
+            self.wakeup.clear()
+            try:
+                bucket = self._next_bucket()
+                # Leave the LLM budget to request handlers while they are using it
+                if bucket and not llm_semaphore.locked():
+                    before = len(self.pools[bucket])
+                    await self.refill_bucket(bucket, self.size - before)
+                    # Back off until the next interval when the LLM produced nothing
+                    if len(self.pools[bucket]) > before:
+                        continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error refilling suggestion pools: {str(e)}")
+            
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.refill_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self):
+        if self.worker is None and self.pools:
+            self.wakeup = asyncio.Event()
+            self.worker = asyncio.create_task(self.run())
+    
+    async def stop(self):
+        if self.worker:
+            self.worker.cancel()
+            try:
+                await self.worker
+            except asyncio.CancelledError:
+                pass
+            self.worker = None
+    
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "pool_size": self.size,
+            "buckets": {f"{m}:{b}:{'extreme' if e else 'standard'}": len(pool) for (m, b, e), pool in self.pools.items()}
+        }
+
+suggestion_pool = SuggestionPool(SUGGESTION_POOL_MOODS, SUGGESTION_POOL_SIZE, SUGGESTION_POOL_MAX_AGE_SECONDS, SUGGESTION_POOL_REFILL_INTERVAL_SECONDS)
+
+# Retrieval of previously approved tasks from a per-couple hashed n-gram index
+RETRIEVAL_ENABLED = os.environ.get('RETRIEVAL_ENABLED', 'true').lower() == 'true'
+RETRIEVAL_SIMILARITY_THRESHOLD = float(os.environ.get('RETRIEVAL_SIMILARITY_THRESHOLD', '0.35'))
+RETRIEVAL_DUPLICATE_THRESHOLD = float(os.environ.get('RETRIEVAL_DUPLICATE_THRESHOLD', '0.8'))
+RETRIEVAL_RECENT_TASKS = int(os.environ.get('RETRIEVAL_RECENT_TASKS', '10'))
+RETRIEVAL_MAX_TASKS = int(os.environ.get('RETRIEVAL_MAX_TASKS', '500'))
+RETRIEVAL_MAX_COUPLES = int(os.environ.get('RETRIEVAL_MAX_COUPLES', '10000'))
+RETRIEVAL_INDEX_TTL_SECONDS = int(os.environ.get('RETRIEVAL_INDEX_TTL_SECONDS', '300'))
+
+EMBEDDING_DIMENSIONS = 1 << 12
+EMBEDDING_STOPWORDS = frozenset(
+    "the and for with your you their them they that this from into what when then than have has "
+    "are was were will would can could should about each other some more most very just like".split()
+)
+
+def stem_word(word: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def embed_text(text: str) -> Dict[int, float]:
+    """
+    CPU-only sparse embedding: stemmed words plus their character 4-grams, hashed into
+    EMBEDDING_DIMENSIONS buckets and L2-normalized so a dot product is cosine similarity.
+    """
+    features: Dict[int, float] = defaultdict(float)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        if len(word) < 3 or word in EMBEDDING_STOPWORDS:
+            continue
+        stem = stem_word(word)
+        features[zlib.crc32(f"w:{stem}".encode()) % EMBEDDING_DIMENSIONS] += 1.0
+        padded = f"#{stem}#"
+        for i in range(len(padded) - 3):
+            features[zlib.crc32(f"c:{padded[i:i + 4]}".encode()) % EMBEDDING_DIMENSIONS] += 0.25
+    
+    norm = sum(v * v for v in features.values()) ** 0.5
+    return {k: v / norm for k, v in features.items()} if norm else {}
+
+def cosine_similarity(a: Dict[int, float], b: Dict[int, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+def embed_suggestion(suggestion: dict) -> Dict[int, float]:
+    return embed_text(f"{suggestion.get('title', '')} {suggestion.get('description', '')}")
+
+class CoupleTaskHistory:
+    """Vectors of a couple's approved tasks and most recent tasks"""
+    def __init__(self):
+        self.approved: Dict[str, dict] = {}
+        self.recent: deque = deque(maxlen=RETRIEVAL_RECENT_TASKS)
+        self.loaded_at = time.monotonic()
+    
+    def add(self, task: dict, recent: bool = False):
+        vector = embed_suggestion(task)
+        if recent:
+            self.recent.appendleft({"id": task["id"], "vector": vector})
+        if task.get("status") == "approved":
+            self.approved[task["id"]] = {
+                "suggestion": {
+                    "title": task["title"],
+                    "description": task["description"],
+                    "default_duration_minutes": task.get("duration_minutes", 60)
+                },
+                "vector": vector,
+                "stems": {stem_word(word) for word in re.findall(r"[a-z]+", f"{task['title']} {task['description']}".lower())},
+                "intensity": task.get("intensity"),
+                "is_extreme_mode": task.get("is_extreme_mode")
+            }
+    
+    @staticmethod
+    def fits_request(entry: dict, intensity: int, excluded: set, is_extreme_mode: bool) -> bool:
+        """
+        Whether an approved task may be served for this request. Tasks created before their mood
+        settings were recorded could be explicit, so they are only reused in extreme mode; a
+        boundary rules a task out when its catalog tag ("photo", "role_play") appears in the text.
+        """
+        if entry["is_extreme_mode"] is None or entry["intensity"] is None:
+            if not is_extreme_mode:
+                return False
+        elif entry["is_extreme_mode"] != bool(is_extreme_mode) or get_intensity_band(entry["intensity"]) != get_intensity_band(intensity):
+            return False
+        return not any(all(stem_word(word) in entry["stems"] for word in tag.split("_")) for tag in excluded)
+    
+    def is_recent_duplicate(self, suggestion: dict) -> bool:
+        vector = embed_suggestion(suggestion)
+        return any(cosine_similarity(vector, r["vector"]) >= RETRIEVAL_DUPLICATE_THRESHOLD for r in self.recent)
+    
+    def find_reusable(self, query: Dict[int, float], intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> Optional[dict]:
+        """
+        Best approved task above the similarity threshold that fits the request's mode, intensity
+        band and boundaries and is not a repeat of a recent one
+        """
+        recent_ids = {r["id"] for r in self.recent}
+        excluded = {normalize_boundary(b) for b in boundaries or [] if b and b.strip()}
+        best, best_score = None, RETRIEVAL_SIMILARITY_THRESHOLD
+        for task_id, entry in self.approved.items():
+            if task_id in recent_ids or not self.fits_request(entry, intensity, excluded, is_extreme_mode):
+                continue
+            score = cosine_similarity(query, entry["vector"])
+            if score >= best_score and not any(
+                cosine_similarity(entry["vector"], r["vector"]) >= RETRIEVAL_DUPLICATE_THRESHOLD for r in self.recent
+            ):
+                best, best_score = (task_id, entry), score
+        
+        if best is None:
+            return None
+        task_id, entry = best
+        return {**entry["suggestion"], "reused_task_id": task_id, "similarity": round(best_score, 3)}
+
+class TaskVectorIndex:
+    """
+    Per-couple CPU vector index over task titles and descriptions, loaded lazily from Mongo,
+    kept in an LRU and updated incrementally as tasks are created and approved.
     """
+    def __init__(self, max_couples: int, ttl_seconds: int):
+        self.max_couples = max_couples
+        self.ttl_seconds = ttl_seconds
+        self.couples: "OrderedDict[str, CoupleTaskHistory]" = OrderedDict()
+        self.stats = {"loads": 0, "lookups": 0, "reused": 0, "duplicates_avoided": 0}
+    
+    async def get_couple(self, couple_id: str) -> CoupleTaskHistory:
+        history = self.couples.get(couple_id)
+        if history is not None and time.monotonic() - history.loaded_at < self.ttl_seconds:
+            self.couples.move_to_end(couple_id)
+            return history
+        
+        tasks = await db.tasks.find(
+            {"couple_id": couple_id},
+            {"_id": 0, "id": 1, "title": 1, "description": 1, "duration_minutes": 1, "status": 1, "intensity": 1, "is_extreme_mode": 1}
+        ).sort("created_at", -1).to_list(RETRIEVAL_MAX_TASKS)
+        
+        history = CoupleTaskHistory()
+        for i, task in enumerate(reversed(tasks)):
+            history.add(task, recent=i >= len(tasks) - RETRIEVAL_RECENT_TASKS)
+        
+        self.stats["loads"] += 1
+        self.couples[couple_id] = history
+        self.couples.move_to_end(couple_id)
+        while len(self.couples) > self.max_couples:
+            self.couples.popitem(last=False)
+        return history
+    
+    def record_task(self, task: dict, recent: bool = False):
+        """Incrementally index a created or approved task for couples already loaded"""
+        history = self.couples.get(task["couple_id"])
+        if history is not None:
+            history.add(task, recent=recent)
+    
+    def find_reusable(self, history: CoupleTaskHistory, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> Optional[dict]:
+        self.stats["lookups"] += 1
+        query = embed_text(f"{mood_type.replace('_', ' ')} {get_mood_context(mood_type, is_extreme_mode)} {get_mood_prompt_intent(mood_type, is_extreme_mode)}")
+        reused = history.find_reusable(query, intensity, boundaries, is_extreme_mode)
+        if reused:
+            self.stats["reused"] += 1
+        return reused
+    
+    def get_stats(self) -> dict:
+        return {
+            **self.stats,
+            "couples_loaded": len(self.couples),
+            "similarity_threshold": RETRIEVAL_SIMILARITY_THRESHOLD,
+            "duplicate_threshold": RETRIEVAL_DUPLICATE_THRESHOLD
+        }
+
+task_vector_index = TaskVectorIndex(RETRIEVAL_MAX_COUPLES, RETRIEVAL_INDEX_TTL_SECONDS)
+
+async def get_task_history(couple_id: Optional[str]) -> Optional[CoupleTaskHistory]:
+    if not couple_id or not RETRIEVAL_ENABLED:
+        return None
     try:
-        # Get OpenAI API key from environment
-        openai_api_key = os.environ.get('OPENAI_API_KEY')
-        if not openai_api_key:
-            logger.warning("OpenAI API key not found, falling back to mock suggestions")
-            return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+        return await task_vector_index.get_couple(couple_id)
+    except Exception as e:
+        logger.warning(f"Task history unavailable for couple {couple_id}: {str(e)}")
+        return None
+
+def avoid_recent_duplicate(history: Optional[CoupleTaskHistory], suggestion: dict, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> dict:
+    """Swap a suggestion that repeats one of the couple's recent tasks for a catalog alternative"""
+    if history is None or not history.is_recent_duplicate(suggestion):
+        return suggestion
+    
+    alternatives = [c for c in suggestion_catalog.candidates(mood_type, intensity, boundaries, is_extreme_mode) if not history.is_recent_duplicate(c)]
+    if not alternatives:
+        return suggestion
+    task_vector_index.stats["duplicates_avoided"] += 1
+    return dict(random.choice(alternatives))
+
+# Single-flight coalescing of identical concurrent LLM calls
+SUGGESTION_SINGLEFLIGHT_FANOUT = int(os.environ.get('SUGGESTION_SINGLEFLIGHT_FANOUT', '3'))
+
+class SingleFlight:
+    """
+    Lets concurrent callers with the same key await one shared call instead of each starting
+    their own. Callers that need a unique result may start up to `fanout` distinct calls per
+    key; beyond that they join the least-shared call in flight.
+    """
+    def __init__(self, fanout: int):
+        self.fanout = max(1, fanout)
+        self.calls: Dict[str, List[dict]] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+    
+    def _forget(self, key: str, call: dict):
+        calls = self.calls.get(key, [])
+        if call in calls:
+            calls.remove(call)
+        if not calls:
+            self.calls.pop(key, None)
+    
+    async def do(self, key: str, fn, unique: bool = False):
+        calls = self.calls.setdefault(key, [])
         
-        # Create LLM chat instance with enhanced system message
-        mood_context = get_mood_context(mood_type, is_extreme_mode)
-        mood_prompt_intent = get_mood_prompt_intent(mood_type, is_extreme_mode)
+        if calls and not (unique and len(calls) < self.fanout):
+            call = min(calls, key=lambda c: c["waiters"])
+            call["waiters"] += 1
+            self.stats["coalesced"] += 1
+        else:
+            call = {"task": asyncio.ensure_future(fn()), "waiters": 1}
+            calls.append(call)
+            self.stats["calls"] += 1
+            call["task"].add_done_callback(lambda _: self._forget(key, call))
         
-        chat = LlmChat(
-            api_key=openai_api_key,
-            session_id=f"heat_task_{datetime.utcnow().isoformat()}",
-            system_message=f"""You are an AI intimacy coach for the Pulse app, helping couples create playful and intimate connection through personalized HeatTasks. 
+        # Shield so one waiter going away does not cancel the call for everyone else
+        result = await asyncio.shield(call["task"])
+        return dict(result) if isinstance(result, dict) else result
+    
+    def get_stats(self) -> dict:
+        requests = self.stats["calls"] + self.stats["coalesced"]
+        return {
+            **self.stats,
+            "collapse_rate": round(self.stats["coalesced"] / requests, 4) if requests else 0.0,
+            "inflight_keys": len(self.calls),
+            "fanout": self.fanout
+        }
+
+suggestion_singleflight = SingleFlight(SUGGESTION_SINGLEFLIGHT_FANOUT)
+
+async def get_ready_suggestion(cache_key: str, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False, history: Optional[CoupleTaskHistory] = None) -> Optional[dict]:
+    """
+    Return a suggestion that needs no LLM call: a similar task the couple already approved,
+    a catalog entry in catalog mode, a warm cache entry, a pooled suggestion, or a mock when
+    the mood is pooled but its pool is empty. None means the LLM must be asked.
+    """
+    if history is not None:
+        reused = task_vector_index.find_reusable(history, mood_type, intensity, boundaries, is_extreme_mode)
+        if reused:
+            return reused
+    
+    if AI_SUGGESTION_SOURCE == "catalog":
+        return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+    
+    cached = await suggestion_cache.get(cache_key, exclude=history.is_recent_duplicate if history else None)
+    if cached:
+        return cached
+    
+    # Pools are generated without boundaries, so they only serve users who have none
+    bucket = suggestion_pool.bucket_for(mood_type, intensity, is_extreme_mode) if not boundaries else None
+    if bucket:
+        pooled = suggestion_pool.pop(bucket)
+        if pooled:
+            return pooled
+        return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+    
+    return None
+
+# Enhanced AI suggestion function with mood-based context
+@traced("ai.get_suggestion")
+async def get_ai_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False, unique: bool = False, couple_id: Optional[str] = None) -> dict:
+    """
+    Get a HeatTask suggestion, served from the suggestion cache when warm or from the
+    pre-generated pool for popular moods. Falls back to mock suggestions when the LLM is
+    unavailable or a pool is empty. Identical concurrent LLM calls are coalesced unless
+    `unique` is set, in which case distinct variants are fanned out. With a `couple_id`,
+    a similar previously approved task is reused and repeats of recent tasks are avoided.
+    """
+    history = await get_task_history(couple_id)
+    cache_key = SuggestionCache.make_key(mood_type, intensity, boundaries, is_extreme_mode)
+    ready = await get_ready_suggestion(cache_key, mood_type, intensity, boundaries, is_extreme_mode, history)
+    if ready:
+        if "reused_task_id" in ready:
+            return ready
+        return avoid_recent_duplicate(history, ready, mood_type, intensity, boundaries, is_extreme_mode)
+    
+    async def warm_cache(generated: dict):
+        """Store the served suggestion, then fill the key's remaining variants with one batched call"""
+        await suggestion_cache.add(cache_key, generated)
+        missing = min(suggestion_cache.missing_variants(cache_key), SUGGESTION_BATCH_SIZE)
+        if missing > 0 and not llm_semaphore.locked():
+            for extra in await generate_llm_suggestions_batch(mood_type, intensity, boundaries, is_extreme_mode, count=missing):
+                await suggestion_cache.add(cache_key, extra)
+    
+    async def generate_and_cache():
+        # The caller only waits for a single completion; caching and batching happen afterwards
+        generated = await generate_llm_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+        if generated is not None:
+            run_in_background(warm_cache(generated))
+        return generated
+    
+    suggestion = await suggestion_singleflight.do(cache_key, generate_and_cache, unique=unique)
+    if suggestion is None:
+        suggestion = get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+    
+    return avoid_recent_duplicate(history, suggestion, mood_type, intensity, boundaries, is_extreme_mode)
+
+@lru_cache(maxsize=256)
+def get_system_prompt(mood_type: str, is_extreme_mode: bool = False) -> str:
+    """System message for a (mood, extreme) pair; catalog moods are precomputed at startup"""
+    mood_context = get_mood_context(mood_type, is_extreme_mode)
+    mood_prompt_intent = get_mood_prompt_intent(mood_type, is_extreme_mode)
+    
+    return f"""You are an AI intimacy coach for the Pulse app, helping couples create playful and intimate connection through personalized HeatTasks. 
 
 Current mood context: {mood_context}
 Task creation intent: {mood_prompt_intent}
@@ -312,13 +1598,18 @@ Guidelines:
 - Make sure the task directly relates to and fulfills the specific mood intent
 
 Response format should be valid JSON with: title, description, default_duration_minutes"""
-        ).with_model("openai", "gpt-4o").with_max_tokens(500)
-        
-        # Prepare enhanced user message with mood context
-        boundaries_text = ", ".join(boundaries) if boundaries else "No specific boundaries set"
-        extreme_context = " (Extreme mode enabled - more explicit content allowed)" if is_extreme_mode else " (Standard mode - keep content tasteful)"
-        
-        user_prompt = f"""Generate a personalized HeatTask for a couple with these details:
+
+def build_suggestion_prompts(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> tuple:
+    """Build the (system message, user prompt) pair for a HeatTask suggestion"""
+    system_message = get_system_prompt(mood_type, bool(is_extreme_mode))
+    mood_context = get_mood_context(mood_type, is_extreme_mode)
+    mood_prompt_intent = get_mood_prompt_intent(mood_type, is_extreme_mode)
+    
+    # Prepare enhanced user message with mood context
+    boundaries_text = ", ".join(boundaries) if boundaries else "No specific boundaries set"
+    extreme_context = " (Extreme mode enabled - more explicit content allowed)" if is_extreme_mode else " (Standard mode - keep content tasteful)"
+    
+    user_prompt = f"""Generate a personalized HeatTask for a couple with these details:
 - Current mood: {mood_type}
 - Mood context: {mood_context}
 - Task intent: {mood_prompt_intent}
@@ -333,258 +1624,713 @@ IMPORTANT: The task must directly fulfill the mood intent. For example:
 - If mood is "worship_me", create a task where they are adored and treated special
 
 Please suggest an intimate task that matches their current mood intent exactly. The task should be engaging, fun, and appropriate for their boundaries and selected content level."""
+    
+    return system_message, user_prompt
+
+def clean_suggestion(suggestion) -> Optional[dict]:
+    """
+    The fields a HeatTask needs from an LLM suggestion, with the duration as whole minutes, or
+    None when the title or description is not a non-empty string or the duration is not a
+    positive number. Numeric strings such as "30" are accepted.
+    """
+    if not isinstance(suggestion, dict):
+        return None
+    title, description, duration = suggestion.get('title'), suggestion.get('description'), suggestion.get('default_duration_minutes')
+    if not (isinstance(title, str) and title.strip() and isinstance(description, str) and description.strip()):
+        return None
+    if not isinstance(duration, (int, float, str)) or isinstance(duration, bool):
+        return None
+    try:
+        minutes = round(float(duration))
+    except (ValueError, OverflowError):
+        return None
+    if minutes <= 0:
+        return None
+    return {"title": title, "description": description, "default_duration_minutes": minutes}
+
+# LLM cost/latency accounting per generation mode
+SUGGESTION_BATCH_SIZE = int(os.environ.get('SUGGESTION_BATCH_SIZE', '3'))
+LLM_INPUT_COST_PER_1K_TOKENS = float(os.environ.get('LLM_INPUT_COST_PER_1K_TOKENS', '0.0025'))
+LLM_OUTPUT_COST_PER_1K_TOKENS = float(os.environ.get('LLM_OUTPUT_COST_PER_1K_TOKENS', '0.01'))
+
+class LlmUsageReport:
+    """
+    Tracks calls, suggestions produced, latency and estimated tokens per generation mode
+    ("single" or "batch") so the effective cost of each suggestion can be compared.
+    Tokens are estimated at four characters each since LlmChat does not report usage.
+    """
+    def __init__(self):
+        self.modes: Dict[str, dict] = {}
+    
+    def record(self, mode: str, suggestions: int, seconds: float, prompt_chars: int, completion_chars: int):
+        usage = self.modes.setdefault(mode, {"calls": 0, "suggestions": 0, "seconds": 0.0, "prompt_chars": 0, "completion_chars": 0})
+        usage["calls"] += 1
+        usage["suggestions"] += suggestions
+        usage["seconds"] += seconds
+        usage["prompt_chars"] += prompt_chars
+        usage["completion_chars"] += completion_chars
+    
+    def snapshot(self) -> dict:
+        report = {}
+        for mode, usage in self.modes.items():
+            per = max(usage["suggestions"], 1)
+            prompt_tokens = usage["prompt_chars"] / 4
+            completion_tokens = usage["completion_chars"] / 4
+            cost = prompt_tokens / 1000 * LLM_INPUT_COST_PER_1K_TOKENS + completion_tokens / 1000 * LLM_OUTPUT_COST_PER_1K_TOKENS
+            report[mode] = {
+                "calls": usage["calls"],
+                "suggestions": usage["suggestions"],
+                "seconds_per_call": round(usage["seconds"] / max(usage["calls"], 1), 4),
+                "seconds_per_suggestion": round(usage["seconds"] / per, 4),
+                "est_tokens_per_suggestion": round((prompt_tokens + completion_tokens) / per, 1),
+                "est_cost_per_suggestion": round(cost / per, 6)
+            }
+        
+        if "single" in report and "batch" in report and report["single"]["suggestions"] and report["batch"]["suggestions"]:
+            report["batch_vs_single"] = {
+                "latency_ratio": round(report["batch"]["seconds_per_suggestion"] / max(report["single"]["seconds_per_suggestion"], 1e-9), 3),
+                "cost_ratio": round(report["batch"]["est_cost_per_suggestion"] / max(report["single"]["est_cost_per_suggestion"], 1e-9), 3)
+            }
+        return report
+
+llm_usage = LlmUsageReport()
+
+# Long-lived LLM client so HTTP connections are kept alive and reused across calls
+# "pooled" sends OPENAI_API_KEY straight to OpenAI (or OPENAI_BASE_URL), so it needs a real OpenAI key
+LLM_CLIENT = os.environ.get('LLM_CLIENT', 'llmchat')  # llmchat, pooled
+LLM_KEEPALIVE_SECONDS = float(os.environ.get('LLM_KEEPALIVE_SECONDS', '60'))
+OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL') or None  # e.g. perf/fake_llm_server.py
+
+class LlmClientPool:
+    """
+    With LLM_CLIENT=pooled, holds one AsyncOpenAI client backed by a keep-alive httpx connection
+    pool sized to the LLM concurrency budget, instead of building a fresh LlmChat (and connection)
+    per call. Otherwise, or when the OpenAI SDK is not installed, calls go through LlmChat.
+    """
+    def __init__(self):
+        self.client = None
+        self.unavailable = LLM_CLIENT != "pooled"
+    
+    def get(self):
+        if self.client is None and not self.unavailable:
+            try:
+                import httpx
+                from openai import AsyncOpenAI
+            except ImportError:
+                logger.info("OpenAI SDK not installed, using a new LlmChat per call")
+                self.unavailable = True
+                return None
+            
+            self.client = AsyncOpenAI(
+                api_key=os.environ.get('OPENAI_API_KEY'),
+                base_url=OPENAI_BASE_URL,
+                max_retries=0,
+                http_client=httpx.AsyncClient(
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONCURRENCY * 2,
+                        max_keepalive_connections=LLM_MAX_CONCURRENCY,
+                        keepalive_expiry=LLM_KEEPALIVE_SECONDS
+                    )
+                )
+            )
+        return self.client
+    
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+
+llm_client_pool = LlmClientPool()
+
+@traced("llm.call")
+async def call_llm(system_message: str, user_prompt: str, max_tokens: int = 500, label: str = "") -> Optional[str]:
+    """
+    Send one prompt to GPT-4o and return the raw response text, or None on failure.
+    Waiting for the concurrency budget is bounded by LLM_QUEUE_TIMEOUT_SECONDS and the provider
+    call by LLM_TIMEOUT_SECONDS; only provider timeouts and errors count against the circuit
+    breaker, and the call is skipped entirely while the breaker is open.
+    Timeouts, errors and breaker rejections are recorded under `label`-prefixed histograms.
+    """
+    # Get OpenAI API key from environment
+    openai_api_key = os.environ.get('OPENAI_API_KEY')
+    if not openai_api_key:
+        logger.warning("OpenAI API key not found, falling back to mock suggestions")
+        return None
+    
+    if not llm_circuit_breaker.allow_request():
+        llm_latency.observe(f"{label}circuit_open", 0.0)
+        return None
+    holds_probe = llm_circuit_breaker.probe_in_flight
+    
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(llm_semaphore.acquire(), timeout=LLM_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        # Local queueing says nothing about the provider, so the breaker is left alone
+        logger.warning(f"LLM concurrency budget busy for {LLM_QUEUE_TIMEOUT_SECONDS}s, using mock suggestion")
+        if holds_probe:
+            llm_circuit_breaker.release_probe()
+        llm_latency.observe(f"{label}queue_timeout", time.perf_counter() - start)
+        return None
+    except BaseException:
+        if holds_probe:
+            llm_circuit_breaker.release_probe()
+        raise
+    
+    llm_in_flight["calls"] += 1
+    try:
+        llm_client = llm_client_pool.get()
         
-        user_message = UserMessage(text=user_prompt)
+        async def send():
+            if llm_client is not None:
+                completion = await llm_client.chat.completions.create(
+                    model="gpt-4o",
+                    max_tokens=max_tokens,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                )
+                return completion.choices[0].message.content
+            
+            # Imported on first use: emergentintegrations pulls in a large dependency tree
+            from emergentintegrations.llm.chat import LlmChat, UserMessage
+            chat = LlmChat(
+                api_key=openai_api_key,
+                session_id=f"heat_task_{datetime.utcnow().isoformat()}",
+                system_message=system_message
+            ).with_model("openai", "gpt-4o").with_max_tokens(max_tokens)
+            return await chat.send_message(UserMessage(text=user_prompt))
         
         # Get AI response
-        response = await chat.send_message(user_message)
+        response = await asyncio.wait_for(send(), timeout=LLM_TIMEOUT_SECONDS)
         
-        # Try to parse as JSON, fallback to mock if parsing fails
-        try:
-            import json
-            ai_suggestion = json.loads(response)
-            
-            # Validate required fields
-            if all(key in ai_suggestion for key in ['title', 'description', 'default_duration_minutes']):
-                logger.info(f"AI suggestion generated successfully for mood: {mood_type}")
-                return ai_suggestion
-            else:
-                logger.warning("AI response missing required fields, using mock suggestion")
-                return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
-                
-        except json.JSONDecodeError:
-            logger.warning("Could not parse AI response as JSON, using mock suggestion")
-            return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
-            
+        # The provider answered, so malformed output does not count against the breaker
+        llm_circuit_breaker.record_success()
+        return response
+    
+    except asyncio.TimeoutError:
+        logger.warning(f"AI suggestion timed out after {LLM_TIMEOUT_SECONDS}s, using mock suggestion")
+        llm_circuit_breaker.record_failure()
+        llm_latency.observe(f"{label}timeout", time.perf_counter() - start)
+        return None
     except Exception as e:
         logger.error(f"Error getting AI suggestion: {str(e)}")
-        return get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
-
-def get_mood_context(mood_type: str, is_extreme_mode: bool = False) -> str:
-    """Get descriptive context for each mood type with enhanced AI prompting"""
-    mood_contexts = {
-        # Regular moods
-        'feeling_spicy': 'Partner is feeling adventurous and wants to add some heat to their connection',
-        'horny': 'Partner is sexually aroused and looking for intimate physical connection',
-        'teasing': 'Partner is in a playful, flirtatious mood and enjoys building anticipation',
-        'romantic': 'Partner is seeking emotional intimacy and romantic connection',
-        'playful': 'Partner wants fun, lighthearted activities that bring joy and laughter',
-        'unavailable': 'Partner is busy or not in the mood for intimate activities',
-        
-        # Expanded spicy moods with specific AI prompting intent
-        'available_for_use': 'Partner is offering themselves for free-use and wants to be used for their lover\'s pleasure',
-        'feeling_submissive': 'Partner is in a submissive headspace and wants to serve, please, and obey their dominant',
-        'wanna_edge': 'Partner wants to experience prolonged arousal, teasing, and delayed gratification without release',
-        'use_me_how_you_want': 'Partner is giving complete control and consent for their partner to dominate and use them',
-        'feeling_dominant': 'Partner wants to take complete charge, control, and command the intimate experience',
-        'need_attention': 'Partner craves focused attention, worship, and adoration from their lover',
-        'bratty_mood': 'Partner is feeling mischievous, defiant, and wants to playfully challenge their partner',
-        'worship_me': 'Partner wants to be adored, praised, served, and treated like royalty or a deity'
-    }
+        llm_circuit_breaker.record_failure()
+        llm_latency.observe(f"{label}error", time.perf_counter() - start)
+        return None
+    finally:
+        # A cancelled probe reaches neither record_* path, so give the slot back here
+        if holds_probe:
+            llm_circuit_breaker.release_probe()
+        llm_in_flight["calls"] -= 1
+        llm_semaphore.release()
+
+async def generate_llm_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> Optional[dict]:
+    """
+    Generate AI-powered HeatTask suggestions using OpenAI GPT-4o
+    Enhanced with mood-based context and extreme mode support.
+    Returns None when no valid suggestion could be generated.
+    """
+    # Create LLM chat instance with enhanced system message
+    system_message, user_prompt = build_suggestion_prompts(mood_type, intensity, boundaries, is_extreme_mode)
     
-    base_context = mood_contexts.get(mood_type, 'Partner has selected a custom mood')
+    start = time.perf_counter()
+    response = await call_llm(system_message, user_prompt)
+    if response is None:
+        return None
     
-    if is_extreme_mode and mood_type in ['available_for_use', 'feeling_submissive', 'wanna_edge', 'use_me_how_you_want', 'feeling_dominant', 'bratty_mood']:
-        base_context += " (Extreme mode: More explicit, kinky, and intense content is welcomed)"
+    # Try to parse as JSON, fallback to mock if parsing fails
+    try:
+        ai_suggestion = clean_suggestion(json.loads(response))
+        
+        # Validate required fields
+        if ai_suggestion is not None:
+            logger.info(f"AI suggestion generated successfully for mood: {mood_type}")
+            llm_latency.observe("success", time.perf_counter() - start)
+            llm_usage.record("single", 1, time.perf_counter() - start, len(system_message) + len(user_prompt), len(response))
+            return ai_suggestion
+        else:
+            logger.warning("AI response missing required fields, using mock suggestion")
+            llm_latency.observe("invalid_response", time.perf_counter() - start)
+            return None
+            
+    except json.JSONDecodeError:
+        logger.warning("Could not parse AI response as JSON, using mock suggestion")
+        llm_latency.observe("invalid_response", time.perf_counter() - start)
+        return None
+
+async def generate_llm_suggestions_batch(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False, count: int = SUGGESTION_BATCH_SIZE) -> List[dict]:
+    """
+    Ask GPT-4o for `count` distinct suggestions in a single completion, so the per-request
+    latency and system prompt tokens are paid once. Returns only the entries that pass
+    validation, without duplicate titles; an empty list means nothing usable came back.
+    """
+    if count <= 1:
+        suggestion = await generate_llm_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+        return [suggestion] if suggestion else []
     
-    return base_context
+    system_message, user_prompt = build_suggestion_prompts(mood_type, intensity, boundaries, is_extreme_mode)
+    user_prompt += f"""
 
-def get_mood_prompt_intent(mood_type: str, is_extreme_mode: bool = False) -> str:
-    """Get specific AI prompting intent for each mood type"""
-    mood_prompts = {
-        # Regular moods
-        'feeling_spicy': 'Create a sensual, exciting task that builds sexual tension and intimacy',
-        'horny': 'Create an arousing, sexually charged task focused on physical pleasure',
-        'teasing': 'Create a playful, flirtatious task that builds anticipation and sexual tension',
-        'romantic': 'Create an emotionally intimate, loving task that strengthens romantic connection',
-        'playful': 'Create a fun, lighthearted task that brings joy and playful intimacy',
-        'unavailable': 'Create a simple, low-pressure task for later when they\'re available',
-        
-        # Enhanced spicy moods with specific prompting
-        'available_for_use': 'Create a free-use, consensual task where the submissive partner is used for pleasure',
-        'feeling_submissive': 'Create a submission-focused task involving serving, pleasing, or obeying their dominant',
-        'wanna_edge': 'Create an edging/teasing task involving prolonged arousal without climax or release',
-        'use_me_how_you_want': 'Create a dominant/submissive power exchange task with complete control dynamics',
-        'feeling_dominant': 'Create a dominant, controlling task where the partner takes complete charge',
-        'need_attention': 'Create a worship, attention-focused task where the partner is adored and served',
-        'bratty_mood': 'Create a playful punishment or taming task to handle bratty, defiant behavior',
-        'worship_me': 'Create a worship, reverence task where the partner is treated like royalty'
-    }
+Generate {count} distinct HeatTasks for this request. Respond with valid JSON of the form {{"suggestions": [...]}} where each item has: title, description, default_duration_minutes"""
     
-    base_prompt = mood_prompts.get(mood_type, 'Create an intimate task appropriate for the mood')
+    start = time.perf_counter()
+    response = await call_llm(system_message, user_prompt, max_tokens=350 * count, label="batch_")
+    if response is None:
+        return []
     
-    if is_extreme_mode and mood_type in ['available_for_use', 'feeling_submissive', 'wanna_edge', 'use_me_how_you_want', 'feeling_dominant', 'bratty_mood']:
-        base_prompt += ". Make it more explicit, intense, and kinky since extreme mode is enabled"
+    try:
+        parsed = json.loads(response)
+    except json.JSONDecodeError:
+        logger.warning("Could not parse batched AI response as JSON")
+        llm_latency.observe("batch_invalid_response", time.perf_counter() - start)
+        return []
+    
+    items = parsed.get("suggestions", []) if isinstance(parsed, dict) else parsed
+    suggestions, titles = [], set()
+    for item in map(clean_suggestion, items if isinstance(items, list) else []):
+        if item is not None and item["title"] not in titles:
+            titles.add(item["title"])
+            suggestions.append(item)
+    
+    if not suggestions:
+        logger.warning("Batched AI response had no valid suggestions")
+        llm_latency.observe("batch_invalid_response", time.perf_counter() - start)
+        return []
     
-    return base_prompt
+    logger.info(f"{len(suggestions)}/{count} batched AI suggestions generated for mood: {mood_type}")
+    llm_latency.observe("batch_success", time.perf_counter() - start)
+    llm_usage.record("batch", len(suggestions), time.perf_counter() - start, len(system_message) + len(user_prompt), len(response))
+    return suggestions
 
-def get_mock_ai_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> dict:
+# Streaming AI suggestions
+class SuggestionStreamParser:
     """
-    Enhanced fallback mock suggestions with mood-specific content
+    Incrementally extracts top-level string fields from a JSON object as it is streamed,
+    so partial title/description text can be forwarded before the completion finishes.
     """
-    # Mood-specific suggestion mapping
-    mood_specific_suggestions = {
-        'available_for_use': [
-            {
-                "title": "Free Use Morning",
-                "description": "For the next hour, you're available for your partner's pleasure whenever they want. Stay accessible and ready.",
-                "default_duration_minutes": 60
-            },
-            {
-                "title": "Use Me as You Please",
-                "description": "Tell your partner they can use you however they want for the next 30 minutes. Submit to their desires.",
-                "default_duration_minutes": 30
-            }
-        ],
-        'feeling_submissive': [
-            {
-                "title": "Serve Your Dominant",
-                "description": "Ask your partner what they need and fulfill their request immediately. Focus on pleasing them.",
-                "default_duration_minutes": 45
-            },
-            {
-                "title": "Submission Position",
-                "description": "Get into a submissive position and wait for your partner's commands. Show your obedience.",
-                "default_duration_minutes": 30
-            }
-        ],
-        'wanna_edge': [
-            {
-                "title": "Edge Without Release",
-                "description": "Bring yourself close to climax 3 times but don't finish. Send updates to your partner.",
-                "default_duration_minutes": 45
-            },
-            {
-                "title": "Teasing Touch",
-                "description": "Touch yourself slowly and stop every time you get close. Build the tension for your partner.",
-                "default_duration_minutes": 60
-            }
-        ],
-        'use_me_how_you_want': [
-            {
-                "title": "Total Control Surrender",
-                "description": "Text your partner that they have complete control over you for the next hour. Do whatever they say.",
-                "default_duration_minutes": 60
-            },
-            {
-                "title": "Your Pleasure Toy",
-                "description": "Tell your partner you're their personal pleasure toy today. Let them decide how to use you.",
-                "default_duration_minutes": 90
-            }
-        ],
-        'feeling_dominant': [
-            {
-                "title": "Command Your Submissive",
-                "description": "Give your partner 3 tasks to complete for your pleasure. Make them report back when done.",
-                "default_duration_minutes": 60
-            },
-            {
-                "title": "Take Complete Control",
-                "description": "Direct your partner's every move for the next 30 minutes. Be commanding and assertive.",
-                "default_duration_minutes": 30
-            }
-        ],
-        'need_attention': [
-            {
-                "title": "Worship and Adore",
-                "description": "Have your partner tell you 5 things they love about your body while touching you gently.",
-                "default_duration_minutes": 30
-            },
-            {
-                "title": "Focus All on You",
-                "description": "Ask your partner to spend 20 minutes focusing entirely on your pleasure and desires.",
-                "default_duration_minutes": 20
-            }
-        ],
-        'bratty_mood': [
-            {
-                "title": "Tame the Brat",
-                "description": "Be extra demanding and see how your partner handles your bratty attitude. Push their buttons playfully.",
-                "default_duration_minutes": 45
-            },
-            {
-                "title": "Playful Punishment",
-                "description": "Act bratty until your partner gives you a playful punishment or puts you in your place.",
-                "default_duration_minutes": 30
-            }
-        ],
-        'worship_me': [
-            {
-                "title": "Royal Treatment",
-                "description": "Have your partner treat you like royalty - massage, compliments, and total attention to your needs.",
-                "default_duration_minutes": 60
-            },
-            {
-                "title": "Goddess Worship",
-                "description": "Make your partner worship your body with kisses and praise for 20 minutes straight.",
-                "default_duration_minutes": 20
-            }
-        ]
-    }
+    STREAMED_FIELDS = ("title", "description")
+    ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
     
-    # Regular mood suggestions
-    regular_suggestions = {
-        'feeling_spicy': [
-            {
-                "title": "Tease with a photo",
-                "description": "Take a playful photo that shows just enough to make your partner excited.",
-                "default_duration_minutes": 30
-            }
-        ],
-        'horny': [
-            {
-                "title": "Pleasure yourself thinking of them",
-                "description": "Focus entirely on your partner while pleasuring yourself and describe the experience.",
-                "default_duration_minutes": 45
-            }
-        ],
-        'teasing': [
-            {
-                "title": "Send anticipation messages",
-                "description": "Send teasing messages throughout the day about what you want to do later.",
-                "default_duration_minutes": 30
-            }
-        ]
-    }
+    def __init__(self):
+        self.text = ""
+        self.state = "start"  # start, key_or_end, key, colon, value, string, literal, after_value, done
+        self.key = ""
+        self.field = None
+        self.escape = None  # None, "" right after a backslash, or "u" plus hex digits
+        self.high_surrogate = None  # first half of an escaped astral character, e.g. \ud83d
+        self.literal_depth = 0
+        self.literal_in_string = False
+    
+    def _decode(self, c: str) -> Optional[str]:
+        """Handle escape sequences inside strings; returns the decoded text or None"""
+        if self.escape is None:
+            if c == '\\':
+                self.escape = ""
+                return None
+            return self._unpaired_surrogate() + c
+        if self.escape == "":
+            if c == 'u':
+                self.escape = "u"
+                return None
+            self.escape = None
+            return self._unpaired_surrogate() + self.ESCAPES.get(c, c)
+        self.escape += c
+        if len(self.escape) < 5:
+            return None
+        code, self.escape = self.escape[1:], None
+        try:
+            code = int(code, 16)
+        except ValueError:
+            return self._unpaired_surrogate()
+        
+        # Astral characters arrive as two escapes (\ud83d\ude18) and must be joined into one
+        if 0xD800 <= code < 0xDC00:
+            pending = self._unpaired_surrogate()
+            self.high_surrogate = code
+            return pending or None
+        if 0xDC00 <= code < 0xE000:
+            if self.high_surrogate is None:
+                return "\ufffd"
+            high, self.high_surrogate = self.high_surrogate, None
+            return chr(0x10000 + ((high - 0xD800) << 10) + (code - 0xDC00))
+        return self._unpaired_surrogate() + chr(code)
+    
+    def _unpaired_surrogate(self) -> str:
+        """Replace a high surrogate that was not followed by a low one, since it cannot be encoded"""
+        if self.high_surrogate is None:
+            return ""
+        self.high_surrogate = None
+        return "\ufffd"
+    
+    def feed(self, chunk: str) -> List[tuple]:
+        """Consume a chunk of streamed text and return (field, delta) pairs for streamed fields"""
+        self.text += chunk
+        deltas: List[tuple] = []
+        
+        for c in chunk:
+            if self.state == "start":
+                if c == '{':
+                    self.state = "key_or_end"
+            elif self.state == "key_or_end":
+                if c == '"':
+                    self.state, self.key = "key", ""
+                elif c == '}':
+                    self.state = "done"
+            elif self.state == "key":
+                if c == '"' and self.escape is None:
+                    self.state = "colon"
+                    self.key += self._unpaired_surrogate()
+                else:
+                    decoded = self._decode(c)
+                    if decoded:
+                        self.key += decoded
+            elif self.state == "colon":
+                if c == ':':
+                    self.state = "value"
+            elif self.state == "value":
+                if c == '"':
+                    self.state, self.field = "string", self.key
+                elif not c.isspace():
+                    self.state = "literal"
+                    self.literal_depth = 1 if c in '{[' else 0
+                    self.literal_in_string = False
+            elif self.state == "string":
+                if c == '"' and self.escape is None:
+                    self.state = "after_value"
+                    decoded = self._unpaired_surrogate()
+                else:
+                    decoded = self._decode(c)
+                if decoded and self.field in self.STREAMED_FIELDS:
+                    if deltas and deltas[-1][0] == self.field:
+                        deltas[-1] = (self.field, deltas[-1][1] + decoded)
+                    else:
+                        deltas.append((self.field, decoded))
+            elif self.state == "literal":
+                if self.literal_in_string:
+                    if self.escape is not None or c == '\\':
+                        self._decode(c)
+                    elif c == '"':
+                        self.literal_in_string = False
+                        self.high_surrogate = None
+                elif c == '"':
+                    self.literal_in_string = True
+                elif c in '{[':
+                    self.literal_depth += 1
+                elif c in '}]' and self.literal_depth > 0:
+                    self.literal_depth -= 1
+                elif c == ',' and self.literal_depth == 0:
+                    self.state = "key_or_end"
+                elif c == '}' and self.literal_depth == 0:
+                    self.state = "done"
+            elif self.state == "after_value":
+                if c == ',':
+                    self.state = "key_or_end"
+                elif c == '}':
+                    self.state = "done"
+        
+        return deltas
     
-    # Choose suggestions based on mood type
-    if mood_type in mood_specific_suggestions:
-        suggestions = mood_specific_suggestions[mood_type]
-    elif mood_type in regular_suggestions:
-        suggestions = regular_suggestions[mood_type]
-    elif mood_type in ['feeling_spicy', 'horny', 'teasing']:
-        # Fallback spicy suggestions
-        suggestions = [
-            {
-                "title": "Create anticipation",
-                "description": "Send detailed messages about exactly what you want to do to your partner.",
-                "default_duration_minutes": 60
-            },
-            {
-                "title": "Tease with a photo",
-                "description": "Take a playful photo that shows just enough to make your partner excited.",
-                "default_duration_minutes": 30
-            }
-        ]
-    else:
-        # Default suggestions for other moods
-        suggestions = [
-            {
-                "title": "Connect intimately",
-                "description": "Spend quality time focusing on your connection and what makes you both happy.",
-                "default_duration_minutes": 45
-            },
-            {
-                "title": "Show your love",
-                "description": "Do something thoughtful that shows your partner how much you care about them.",
-                "default_duration_minutes": 30
+    def result(self) -> Optional[dict]:
+        """Parse the complete streamed text, tolerating text around the JSON object"""
+        start, end = self.text.find('{'), self.text.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(self.text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+
+async def stream_llm_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False):
+    """
+    Async generator streaming a suggestion from GPT-4o. Yields ("delta", field, text) tuples as
+    title/description tokens arrive and finally ("complete", suggestion) where suggestion is None
+    if nothing valid was produced. Shares the LLM deadline, concurrency budget and breaker.
+    """
+    stream_client = llm_client_pool.get() if os.environ.get('OPENAI_API_KEY') else None
+    if stream_client is None:
+        # No streaming transport available, deliver the whole suggestion at once
+        yield ("complete", await generate_llm_suggestion(mood_type, intensity, boundaries, is_extreme_mode))
+        return
+    
+    if not llm_circuit_breaker.allow_request():
+        llm_latency.observe("circuit_open", 0.0)
+        yield ("complete", None)
+        return
+    holds_probe = llm_circuit_breaker.probe_in_flight
+    
+    system_message, user_prompt = build_suggestion_prompts(mood_type, intensity, boundaries, is_extreme_mode)
+    parser = SuggestionStreamParser()
+    start = time.perf_counter()
+    outcome = "error"
+    
+    try:
+        try:
+            await asyncio.wait_for(llm_semaphore.acquire(), timeout=LLM_QUEUE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            # Local queueing says nothing about the provider, so the breaker is left alone
+            logger.warning(f"LLM concurrency budget busy for {LLM_QUEUE_TIMEOUT_SECONDS}s, using mock suggestion")
+            if holds_probe:
+                llm_circuit_breaker.release_probe()
+                holds_probe = False
+            llm_latency.observe("stream_queue_timeout", time.perf_counter() - start)
+            yield ("complete", None)
+            return
+        
+        deadline = time.perf_counter() + LLM_TIMEOUT_SECONDS
+        llm_in_flight["calls"] += 1
+        try:
+            stream = await asyncio.wait_for(
+                stream_client.chat.completions.create(
+                    model="gpt-4o",
+                    max_tokens=500,
+                    stream=True,
+                    messages=[
+                        {"role": "system", "content": system_message},
+                        {"role": "user", "content": user_prompt}
+                    ]
+                ),
+                timeout=max(0.0, deadline - time.perf_counter())
+            )
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - time.perf_counter()))
+                except StopAsyncIteration:
+                    break
+                
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if text:
+                    for field, delta in parser.feed(text):
+                        yield ("delta", field, delta)
+        finally:
+            llm_in_flight["calls"] -= 1
+            llm_semaphore.release()
+        
+        llm_circuit_breaker.record_success()
+        suggestion = clean_suggestion(parser.result())
+        outcome = "success" if suggestion is not None else "invalid_response"
+        if outcome == "invalid_response":
+            logger.warning("Streamed AI response was not a valid suggestion, using mock suggestion")
+            suggestion = None
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away (SSE disconnect or websocket task cancelled). Text already streamed
+        # shows the provider is healthy; a probe cancelled before any answer counts as failed so the
+        # breaker re-opens instead of staying half-open with its only probe slot taken.
+        if parser.text:
+            llm_circuit_breaker.record_success()
+        elif holds_probe:
+            llm_circuit_breaker.record_failure()
+        llm_latency.observe("stream_cancelled", time.perf_counter() - start)
+        raise
+    except asyncio.TimeoutError:
+        logger.warning(f"Streamed AI suggestion timed out after {LLM_TIMEOUT_SECONDS}s, using mock suggestion")
+        llm_circuit_breaker.record_failure()
+        outcome, suggestion = "timeout", None
+    except Exception as e:
+        logger.error(f"Error streaming AI suggestion: {str(e)}")
+        llm_circuit_breaker.record_failure()
+        suggestion = None
+    
+    llm_latency.observe(f"stream_{outcome}", time.perf_counter() - start)
+    yield ("complete", suggestion)
+
+async def stream_ai_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False, couple_id: Optional[str] = None):
+    """
+    Async generator of suggestion events for clients. Reused, cached and pooled suggestions
+    complete immediately; otherwise partial fields are streamed from the LLM as generated.
+    """
+    history = await get_task_history(couple_id)
+    cache_key = SuggestionCache.make_key(mood_type, intensity, boundaries, is_extreme_mode)
+    ready = await get_ready_suggestion(cache_key, mood_type, intensity, boundaries, is_extreme_mode, history)
+    if ready:
+        yield {"event": "complete", "ai_suggestion": ready}
+        return
+    
+    async for item in stream_llm_suggestion(mood_type, intensity, boundaries, is_extreme_mode):
+        if item[0] == "delta":
+            yield {"event": "delta", "field": item[1], "delta": item[2]}
+            continue
+        
+        suggestion = item[1]
+        if suggestion is None:
+            suggestion = get_mock_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+        else:
+            await suggestion_cache.add(cache_key, suggestion)
+        yield {"event": "complete", "ai_suggestion": suggestion}
+
+async def push_suggestion_stream(stream_id: str, user_id: str, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False, couple_id: Optional[str] = None):
+    """Forward a suggestion stream to the requesting user's websocket"""
+    try:
+        async for event in stream_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode, couple_id):
+            if event["event"] == "delta":
+                await manager.send_to_user(user_id, {
+                    "type": "ai_suggestion_delta",
+                    "stream_id": stream_id,
+                    "field": event["field"],
+                    "delta": event["delta"]
+                })
+            else:
+                await manager.send_to_user(user_id, {
+                    "type": "ai_suggestion_ready",
+                    "job_id": stream_id,
+                    "ai_suggestion": event["ai_suggestion"]
+                })
+    except Exception as e:
+        logger.error(f"Error streaming AI suggestion {stream_id}: {str(e)}")
+
+# Local suggestion catalog, loaded once from suggestion_catalog.json
+SUGGESTION_CATALOG_PATH = Path(os.environ.get('SUGGESTION_CATALOG_PATH', str(ROOT_DIR / 'suggestion_catalog.json')))
+# "llm" asks the LLM on cache/pool misses, "catalog" serves every suggestion from the catalog
+AI_SUGGESTION_SOURCE = os.environ.get('AI_SUGGESTION_SOURCE', 'llm')
+
+def normalize_boundary(boundary: str) -> str:
+    """Map a free-form boundary like "No photos" to the catalog tag it rules out ("photo")"""
+    tag = boundary.strip().lower().replace("-", "_").replace(" ", "_")
+    for prefix in ("no_", "not_", "avoid_"):
+        if tag.startswith(prefix):
+            tag = tag[len(prefix):]
+    if tag.endswith("s") and not tag.endswith("ss"):
+        tag = tag[:-1]
+    return tag
+
+class SuggestionCatalog:
+    """
+    Mood descriptions and offline HeatTask suggestions, indexed by (mood type, intensity band,
+    extreme mode). Entries carry precomputed tag sets so boundary filtering is a set intersection.
+    Each lookup tries the mood's primary entries, then its fallback entries, then the catch-all
+    ("*") entries, skipping any entry whose tags overlap the user's boundaries.
+    """
+    def __init__(self, data: dict):
+        self.version = data.get("version", 1)
+        extreme_moods = set(data.get("extreme_moods", []))
+        default_mood = data["default_mood"]
+        
+        # Prompt context is precomputed per (mood, extreme) pair
+        self.default_context = default_mood["context"]
+        self.default_prompt_intent = default_mood["prompt_intent"]
+        self.contexts: Dict[tuple, str] = {}
+        self.prompt_intents: Dict[tuple, str] = {}
+        for mood_type, mood in data.get("moods", {}).items():
+            for is_extreme_mode in (False, True):
+                extreme = is_extreme_mode and mood_type in extreme_moods
+                self.contexts[(mood_type, is_extreme_mode)] = mood["context"] + (data["extreme_context_suffix"] if extreme else "")
+                self.prompt_intents[(mood_type, is_extreme_mode)] = mood["prompt_intent"] + (data["extreme_prompt_suffix"] if extreme else "")
+        
+        self.entries: List[dict] = []
+        self.index: Dict[tuple, Dict[str, List[dict]]] = defaultdict(lambda: {"primary": [], "fallback": []})
+        for raw in data.get("suggestions", []):
+            entry = {
+                "suggestion": {
+                    "title": raw["title"],
+                    "description": raw["description"],
+                    "default_duration_minutes": raw["default_duration_minutes"]
+                },
+                "tags": frozenset(normalize_boundary(tag) for tag in raw.get("tags", [])),
             }
-        ]
+            self.entries.append(entry)
+            low, high = raw.get("intensity", [1, 5])
+            bands = {get_intensity_band(i) for i in range(low, high + 1)}
+            modes = [mode == "extreme" for mode in raw.get("modes", ["standard", "extreme"])]
+            for mood_type in raw["moods"]:
+                for band in bands:
+                    for is_extreme_mode in modes:
+                        self.index[(mood_type, band, is_extreme_mode)][raw.get("tier", "primary")].append(entry)
+        self.index = dict(self.index)
+    
+    @classmethod
+    def load(cls, path: Path) -> "SuggestionCatalog":
+        with open(path, encoding="utf-8") as f:
+            catalog = cls(json.load(f))
+        logger.info(f"Loaded suggestion catalog v{catalog.version} with {len(catalog.entries)} entries")
+        return catalog
+    
+    def mood_context(self, mood_type: str, is_extreme_mode: bool = False) -> str:
+        return self.contexts.get((mood_type, bool(is_extreme_mode)), self.default_context)
+    
+    def prompt_intent(self, mood_type: str, is_extreme_mode: bool = False) -> str:
+        return self.prompt_intents.get((mood_type, bool(is_extreme_mode)), self.default_prompt_intent)
+    
+    def candidates(self, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> List[dict]:
+        """All suggestions in the first non-empty tier that respect the boundaries"""
+        excluded = {normalize_boundary(b) for b in boundaries or [] if b and b.strip()}
+        band = get_intensity_band(intensity)
+        mood_buckets = self.index.get((mood_type, band, bool(is_extreme_mode)), {})
+        any_bucket = self.index.get(("*", band, bool(is_extreme_mode)), {})
+        
+        for tier in (mood_buckets.get("primary", []), mood_buckets.get("fallback", []), any_bucket.get("fallback", [])):
+            allowed = [entry["suggestion"] for entry in tier if not (entry["tags"] & excluded)] if excluded else [entry["suggestion"] for entry in tier]
+            if allowed:
+                return allowed
+        return []
     
-    return random.choice(suggestions)
+    def suggest(self, mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> dict:
+        candidates = self.candidates(mood_type, intensity, boundaries, is_extreme_mode)
+        if not candidates:
+            # Every entry clashes with a boundary; the untagged catch-all entries never should
+            candidates = [entry["suggestion"] for entry in self.entries if not entry["tags"]] or [self.entries[0]["suggestion"]]
+        return dict(random.choice(candidates))
+
+suggestion_catalog = SuggestionCatalog.load(SUGGESTION_CATALOG_PATH)
+
+def get_mood_context(mood_type: str, is_extreme_mode: bool = False) -> str:
+    """Get descriptive context for each mood type with enhanced AI prompting"""
+    return suggestion_catalog.mood_context(mood_type, is_extreme_mode)
+
+def get_mood_prompt_intent(mood_type: str, is_extreme_mode: bool = False) -> str:
+    """Get specific AI prompting intent for each mood type"""
+    return suggestion_catalog.prompt_intent(mood_type, is_extreme_mode)
+
+def get_mock_ai_suggestion(mood_type: str, intensity: int, boundaries: List[str], is_extreme_mode: bool = False) -> dict:
+    """
+    Boundary-aware suggestion from the local catalog, used as fallback and in catalog mode
+    """
+    return suggestion_catalog.suggest(mood_type, intensity, boundaries, is_extreme_mode)
+
+# Background AI suggestion jobs
+# Keep references to running tasks so they are not garbage collected mid-flight
+background_tasks = set()
+
+def run_in_background(coro):
+    """
+    Run `coro` as a task that may outlive the request that started it. It gets a fresh context,
+    so its Mongo time and logs are not attributed to that request; only the current span is
+    carried over, so the work still shows up in the request's trace.
+    """
+    context = contextvars.Context()
+    context.run(current_span.set, current_span.get())
+    task = asyncio.create_task(coro, context=context)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def generate_ai_suggestion_job(job: AISuggestionJob, boundaries: List[str]):
+    """Generate the suggestion for a mood off the request path and push it to the requester"""
+    try:
+        suggestion = await get_ai_suggestion(job.mood_type, job.intensity, boundaries, job.is_extreme_mode, couple_id=job.couple_id)
+        
+        await db.ai_suggestion_jobs.update_one(
+            {"id": job.id},
+            {"$set": {
+                "status": "ready",
+                "suggestion": suggestion,
+                "completed_at": datetime.utcnow()
+            }}
+        )
+        
+        await manager.send_to_user(job.user_id, {
+            "type": "ai_suggestion_ready",
+            "job_id": job.id,
+            "mood_id": job.mood_id,
+            "ai_suggestion": suggestion
+        })
+    except Exception as e:
+        logger.error(f"Error generating AI suggestion for job {job.id}: {str(e)}")
 
 # Authentication routes
-@api_router.post("/auth/register")
+@api_router.post("/auth/register", response_model=AuthResponse)
 async def register(user: UserCreate):
     # Check if user exists
     existing_user = await db.users.find_one({"email": user.email}, {"_id": 0})
@@ -604,18 +2350,12 @@ async def register(user: UserCreate):
     # Create token
     access_token = create_access_token(data={"sub": user_obj.id})
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": user_obj.id,
-            "email": user_obj.email,
-            "name": user_obj.name,
-            "couple_id": user_obj.couple_id
-        }
-    }
+    return AuthResponse(
+        access_token=access_token,
+        user=UserPublic(id=user_obj.id, email=user_obj.email, name=user_obj.name, couple_id=user_obj.couple_id)
+    )
 
-@api_router.post("/auth/login")
+@api_router.post("/auth/login", response_model=AuthResponse)
 async def login(user: UserLogin):
     db_user = await db.users.find_one({"email": user.email}, {"_id": 0})
     if not db_user or not verify_password(user.password, db_user["password_hash"]):
@@ -623,25 +2363,18 @@ async def login(user: UserLogin):
     
     access_token = create_access_token(data={"sub": db_user["id"]})
     
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": db_user["id"],
-            "email": db_user["email"],
-            "name": db_user["name"],
-            "couple_id": db_user.get("couple_id")
-        }
-    }
+    return AuthResponse(
+        access_token=access_token,
+        user=UserPublic(id=db_user["id"], email=db_user["email"], name=db_user["name"], couple_id=db_user.get("couple_id"))
+    )
 
-@api_router.get("/pairing/code")
+@api_router.get("/pairing/code", response_model=PairingCodeResponse)
 async def get_pairing_code(current_user: dict = Depends(get_current_user)):
     try:
         if current_user.get("couple_id"):
             raise HTTPException(status_code=400, detail="Already linked with a partner")
         
-        # Generate a simple pairing code based on user ID
-        pairing_code = current_user["id"][-6:].upper()  # Use last 6 characters of user ID
+        pairing_code = await allocate_pairing_code(current_user["id"])
         
         return {"pairing_code": pairing_code}
     except HTTPException:
@@ -650,14 +2383,13 @@ async def get_pairing_code(current_user: dict = Depends(get_current_user)):
         logger.error(f"Error getting pairing code: {str(e)}")
         raise HTTPException(status_code=500, detail="An error occurred while getting pairing code")
 
-@api_router.post("/pairing/generate")
+@api_router.post("/pairing/generate", response_model=PairingCodeGenerated)
 async def generate_pairing_code_endpoint(current_user: dict = Depends(get_current_user)):
     try:
         if current_user.get("couple_id"):
             raise HTTPException(status_code=400, detail="Already linked with a partner")
         
-        # Generate a simple pairing code based on user ID
-        pairing_code = current_user["id"][-6:].upper()  # Use last 6 characters of user ID
+        pairing_code = await allocate_pairing_code(current_user["id"], regenerate=True)
         
         return {"pairing_code": pairing_code, "message": "Pairing code generated"}
     except HTTPException:
@@ -667,47 +2399,57 @@ async def generate_pairing_code_endpoint(current_user: dict = Depends(get_curren
         raise HTTPException(status_code=500, detail="An error occurred while generating pairing code")
 
 # Pairing routes
-@api_router.post("/pairing/link")
+@api_router.post("/pairing/link", response_model=PairingLinkResponse)
 async def link_with_partner(request: PairingRequest, current_user: dict = Depends(get_current_user)):
     if current_user.get("couple_id"):
         raise HTTPException(status_code=400, detail="Already linked with a partner")
     
-    # Optimized: Use MongoDB regex query to find user with matching pairing code directly
-    # This eliminates the need to fetch 1000+ users and do Python linear search
+    # Indexed lookup on the unique pairing_codes.code index
     try:
-        partner = await db.users.find_one({
-            "$and": [
-                {"id": {"$regex": f".*{request.pairing_code.lower()}$", "$options": "i"}},
-                {"id": {"$ne": current_user["id"]}},
-                {"$or": [{"couple_id": {"$exists": False}}, {"couple_id": None}]}
-            ]
-        }, {"_id": 0})
-        
-        if not partner:
-            raise HTTPException(status_code=404, detail="Partner not found with this code")
-        
-        # Double-check that the pairing code matches the last 6 characters
-        if partner["id"][-6:].upper() != request.pairing_code.upper():
+        code = await db.pairing_codes.find_one(
+            {"code": normalize_pairing_code(request.pairing_code), "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0}
+        )
+        if not code or code["user_id"] == current_user["id"]:
             raise HTTPException(status_code=404, detail="Partner not found with this code")
         
         # Create couple
         couple = Couple(
             user1_id=current_user["id"],
-            user2_id=partner["id"],
-            pairing_code=request.pairing_code.upper()
+            user2_id=code["user_id"],
+            pairing_code=code["code"]
         )
+        unlinked = {"$or": [{"couple_id": {"$exists": False}}, {"couple_id": None}]}
         
-        await db.couples.insert_one(couple.dict())
+        async def unlink(user_ids: List[str]):
+            """Without a transaction, undo the couple_id writes this link already made"""
+            await db.users.update_many({"id": {"$in": user_ids}, "couple_id": couple.id}, {"$set": {"couple_id": None}})
         
-        # Update both users atomically
-        await db.users.update_one(
-            {"id": current_user["id"]},
-            {"$set": {"couple_id": couple.id}}
-        )
-        await db.users.update_one(
-            {"id": partner["id"]},
-            {"$set": {"couple_id": couple.id}}
-        )
+        async def link(session):
+            # Both users must still be unlinked; a concurrent link makes the update match nothing
+            for linked, user_id in enumerate([couple.user1_id, couple.user2_id]):
+                result = await db.users.update_one(
+                    {"id": user_id, **unlinked},
+                    {"$set": {"couple_id": couple.id}},
+                    session=session
+                )
+                if result.modified_count != 1:
+                    if session is None and linked:
+                        await unlink([couple.user1_id])
+                    if linked:
+                        raise HTTPException(status_code=404, detail="Partner not found with this code")
+                    raise HTTPException(status_code=400, detail="Already linked with a partner")
+            
+            try:
+                await db.couples.insert_one(couple.dict(), session=session)
+            except Exception:
+                # Both users already point at this couple id, which has no document yet
+                if session is None:
+                    await unlink([couple.user1_id, couple.user2_id])
+                raise
+            await db.pairing_codes.delete_many({"user_id": {"$in": [couple.user1_id, couple.user2_id]}}, session=session)
+        
+        await run_in_transaction(link)
         
         return {"message": "Successfully linked with partner", "couple_id": couple.id}
         
@@ -718,7 +2460,7 @@ async def link_with_partner(request: PairingRequest, current_user: dict = Depend
         raise HTTPException(status_code=500, detail="An error occurred while linking with partner")
 
 # Mood routes
-@api_router.post("/moods")
+@api_router.post("/moods", response_model=MoodCreated)
 async def create_mood(mood: MoodCreate, current_user: dict = Depends(get_current_user)):
     if not current_user.get("couple_id"):
         raise HTTPException(status_code=400, detail="Must be linked with a partner to share moods")
@@ -733,23 +2475,35 @@ async def create_mood(mood: MoodCreate, current_user: dict = Depends(get_current
         expires_at=expires_at
     )
     
-    await db.moods.insert_one(mood_obj.dict())
+    mood_doc = await insert_document(db.moods, mood_obj)
     
     # Send real-time notification to partner
     await manager.send_to_partner(current_user["id"], {
         "type": "mood_update",
-        "mood": mood_obj.dict()
+        "mood": mood_doc
     })
     
-    # If spicy mood or explicit mood, suggest AI task
-    suggestion = None
+    # If spicy mood or explicit mood, suggest AI task in the background.
+    # The suggestion is pushed over the websocket as "ai_suggestion_ready"
+    # or can be fetched from /api/ai/suggestions/{job_id}
+    job_id = None
     spicy_moods = ["feeling_spicy", "horny", "teasing", "available_for_use", "feeling_submissive", "wanna_edge", "use_me_how_you_want", "feeling_dominant", "need_attention", "bratty_mood", "worship_me"]
     if mood.mood_type in spicy_moods:
-        suggestion = await get_ai_suggestion(mood.mood_type, mood.intensity, current_user.get("boundaries", []), mood.is_extreme_mode)
+        job = AISuggestionJob(
+            couple_id=current_user["couple_id"],
+            user_id=current_user["id"],
+            mood_id=mood_obj.id,
+            mood_type=mood.mood_type,
+            intensity=mood.intensity,
+            is_extreme_mode=mood.is_extreme_mode
+        )
+        await insert_document(db.ai_suggestion_jobs, job)
+        run_in_background(generate_ai_suggestion_job(job, current_user.get("boundaries", [])))
+        job_id = job.id
     
-    return {"mood": mood_obj.dict(), "ai_suggestion": suggestion}
+    return MoodCreated(mood=mood_obj, ai_suggestion_job_id=job_id)
 
-@api_router.get("/moods")
+@api_router.get("/moods", response_model=List[Mood])
 async def get_moods(current_user: dict = Depends(get_current_user)):
     if not current_user.get("couple_id"):
         return []
@@ -762,7 +2516,7 @@ async def get_moods(current_user: dict = Depends(get_current_user)):
     return moods
 
 # Task routes
-@api_router.post("/tasks")
+@api_router.post("/tasks", response_model=Task)
 async def create_task(task: TaskCreate, current_user: dict = Depends(get_current_user)):
     if not current_user.get("couple_id"):
         raise HTTPException(status_code=400, detail="Must be linked with a partner to create tasks")
@@ -787,21 +2541,24 @@ async def create_task(task: TaskCreate, current_user: dict = Depends(get_current
         reward=task.reward,
         duration_minutes=task.duration_minutes,
         expires_at=expires_at,
-        tokens_earned=task.tokens_earned
+        tokens_earned=task.tokens_earned,
+        intensity=task.intensity,
+        is_extreme_mode=task.is_extreme_mode
     )
     
-    await db.tasks.insert_one(task_obj.dict())
+    task_doc = await insert_document(db.tasks, task_obj)
+    task_vector_index.record_task(task_doc, recent=True)
     
     # Send real-time notification to partner
     await manager.send_to_partner(current_user["id"], {
         "type": "new_task",
-        "task": task_obj.dict(),
+        "task": task_doc,
         "message": f"New HeatTask assigned: {task.title}"
     })
     
-    return task_obj.dict()
+    return task_obj
 
-@api_router.get("/tasks")
+@api_router.get("/tasks", response_model=List[Task])
 async def get_tasks(current_user: dict = Depends(get_current_user)):
     if not current_user.get("couple_id"):
         return []
@@ -812,7 +2569,7 @@ async def get_tasks(current_user: dict = Depends(get_current_user)):
     
     return tasks
 
-@api_router.patch("/tasks/{task_id}/proof")
+@api_router.patch("/tasks/{task_id}/proof", response_model=MessageResponse)
 async def submit_proof(task_id: str, proof: TaskProof, current_user: dict = Depends(get_current_user)):
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
     if not task:
@@ -863,7 +2620,7 @@ async def submit_proof(task_id: str, proof: TaskProof, current_user: dict = Depe
     
     return {"message": "Proof submitted successfully. Awaiting partner approval."}
 
-@api_router.patch("/tasks/{task_id}/approve")
+@api_router.patch("/tasks/{task_id}/approve", response_model=TaskApprovalResponse, response_model_exclude_none=True)
 async def approve_task(task_id: str, approval: TaskApproval, current_user: dict = Depends(get_current_user)):
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
     if not task:
@@ -891,6 +2648,7 @@ async def approve_task(task_id: str, approval: TaskApproval, current_user: dict
     # If approved, award tokens to the task receiver
     tokens_awarded = 0
     if approval.approved:
+        task_vector_index.record_task({**task, "status": "approved"})
         tokens_awarded = await add_tokens(
             task["receiver_id"], 
             task["couple_id"], 
@@ -922,7 +2680,7 @@ async def approve_task(task_id: str, approval: TaskApproval, current_user: dict
     return result
 
 # Token and Reward routes
-@api_router.get("/tokens")
+@api_router.get("/tokens", response_model=TokenBalance)
 async def get_tokens(current_user: dict = Depends(get_current_user)):
     """Get current token balance for the user"""
     if not current_user.get("couple_id"):
@@ -941,7 +2699,7 @@ async def get_tokens(current_user: dict = Depends(get_current_user)):
         "lifetime_tokens": user_tokens["lifetime_tokens"]
     }
 
-@api_router.get("/couple/tokens")
+@api_router.get("/couple/tokens", response_model=CoupleTokenBalances)
 async def get_couple_tokens_info(current_user: dict = Depends(get_current_user)):
     """Get token balances for both partners"""
     if not current_user.get("couple_id"):
@@ -961,7 +2719,7 @@ async def get_couple_tokens_info(current_user: dict = Depends(get_current_user))
         "partner_name": partner["name"] if partner else "Partner"
     }
 
-@api_router.post("/rewards")
+@api_router.post("/rewards", response_model=Reward)
 async def create_reward(reward: RewardCreate, current_user: dict = Depends(get_current_user)):
     """Create a new reward for the couple"""
     if not current_user.get("couple_id"):
@@ -975,18 +2733,18 @@ async def create_reward(reward: RewardCreate, current_user: dict = Depends(get_c
         tokens_cost=reward.tokens_cost
     )
     
-    await db.rewards.insert_one(reward_obj.dict())
+    reward_doc = await insert_document(db.rewards, reward_obj)
     
     # Send notification to partner
     await manager.send_to_partner(current_user["id"], {
         "type": "new_reward",
-        "reward": reward_obj.dict(),
+        "reward": reward_doc,
         "message": f"New reward added: {reward.title} ({reward.tokens_cost} tokens)"
     })
     
-    return reward_obj.dict()
+    return reward_obj
 
-@api_router.get("/rewards")
+@api_router.get("/rewards", response_model=List[Reward])
 async def get_rewards(current_user: dict = Depends(get_current_user)):
     """Get all rewards for the couple"""
     if not current_user.get("couple_id"):
@@ -998,7 +2756,7 @@ async def get_rewards(current_user: dict = Depends(get_current_user)):
     
     return rewards
 
-@api_router.post("/rewards/redeem")
+@api_router.post("/rewards/redeem", response_model=RewardRedemption)
 async def redeem_reward(redeem_data: RewardRedeem, current_user: dict = Depends(get_current_user)):
     """Redeem a reward using tokens"""
     if not current_user.get("couple_id"):
@@ -1058,7 +2816,7 @@ async def redeem_reward(redeem_data: RewardRedeem, current_user: dict = Depends(
     }
 
 # Task expiration and notification management
-@api_router.get("/tasks/active")
+@api_router.get("/tasks/active", response_model=List[ActiveTask])
 async def get_active_tasks(current_user: dict = Depends(get_current_user)):
     """Get active tasks for the user with time remaining"""
     if not current_user.get("couple_id"):
@@ -1083,7 +2841,7 @@ async def get_active_tasks(current_user: dict = Depends(get_current_user)):
     
     return tasks
 
-@api_router.post("/tasks/check-expiry")
+@api_router.post("/tasks/check-expiry", response_model=ExpiryCheckResponse)
 async def check_task_expiry(current_user: dict = Depends(get_current_user)):
     """Check for expired tasks and update their status"""
     if not current_user.get("couple_id"):
@@ -1116,7 +2874,7 @@ async def check_task_expiry(current_user: dict = Depends(get_current_user)):
     
     return {"expired_count": expired_count}
 
-@api_router.delete("/tasks/{task_id}")
+@api_router.delete("/tasks/{task_id}", response_model=MessageResponse)
 async def delete_task(task_id: str, current_user: dict = Depends(get_current_user)):
     """Delete a task (only task creator can delete)"""
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
@@ -1144,7 +2902,7 @@ async def delete_task(task_id: str, current_user: dict = Depends(get_current_use
     return {"message": "Task deleted successfully"}
 
 # Enhanced task status endpoint
-@api_router.get("/tasks/{task_id}/status")
+@api_router.get("/tasks/{task_id}/status", response_model=TaskStatusResponse)
 async def get_task_status(task_id: str, current_user: dict = Depends(get_current_user)):
     """Get detailed status of a specific task"""
     task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
@@ -1188,58 +2946,150 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
         manager.disconnect(user_id)
 
 # AI suggestion endpoint
-@api_router.post("/ai/suggest-task")
-async def suggest_task(mood_type: str, intensity: int, is_extreme_mode: bool = False, current_user: dict = Depends(get_current_user)):
+@api_router.post("/ai/suggest-task", response_model=AISuggestion, response_model_exclude_none=True)
+async def suggest_task(mood_type: str, intensity: int, is_extreme_mode: bool = False, unique: bool = False, current_user: dict = Depends(get_current_user)):
     boundaries = current_user.get("boundaries", [])
-    suggestion = await get_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode)
+    suggestion = await get_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode, unique=unique, couple_id=current_user.get("couple_id"))
     return suggestion
 
+@api_router.get("/ai/suggest-task/stream")
+async def suggest_task_stream(mood_type: str, intensity: int, is_extreme_mode: bool = False, current_user: dict = Depends(get_current_user)):
+    """Stream a suggestion as server-sent events: delta events with partial fields, then complete"""
+    boundaries = current_user.get("boundaries", [])
+    
+    async def event_source():
+        async for event in stream_ai_suggestion(mood_type, intensity, boundaries, is_extreme_mode, current_user.get("couple_id")):
+            name = event.pop("event")
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/ai/suggest-task/stream")
+async def suggest_task_stream_ws(mood_type: str, intensity: int, is_extreme_mode: bool = False, current_user: dict = Depends(get_current_user)):
+    """Stream a suggestion over the user's websocket as ai_suggestion_delta then ai_suggestion_ready messages"""
+    stream_id = str(uuid.uuid4())
+    run_in_background(push_suggestion_stream(
+        stream_id,
+        current_user["id"],
+        mood_type,
+        intensity,
+        current_user.get("boundaries", []),
+        is_extreme_mode,
+        current_user.get("couple_id")
+    ))
+    return {"stream_id": stream_id}
+
+@api_router.get("/ai/suggestions/{job_id}", response_model=AISuggestionJob)
+async def get_suggestion_job(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Get the status and result of a background AI suggestion job"""
+    job = await db.ai_suggestion_jobs.find_one({"id": job_id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Suggestion job not found")
+    
+    if job["user_id"] != current_user["id"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this suggestion")
+    
+    return job
+
 # Test endpoints
-@api_router.get("/")
+@api_router.get("/", response_model=MessageResponse)
 async def root():
     return {"message": "Pulse API is running"}
 
-@api_router.get("/health")
+@api_router.get("/health", response_model=HealthResponse)
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
-@api_router.post("/admin/setup-indexes")
+@api_router.get("/admin/ai-cache/stats", dependencies=[Depends(require_admin_token)])
+async def get_ai_cache_stats():
+    """Hit-rate metrics for the AI suggestion cache"""
+    return suggestion_cache.get_stats()
+
+@api_router.get("/admin/ai-pool/stats", dependencies=[Depends(require_admin_token)])
+async def get_ai_pool_stats():
+    """Fill levels and hit counts for the pre-generated suggestion pools"""
+    return suggestion_pool.get_stats()
+
+@api_router.get("/admin/ai-singleflight/stats", dependencies=[Depends(require_admin_token)])
+async def get_ai_singleflight_stats():
+    """How many LLM calls were collapsed into shared in-flight calls"""
+    return suggestion_singleflight.get_stats()
+
+@api_router.get("/admin/llm/stats", dependencies=[Depends(require_admin_token)])
+async def get_llm_stats():
+    """Circuit breaker state, concurrency usage and latency histograms per LLM call outcome"""
+    return {
+        "circuit_breaker": llm_circuit_breaker.get_stats(),
+        "concurrency": {
+            "limit": LLM_MAX_CONCURRENCY,
+            "in_use": llm_in_flight["calls"]
+        },
+        "timeout_seconds": LLM_TIMEOUT_SECONDS,
+        "latency": llm_latency.snapshot(),
+        "efficiency": llm_usage.snapshot()
+    }
+
+@api_router.get("/admin/ai-retrieval/stats", dependencies=[Depends(require_admin_token)])
+async def get_ai_retrieval_stats():
+    """How often suggestions were served by reusing a couple's approved tasks"""
+    return task_vector_index.get_stats()
+
+@api_router.get("/admin/mongo/stats", dependencies=[Depends(require_admin_token)])
+async def get_mongo_stats():
+    """Mongo command timings per collection, the most expensive query shapes and recent slow queries"""
+    return mongo_monitor.get_stats()
+
+@api_router.get("/admin/profiles", dependencies=[Depends(require_admin_token)])
+async def get_request_profiles():
+    """Recently profiled requests, newest first, without their per-call breakdown"""
+    return {**request_profiler.stats, "profiles": request_profiler.summaries()}
+
+@api_router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_admin_token)])
+async def get_request_profile(profile_id: str):
+    """Wall, CPU and await time of a profiled request with its slowest calls"""
+    profile = request_profiler.get(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@api_router.get("/admin/traces", dependencies=[Depends(require_admin_token)])
+async def get_recent_traces(limit: int = 50):
+    """Most recent request traces still held in the span ring buffer"""
+    return {"traces": tracer.recent_traces(limit)}
+
+@api_router.get("/admin/traces/{trace_id}", dependencies=[Depends(require_admin_token)])
+async def get_trace(trace_id: str):
+    """Every buffered span of a trace in start order, including background work it started"""
+    spans = tracer.get_trace(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return {"trace_id": trace_id, "spans": spans}
+
+@api_router.post("/admin/setup-indexes", dependencies=[Depends(require_admin_token)])
 async def setup_database_indexes():
-    """Setup database indexes for better performance"""
+    """Build indexes and apply pending migrations now, under the same lock as the startup runner"""
     try:
-        # Create index on users collection for pairing code optimization
-        await db.users.create_index("id")
-        await db.users.create_index("couple_id")
-        await db.users.create_index("email", unique=True)
-        
-        # Create indexes for couples collection
-        await db.couples.create_index("id")
-        await db.couples.create_index("pairing_code")
-        
-        # Create indexes for moods collection
-        await db.moods.create_index([("couple_id", 1), ("expires_at", 1)])
-        await db.moods.create_index([("user_id", 1), ("created_at", -1)])
-        
-        # Create indexes for tasks collection (enhanced for new features)
-        await db.tasks.create_index([("couple_id", 1), ("created_at", -1)])
-        await db.tasks.create_index([("receiver_id", 1), ("status", 1)])
-        await db.tasks.create_index([("creator_id", 1), ("status", 1)])
-        await db.tasks.create_index([("expires_at", 1), ("status", 1)])  # For expiry checks
-        
-        # Create indexes for new collections
-        # User tokens collection
-        await db.user_tokens.create_index([("user_id", 1), ("couple_id", 1)], unique=True)
-        await db.user_tokens.create_index("couple_id")
-        
-        # Rewards collection
-        await db.rewards.create_index([("couple_id", 1), ("created_at", -1)])
-        await db.rewards.create_index([("couple_id", 1), ("is_redeemed", 1)])
-        await db.rewards.create_index("creator_id")
-        
-        return {"message": "Database indexes created successfully"}
-    except Exception as e:
-        logger.error(f"Error creating indexes: {str(e)}")
+        ran = await run_migrations(raise_errors=True)
+    except Exception:
         raise HTTPException(status_code=500, detail="Failed to create database indexes")
+    if not ran:
+        raise HTTPException(status_code=409, detail="Migrations are being applied by another instance")
+    return {"message": "Database indexes created successfully"}
+
+@api_router.get("/admin/migrations", dependencies=[Depends(require_admin_token)])
+async def get_migration_status():
+    """Applied and in-progress schema migrations with backfill progress"""
+    migrations = await db.schema_migrations.find({}, {"_id": 0}).sort("version", 1).to_list(None)
+    applied = {m["version"] for m in migrations if m.get("status") == "applied"}
+    return {
+        "latest_version": MIGRATIONS[-1].version if MIGRATIONS else 0,
+        "pending": [m.version for m in MIGRATIONS if m.version not in applied],
+        "migrations": migrations
+    }
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -1252,6 +3102,732 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Negotiated response compression (zstd, brotli, gzip) for complete responses above a size threshold
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_ENCODINGS = [e.strip() for e in os.environ.get('COMPRESSION_ENCODINGS', 'zstd,br,gzip').split(',') if e.strip()]
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_THREAD_MIN_BYTES = int(os.environ.get('COMPRESSION_THREAD_MIN_BYTES', '131072'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+COMPRESSION_ZSTD_LEVEL = int(os.environ.get('COMPRESSION_ZSTD_LEVEL', '3'))
+
+# brotli and zstandard are optional; encodings whose library is missing are never negotiated
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+AVAILABLE_ENCODINGS = [
+    e for e in COMPRESSION_ENCODINGS
+    if e == "gzip" or (e == "br" and brotli is not None) or (e == "zstd" and zstandard is not None)
+]
+
+# Media that is already compressed, and event streams that must reach the client unbuffered
+INCOMPRESSIBLE_CONTENT_TYPES = ("image/", "video/", "audio/", "font/woff", "application/zip", "application/gzip",
+                                "application/x-gzip", "application/zstd", "application/pdf", "application/octet-stream",
+                                "text/event-stream")
+
+@lru_cache(maxsize=256)
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Highest-q encoding the client accepts, ties broken by COMPRESSION_ENCODINGS order"""
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip()] = q
+
+    best, best_q = None, 0.0
+    for encoding in AVAILABLE_ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compress_body(encoding: str, body: bytes, level: Optional[int] = None) -> tuple:
+    """Compressed body and the CPU seconds it took; safe to run on a worker thread"""
+    cpu_start = time.thread_time()
+    if encoding == "gzip":
+        compressed = gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL if level is None else level, mtime=0)
+    elif encoding == "br":
+        compressed = brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY if level is None else level)
+    else:
+        compressed = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL if level is None else level).compress(body)
+    return compressed, time.thread_time() - cpu_start
+
+class CompressionStats:
+    def __init__(self):
+        self.encodings = {e: {"responses": 0, "bytes_in": 0, "bytes_out": 0, "cpu_seconds": 0.0} for e in AVAILABLE_ENCODINGS}
+        self.skipped = defaultdict(int)
+
+    def record(self, encoding: str, bytes_in: int, bytes_out: int, cpu_seconds: float):
+        stats = self.encodings[encoding]
+        stats["responses"] += 1
+        stats["bytes_in"] += bytes_in
+        stats["bytes_out"] += bytes_out
+        stats["cpu_seconds"] += cpu_seconds
+
+compression_stats = CompressionStats()
+
+class CompressionMiddleware:
+    """
+    Buffers the start message until the first body chunk arrives, then compresses single-chunk
+    responses that are large enough and of a compressible type. Streamed responses pass through.
+    Every single-chunk response of a compressible type gets Vary: Accept-Encoding, including
+    small ones and those sent to clients that accept no encoding, so caches keep them apart.
+    Bodies above COMPRESSION_THREAD_MIN_BYTES are compressed on a worker thread, since
+    zlib, brotli and zstd release the GIL.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        accept_encoding = next((value for name, value in scope["headers"] if name == b"accept-encoding"), None)
+        if accept_encoding:
+            encoding = negotiate_encoding(accept_encoding.decode("latin-1"))
+
+        start_message = None
+        started = False
+
+        async def send_compressed(message):
+            nonlocal start_message, started
+            if started:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+
+            started = True
+            start_message["headers"] = list(start_message.get("headers", []))
+            headers = MutableHeaders(raw=start_message["headers"])
+            body = message.get("body", b"")
+            content_type = headers.get("content-type", "")
+
+            reason = None
+            if "content-encoding" in headers:
+                reason = "already_encoded"
+            elif content_type.startswith(INCOMPRESSIBLE_CONTENT_TYPES):
+                reason = "content_type"
+            elif message.get("more_body"):
+                reason = "streaming"
+            else:
+                # From here on the body depends on Accept-Encoding, whether or not it ends up compressed
+                headers.add_vary_header("Accept-Encoding")
+                if encoding is None:
+                    reason = "not_accepted"
+                elif len(body) < COMPRESSION_MIN_BYTES:
+                    reason = "small"
+            if reason:
+                compression_stats.skipped[reason] += 1
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= COMPRESSION_THREAD_MIN_BYTES:
+                compressed, cpu_seconds = await run_in_threadpool(compress_body, encoding, body)
+            else:
+                compressed, cpu_seconds = compress_body(encoding, body)
+
+            if len(compressed) >= len(body):
+                compression_stats.skipped["not_smaller"] += 1
+                await send(start_message)
+                await send(message)
+                return
+
+            compression_stats.record(encoding, len(body), len(compressed), cpu_seconds)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send(start_message)
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
+
+# Added before the metrics middleware so request latency includes compression time
+if COMPRESSION_ENABLED and AVAILABLE_ENCODINGS:
+    app.add_middleware(CompressionMiddleware)
+
+# Request metrics exposed in the Prometheus text format at /metrics
+HTTP_LATENCY_BUCKETS = (0.001, 0.0025) + LATENCY_BUCKETS
+
+class RouteSeries:
+    """Pre-bound histogram, status and DB-time counters for one (method, route) label set"""
+    __slots__ = ("route", "labels", "counts", "sum", "count", "statuses", "db_seconds", "db_operations")
+
+    def __init__(self, method: str, route: str):
+        self.route = route
+        self.labels = f'method="{method}",route="{route}"'
+        self.counts = [0] * (len(HTTP_LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.statuses: Dict[int, int] = {}
+        self.db_seconds = 0.0
+        self.db_operations = 0
+
+    def observe(self, status: int, seconds: float, db_time: dict):
+        self.counts[bisect_left(HTTP_LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.db_seconds += db_time["seconds"]
+        self.db_operations += db_time["operations"]
+
+def format_histogram(lines: List[str], name: str, labels: str, buckets: tuple, counts: List[int], total: float, count: int):
+    running = 0
+    for bound, n in zip(buckets, counts):
+        running += n
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {running}')
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+    lines.append(f'{name}_sum{{{labels}}} {total}')
+    lines.append(f'{name}_count{{{labels}}} {count}')
+
+class RequestMetrics:
+    """
+    Per-route latency and status counts keyed by endpoint and method. Series are bound to
+    app routes at startup, so recording a request is two dict lookups and a few increments.
+    Requests that match no route share one series to keep raw paths out of the labels.
+    """
+    def __init__(self):
+        self.routes: Dict[object, Dict[str, RouteSeries]] = {}
+        self.unmatched = RouteSeries("", "unmatched")
+        self.in_flight = 0
+
+    def bind_routes(self, routes):
+        for route in routes:
+            methods = getattr(route, "methods", None)
+            if methods:
+                self.routes[route.endpoint] = {method: RouteSeries(method, route.path) for method in methods}
+
+    def series_for(self, scope) -> RouteSeries:
+        by_method = self.routes.get(scope.get("endpoint"))
+        if by_method is None:
+            return self.unmatched
+        return by_method.get(scope["method"], self.unmatched)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP pulse_http_request_duration_seconds HTTP request latency by route",
+            "# TYPE pulse_http_request_duration_seconds histogram"
+        ]
+        all_series = [s for by_method in self.routes.values() for s in by_method.values()] + [self.unmatched]
+        for series in all_series:
+            if series.count:
+                format_histogram(lines, "pulse_http_request_duration_seconds", series.labels, HTTP_LATENCY_BUCKETS, series.counts, series.sum, series.count)
+
+        lines += ["# HELP pulse_http_requests_total HTTP responses by route and status code", "# TYPE pulse_http_requests_total counter"]
+        for series in all_series:
+            for status, n in series.statuses.items():
+                lines.append(f'pulse_http_requests_total{{{series.labels},code="{status}"}} {n}')
+
+        lines += ["# HELP pulse_http_request_db_seconds_total Mongo time spent serving requests by route", "# TYPE pulse_http_request_db_seconds_total counter"]
+        for series in all_series:
+            if series.count:
+                lines.append(f'pulse_http_request_db_seconds_total{{{series.labels}}} {series.db_seconds}')
+        lines += ["# HELP pulse_http_request_db_operations_total Mongo commands issued serving requests by route", "# TYPE pulse_http_request_db_operations_total counter"]
+        for series in all_series:
+            if series.count:
+                lines.append(f'pulse_http_request_db_operations_total{{{series.labels}}} {series.db_operations}')
+
+        with mongo_monitor.lock:
+            operations = [(f'collection="{collection}",command="{name}"', dict(op, counts=list(op["counts"]))) for (collection, name), op in mongo_monitor.operations.items()]
+        lines += ["# HELP pulse_mongo_command_duration_seconds Mongo command latency by collection", "# TYPE pulse_mongo_command_duration_seconds histogram"]
+        for labels, op in operations:
+            format_histogram(lines, "pulse_mongo_command_duration_seconds", labels, MONGO_LATENCY_BUCKETS, op["counts"], op["sum"], op["count"])
+        for name, key, help_text in [
+            ("pulse_mongo_documents_returned_total", "documents", "Documents returned or affected by Mongo commands"),
+            ("pulse_mongo_command_errors_total", "errors", "Failed Mongo commands"),
+            ("pulse_mongo_slow_commands_total", "slow", "Mongo commands slower than MONGO_SLOW_QUERY_MS")
+        ]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f"{name}{{{labels}}} {op[key]}" for labels, op in operations]
+
+        lines += ["# HELP pulse_llm_call_duration_seconds LLM call latency by outcome", "# TYPE pulse_llm_call_duration_seconds histogram"]
+        for outcome, series in llm_latency.series.items():
+            format_histogram(lines, "pulse_llm_call_duration_seconds", f'outcome="{outcome}"', llm_latency.buckets, series["counts"], series["sum"], series["count"])
+
+        for name, key, help_text in [
+            ("pulse_http_compressed_responses_total", "responses", "Responses sent compressed by encoding"),
+            ("pulse_http_compression_bytes_in_total", "bytes_in", "Response bytes before compression by encoding"),
+            ("pulse_http_compression_bytes_out_total", "bytes_out", "Response bytes after compression by encoding"),
+            ("pulse_http_compression_cpu_seconds_total", "cpu_seconds", "CPU time spent compressing responses by encoding")
+        ]:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            lines += [f'{name}{{encoding="{encoding}"}} {stats[key]}' for encoding, stats in compression_stats.encodings.items()]
+        lines += ["# HELP pulse_http_compression_skipped_total Responses left uncompressed by reason", "# TYPE pulse_http_compression_skipped_total counter"]
+        lines += [f'pulse_http_compression_skipped_total{{reason="{reason}"}} {n}' for reason, n in compression_stats.skipped.items()]
+
+        gauges = [
+            ("pulse_http_requests_in_flight", "HTTP requests currently being served", self.in_flight),
+            ("pulse_websocket_connections", "Open websocket connections", len(manager.active_connections)),
+            ("pulse_couples_online", "Couples with at least one partner connected", sum(1 for user_ids in manager.couple_connections.values() if user_ids)),
+            ("pulse_background_tasks", "Queued or running background tasks", len(background_tasks)),
+            ("pulse_suggestion_pool_pending_refills", "Suggestion pool buckets waiting for a refill", len(suggestion_pool.requested)),
+            ("pulse_llm_calls_in_flight", "LLM calls holding the concurrency budget", llm_in_flight["calls"])
+        ]
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses are timed until their last chunk"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        db_time = {"path": scope["path"], "seconds": 0.0, "operations": 0}
+        token = request_db_time.set(db_time)
+        request_metrics.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_metrics.in_flight -= 1
+            request_db_time.reset(token)
+            # The router writes the matched endpoint into the shared scope
+            request_metrics.series_for(scope).observe(status, time.perf_counter() - start, db_time)
+
+app.add_middleware(RequestMetricsMiddleware)
+
+class TracingMiddleware:
+    """Root span per sampled HTTP request; the trace id is returned in X-Trace-Id"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"traceparent"), None)
+        span = tracer.start_trace(f"{scope['method']} {scope['path']}", traceparent)
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+        span.attributes.update(root=True, method=scope["method"], path=scope["path"])
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                span.attributes["status"] = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", span.trace_id.encode())]
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            current_span.reset(token)
+            span.name = f"{scope['method']} {request_metrics.series_for(scope).route}"
+            tracer.finish(span)
+
+app.add_middleware(TracingMiddleware)
+
+class RequestContextMiddleware:
+    """Correlation id for log records, taken from X-Request-Id or generated, and echoed back"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = next((value.decode("latin-1") for name, value in scope["headers"] if name == b"x-request-id"), None) or uuid.uuid4().hex
+        token = log_context.set({"request_id": request_id})
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            log_context.reset(token)
+
+app.add_middleware(RequestContextMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=request_metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# On-demand request profiling, triggered by an admin header or by sampling
+# The middleware is only installed when one of the triggers is configured
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_ADMIN_TOKEN = os.environ.get('PROFILING_ADMIN_TOKEN', '')
+PROFILING_HISTORY_SIZE = int(os.environ.get('PROFILING_HISTORY_SIZE', '20'))
+PROFILING_TOP_FUNCTIONS = int(os.environ.get('PROFILING_TOP_FUNCTIONS', '40'))
+PROFILING_HEADER = b"x-pulse-profile"
+
+class RequestProfiler:
+    """
+    Profiles one request at a time with cProfile and keeps the last `history_size` results.
+    cProfile hooks the whole event loop thread, so requests running concurrently with a
+    profiled one show up in its breakdown; a second trigger while busy is skipped.
+    """
+    def __init__(self, history_size: int, top_functions: int):
+        self.top_functions = top_functions
+        self.profiles = deque(maxlen=history_size)
+        self.active = False
+        self.stats = {"profiled": 0, "skipped_busy": 0}
+
+    def trigger(self, scope) -> Optional[str]:
+        # Reading profiles sends the same header, which should not profile the read itself
+        if scope["path"].startswith("/api/admin/"):
+            return None
+        if PROFILING_ADMIN_TOKEN:
+            for name, value in scope["headers"]:
+                if name == PROFILING_HEADER and secrets.compare_digest(value, PROFILING_ADMIN_TOKEN.encode()):
+                    return "header"
+        if PROFILING_SAMPLE_RATE and random.random() < PROFILING_SAMPLE_RATE:
+            return "sampled"
+        return None
+
+    def breakdown(self, profile) -> List[dict]:
+        entries = sorted(pstats.Stats(profile).stats.items(), key=lambda item: item[1][3], reverse=True)
+        return [
+            {
+                "function": f"{func} ({Path(filename).name}:{line})" if line else func,
+                "primitive_calls": primitive_calls,
+                "calls": calls,
+                "own_ms": round(own * 1000, 3),
+                "cumulative_ms": round(cumulative * 1000, 3)
+            }
+            for (filename, line, func), (primitive_calls, calls, own, cumulative, _) in entries[:self.top_functions]
+        ]
+
+    def record(self, profile_id: str, trigger: str, scope, status: int, wall: float, cpu: float, profile):
+        self.stats["profiled"] += 1
+        self.profiles.append({
+            "id": profile_id,
+            "trigger": trigger,
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": status,
+            "created_at": datetime.utcnow(),
+            "wall_ms": round(wall * 1000, 3),
+            "cpu_ms": round(cpu * 1000, 3),
+            # Time the request spent suspended on Mongo, the LLM or other awaits
+            "await_ms": round(max(0.0, wall - cpu) * 1000, 3),
+            "calls": self.breakdown(profile)
+        })
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        return next((p for p in self.profiles if p["id"] == profile_id), None)
+
+    def summaries(self) -> List[dict]:
+        return [{key: value for key, value in p.items() if key != "calls"} for p in reversed(self.profiles)]
+
+request_profiler = RequestProfiler(PROFILING_HISTORY_SIZE, PROFILING_TOP_FUNCTIONS)
+
+class RequestProfilingMiddleware:
+    """Wall-clock cProfile of a triggered request; the response carries X-Profile-Id"""
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        trigger = scope["type"] == "http" and request_profiler.trigger(scope)
+        if not trigger:
+            await self.app(scope, receive, send)
+            return
+        if request_profiler.active:
+            request_profiler.stats["skipped_busy"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = str(uuid.uuid4())
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profile = cProfile.Profile()
+        request_profiler.active = True
+        start, cpu_start = time.perf_counter(), time.thread_time()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.disable()
+            wall, cpu = time.perf_counter() - start, time.thread_time() - cpu_start
+            request_profiler.active = False
+            request_profiler.record(profile_id, trigger, scope, status, wall, cpu, profile)
+
+if PROFILING_SAMPLE_RATE or PROFILING_ADMIN_TOKEN:
+    app.add_middleware(RequestProfilingMiddleware)
+
+# Database indexes and versioned migrations, applied at startup under a Mongo lock
+MIGRATIONS_ON_STARTUP = os.environ.get('MIGRATIONS_ON_STARTUP', 'true').lower() == 'true'
+MIGRATION_BATCH_SIZE = int(os.environ.get('MIGRATION_BATCH_SIZE', '500'))
+MIGRATION_BATCH_PAUSE_SECONDS = float(os.environ.get('MIGRATION_BATCH_PAUSE_SECONDS', '0.05'))
+MIGRATION_LOCK_LEASE_SECONDS = int(os.environ.get('MIGRATION_LOCK_LEASE_SECONDS', '300'))
+
+# (collection, keys, options); create_index is a no-op for indexes that already exist
+DATABASE_INDEXES = [
+    # Users collection
+    ("users", "id", {}),
+    ("users", "couple_id", {}),
+    ("users", "email", {"unique": True}),
+    
+    # Couples collection
+    ("couples", "id", {}),
+    ("couples", "pairing_code", {}),
+    
+    # Pairing codes collection
+    ("pairing_codes", "code", {"unique": True}),
+    ("pairing_codes", "user_id", {"unique": True}),
+    ("pairing_codes", "expires_at", {"expireAfterSeconds": 0}),
+    
+    # Moods collection
+    ("moods", [("couple_id", 1), ("expires_at", 1)], {}),
+    ("moods", [("user_id", 1), ("created_at", -1)], {}),
+    
+    # Tasks collection
+    ("tasks", [("couple_id", 1), ("created_at", -1)], {}),
+    ("tasks", [("receiver_id", 1), ("status", 1)], {}),
+    ("tasks", [("creator_id", 1), ("status", 1)], {}),
+    ("tasks", [("expires_at", 1), ("status", 1)], {}),  # For expiry checks
+    
+    # User tokens collection
+    ("user_tokens", [("user_id", 1), ("couple_id", 1)], {"unique": True}),
+    ("user_tokens", "couple_id", {}),
+    
+    # Rewards collection
+    ("rewards", [("couple_id", 1), ("created_at", -1)], {}),
+    ("rewards", [("couple_id", 1), ("is_redeemed", 1)], {}),
+    ("rewards", "creator_id", {}),
+    
+    # AI suggestion jobs collection
+    ("ai_suggestion_jobs", "id", {"unique": True}),
+    ("ai_suggestion_jobs", "created_at", {"expireAfterSeconds": 86400}),
+    
+    # AI suggestion cache collection
+    ("ai_suggestion_cache", "key", {"unique": True}),
+    ("ai_suggestion_cache", "expires_at", {"expireAfterSeconds": 0}),
+    
+    # Migration bookkeeping
+    ("schema_migrations", "version", {"unique": True}),
+]
+
+async def ensure_indexes():
+    for collection, keys, options in DATABASE_INDEXES:
+        await db[collection].create_index(keys, **options)
+
+def parse_stored_datetime(value):
+    """Naive UTC datetime from an ISO string as written by older clients"""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+class MigrationLock:
+    """
+    Lease-based lock document. Acquiring upserts the lock only if it is free or expired;
+    while another process holds a live lease the upsert collides on _id and fails.
+    """
+    def __init__(self, name: str, lease_seconds: int):
+        self.name = name
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    
+    async def acquire(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await db.migration_locks.update_one(
+                {"_id": self.name, "expires_at": {"$lt": now}},
+                {"$set": {"owner": self.owner, "acquired_at": now, "expires_at": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+    
+    async def renew(self):
+        await db.migration_locks.update_one(
+            {"_id": self.name, "owner": self.owner},
+            {"$set": {"expires_at": datetime.utcnow() + timedelta(seconds=self.lease_seconds)}}
+        )
+    
+    async def release(self):
+        await db.migration_locks.delete_one({"_id": self.name, "owner": self.owner})
+
+class MigrationProgress:
+    """Counts processed documents, persists and logs progress, renews the lock and throttles"""
+    def __init__(self, version: int, lock: MigrationLock):
+        self.version = version
+        self.lock = lock
+        self.processed = 0
+        self.total = 0
+    
+    async def advance(self, count: int):
+        self.processed += count
+        await db.schema_migrations.update_one(
+            {"version": self.version},
+            {"$set": {"processed": self.processed, "total": self.total, "updated_at": datetime.utcnow()}}
+        )
+        logger.info(f"Migration {self.version}: {self.processed}/{self.total} documents")
+        await self.lock.renew()
+        await asyncio.sleep(MIGRATION_BATCH_PAUSE_SECONDS)
+
+async def backfill(collection, query: dict, projection: dict, transform, progress: MigrationProgress):
+    """
+    Apply `transform(doc) -> $set fields` to every document matching `query`, walking _id in
+    order in batches of MIGRATION_BATCH_SIZE so each batch is a bounded indexed range scan.
+    """
+    progress.total += await collection.count_documents(query)
+    last_id = None
+    while True:
+        batch_query = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+        batch = await collection.find(batch_query, projection).sort("_id", 1).limit(MIGRATION_BATCH_SIZE).to_list(MIGRATION_BATCH_SIZE)
+        if not batch:
+            break
+        
+        await collection.bulk_write(
+            [UpdateOne({"_id": doc["_id"]}, {"$set": transform(doc)}) for doc in batch],
+            ordered=False
+        )
+        last_id = batch[-1]["_id"]
+        await progress.advance(len(batch))
+
+async def normalize_string_expires_at(progress: MigrationProgress):
+    for collection in (db.tasks, db.moods):
+        await backfill(
+            collection,
+            {"expires_at": {"$type": "string"}},
+            {"expires_at": 1},
+            lambda doc: {"expires_at": parse_stored_datetime(doc["expires_at"])},
+            progress
+        )
+
+class Migration:
+    """A numbered one-off data change, recorded in schema_migrations once applied"""
+    def __init__(self, version: int, name: str, run):
+        self.version = version
+        self.name = name
+        self.run = run
+
+# Append only; versions are never reused or reordered
+MIGRATIONS = [
+    Migration(1, "normalize string expires_at on tasks and moods", normalize_string_expires_at),
+    # Version 2 (an opt-in index drop) was withdrawn before release; do not reuse it
+]
+
+async def run_migrations(raise_errors: bool = False) -> bool:
+    """
+    Build indexes and apply pending migrations in version order. Only the process holding
+    the migration lock does the work; others skip and get False, since the holder finishes the job.
+    """
+    lock = MigrationLock("schema", MIGRATION_LOCK_LEASE_SECONDS)
+    if not await lock.acquire():
+        logger.info("Migrations are being applied by another instance, skipping")
+        return False
+    
+    try:
+        start = time.perf_counter()
+        await ensure_indexes()
+        logger.info(f"Ensured {len(DATABASE_INDEXES)} indexes in {(time.perf_counter() - start) * 1000:.1f}ms")
+        
+        applied = {
+            m["version"] for m in await db.schema_migrations.find({"status": "applied"}, {"_id": 0, "version": 1}).to_list(None)
+        }
+        for migration in MIGRATIONS:
+            if migration.version in applied:
+                continue
+            
+            logger.info(f"Applying migration {migration.version}: {migration.name}")
+            start = time.perf_counter()
+            await db.schema_migrations.update_one(
+                {"version": migration.version},
+                {"$set": {"name": migration.name, "status": "running", "started_at": datetime.utcnow()}},
+                upsert=True
+            )
+            progress = MigrationProgress(migration.version, lock)
+            await migration.run(progress)
+            await db.schema_migrations.update_one(
+                {"version": migration.version},
+                {"$set": {
+                    "status": "applied",
+                    "applied_at": datetime.utcnow(),
+                    "processed": progress.processed,
+                    "duration_seconds": round(time.perf_counter() - start, 3)
+                }}
+            )
+            logger.info(f"Applied migration {migration.version} ({progress.processed} documents) in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        logger.error(f"Error applying migrations: {str(e)}")
+        if raise_errors:
+            raise
+    finally:
+        await lock.release()
+    return True
+
+async def warm_mongo_pool():
+    """
+    Open MONGO_MIN_POOL_SIZE connections before the first request arrives so it does not
+    pay for server selection, TCP and auth handshakes. Failures only delay that cost.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(*(db.command("ping") for _ in range(max(1, MONGO_MIN_POOL_SIZE)))),
+            timeout=MONGO_WARMUP_TIMEOUT_SECONDS
+        )
+        logger.info(f"Mongo pool warmed with {MONGO_MIN_POOL_SIZE} connections in {(time.perf_counter() - start) * 1000:.1f}ms")
+    except Exception as e:
+        logger.warning(f"Mongo pool warmup failed: {str(e)}")
+
+@app.on_event("startup")
+async def start_background_workers():
+    request_metrics.bind_routes(app.routes)
+    tracer.start()
+    await warm_mongo_pool()
+    
+    # Index builds and backfills run off the startup path; handlers tolerate old data
+    if MIGRATIONS_ON_STARTUP:
+        run_in_background(run_migrations())
+    
+    # Precompute system prompts for every catalog mood
+    for mood_type, is_extreme_mode in suggestion_catalog.contexts:
+        get_system_prompt(mood_type, is_extreme_mode)
+    
+    # Pools can only be filled by the LLM, so skip the refill worker without a key
+    if os.environ.get('OPENAI_API_KEY'):
+        suggestion_pool.start()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await suggestion_pool.stop()
+    await llm_client_pool.close()
+    tracer.close()
+    for task in list(background_tasks):
+        task.cancel()
     client.close()
\ No newline at end of file
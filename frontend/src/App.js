@@ -1687,6 +1687,8 @@ const Dashboard = ({ user }) => {
   const [tokens, setTokens] = useState({ tokens: 0, lifetime_tokens: 0 });
   const [activeTab, setActiveTab] = useState('moods');
   const [aiSuggestion, setAiSuggestion] = useState(null);
+  const [suggestionMood, setSuggestionMood] = useState(null);
+  const [pendingSuggestionJobId, setPendingSuggestionJobId] = useState(null);
   const { logout } = useAuth();
   const { messages, notifications, dismissNotification } = useWebSocket(user.id);
 
@@ -1718,6 +1720,18 @@ const Dashboard = ({ user }) => {
     });
   }, [messages]);
 
+  useEffect(() => {
+    // AI suggestions are generated in the background and pushed when ready
+    if (!pendingSuggestionJobId) return;
+    const ready = messages.find(
+      message => message.type === 'ai_suggestion_ready' && message.job_id === pendingSuggestionJobId
+    );
+    if (ready) {
+      setAiSuggestion(ready.ai_suggestion);
+      setPendingSuggestionJobId(null);
+    }
+  }, [messages, pendingSuggestionJobId]);
+
   const fetchMoods = async () => {
     try {
       const response = await axios.get(`${API}/moods`);
@@ -1762,9 +1776,12 @@ const Dashboard = ({ user }) => {
         duration_minutes: 60,
         is_extreme_mode: extremeMode
       });
+      setSuggestionMood({ intensity: intensity, is_extreme_mode: extremeMode });
       
       if (response.data.ai_suggestion) {
         setAiSuggestion(response.data.ai_suggestion);
+      } else if (response.data.ai_suggestion_job_id) {
+        setPendingSuggestionJobId(response.data.ai_suggestion_job_id);
       }
       
       fetchMoods();
@@ -1913,7 +1930,8 @@ const Dashboard = ({ user }) => {
                       description: aiSuggestion.description,
                       reward: "AI-suggested reward based on your mood",
                       duration_minutes: aiSuggestion.default_duration_minutes,
-                      tokens_earned: 7
+                      tokens_earned: 7,
+                      ...suggestionMood
                     });
                     setAiSuggestion(null);
                   }}
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pulse - Response Compression Benchmark
+Serializes realistic list responses through the same response models the API uses, then
+compresses them with every available encoding at several levels. Reports compressed size,
+ratio, CPU time per response and throughput, so COMPRESSION_*_LEVEL can be tuned for the
+trade-off between server CPU and bytes sent to mobile clients.
+
+Payloads:
+  - tasks:        GET /api/tasks, 20 tasks with long descriptions
+  - tasks_photos: GET /api/tasks with base64 photo proofs (random bytes standing in for JPEG data)
+  - rewards:      GET /api/rewards, 50 rewards
+
+Usage:
+    python perf/compression_benchmark.py --iterations 50 --photo-kb 150 --json compression.json
+"""
+
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_benchmark")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.responses import ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+LEVELS = {"gzip": [1, 6, 9], "br": [1, 4, 11], "zstd": [1, 3, 10]}
+DESCRIPTION_WORDS = ("slowly", "candlelit", "whisper", "massage", "blindfold", "tease", "kiss", "together", "warm", "playlist")
+NOW = datetime.utcnow()
+
+
+def run_sync(coro):
+    """serialize_response never suspends for async routes, so drive it without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def render(path, docs):
+    """Response bytes exactly as the GET route at `path` would serve `docs`"""
+    field = next(r.response_field for r in server.app.routes if getattr(r, "path", None) == path and "GET" in r.methods)
+    return ORJSONResponse(run_sync(serialize_response(field=field, response_content=docs))).body
+
+
+def payloads(rng, photo_kb):
+    """Serialized bodies keyed by payload name; photos are random bytes, like JPEG data they do not compress"""
+    couple_id = str(uuid.uuid4())
+
+    def task(photo=False):
+        created_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+        return {
+            "id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": str(uuid.uuid4()), "receiver_id": str(uuid.uuid4()),
+            "title": " ".join(rng.choices(DESCRIPTION_WORDS, k=4)).capitalize(),
+            "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=rng.randint(40, 120))),
+            "duration_minutes": rng.choice([15, 30, 45, 60]), "status": "completed",
+            "proof_text": "Done, that was amazing", "proof_photo_base64": base64.b64encode(rng.randbytes(photo_kb * 1024)).decode() if photo else None,
+            "created_at": created_at, "expires_at": created_at + timedelta(hours=1), "completed_at": created_at + timedelta(minutes=30),
+            "tokens_earned": 5
+        }
+
+    rewards = [{
+        "id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": str(uuid.uuid4()),
+        "title": " ".join(rng.choices(DESCRIPTION_WORDS, k=3)).capitalize(), "description": " ".join(rng.choices(DESCRIPTION_WORDS, k=15)),
+        "tokens_cost": rng.randint(5, 50), "is_redeemed": rng.random() < 0.3, "created_at": NOW - timedelta(days=rng.randint(0, 90))
+    } for _ in range(50)]
+
+    return {
+        "tasks": render("/api/tasks", [task() for _ in range(20)]),
+        "tasks_photos": render("/api/tasks", [task(photo=i < 3) for i in range(20)]),
+        "rewards": render("/api/rewards", rewards),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--photo-kb", type=int, default=150, help="size of each photo before base64 encoding")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"🚀 Compression benchmark: encodings {', '.join(server.AVAILABLE_ENCODINGS)}, {args.iterations} iterations")
+
+    results = []
+    for name, body in payloads(rng, args.photo_kb).items():
+        print(f"\n📦 {name}: {len(body):,} bytes")
+        print(f"   {'encoding':10} {'level':>5} {'bytes':>10} {'ratio':>6} {'cpu µs':>10} {'MB/s':>8}")
+        for encoding in server.AVAILABLE_ENCODINGS:
+            for level in LEVELS[encoding]:
+                compressed, _ = server.compress_body(encoding, body, level)
+                cpu_start = time.process_time()
+                for _ in range(args.iterations):
+                    server.compress_body(encoding, body, level)
+                cpu = (time.process_time() - cpu_start) / args.iterations
+                result = {
+                    "payload": name, "encoding": encoding, "level": level, "bytes_in": len(body), "bytes_out": len(compressed),
+                    "ratio": round(len(compressed) / len(body), 3), "cpu_us": round(cpu * 1_000_000, 1),
+                    "mb_per_second": round(len(body) / cpu / 1_000_000, 1) if cpu else None
+                }
+                results.append(result)
+                print(f"   {encoding:10} {level:>5} {len(compressed):>10,} {result['ratio']:>6} {result['cpu_us']:>10} {result['mb_per_second']:>8}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Pulse - Fake LLM Server
+Local OpenAI-compatible stand-in for /v1/chat/completions, used by tests and benchmarks.
+
+Point the backend at it with:
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=fake
+
+Supports single, batched ("Generate N distinct HeatTasks") and streamed completions,
+simulated latency and connection setup cost, and reports how many TCP connections
+were opened versus requests served at GET /stats.
+"""
+
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TITLES = [
+    "Slow Dance in the Kitchen",
+    "Whispered Wishlist",
+    "Blindfolded Taste Test",
+    "Countdown Kisses",
+    "Midnight Love Letter",
+    "Mirror Compliments",
+]
+
+
+def make_suggestion():
+    return {
+        "title": f"{random.choice(TITLES)} #{random.randint(1, 9999)}",
+        "description": "Take turns following each other's lead for a few minutes, then switch and describe what you enjoyed most.",
+        "default_duration_minutes": random.choice([15, 20, 30, 45, 60]),
+    }
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_ms=50.0, connect_delay_ms=0.0):
+        super().__init__(address, FakeLLMHandler)
+        self.latency_ms = latency_ms
+        self.connect_delay_ms = connect_delay_ms
+        self.lock = threading.Lock()
+        self.stats = {"connections": 0, "requests": 0}
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def handle_error(self, request, client_address):
+        # Clients that give up mid-response (timeouts, shutdown) are expected, not errors
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, so connection reuse is observable
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        # Stand-in for TCP + TLS handshake cost paid by every new connection
+        if self.server.connect_delay_ms:
+            time.sleep(self.server.connect_delay_ms / 1000)
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self.send_json(self.server.stats)
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.endswith("/chat/completions"):
+            self.send_json({"error": "not found"}, status=404)
+            return
+
+        self.server.count("requests")
+        time.sleep(self.server.latency_ms / 1000)
+
+        prompt = " ".join(m.get("content", "") for m in request.get("messages", []))
+        batch = re.search(r"Generate (\d+) distinct", prompt)
+        if batch:
+            content = json.dumps({"suggestions": [make_suggestion() for _ in range(int(batch.group(1)))]})
+        else:
+            content = json.dumps(make_suggestion())
+
+        if request.get("stream"):
+            self.stream(content, request.get("model", "gpt-4o"))
+            return
+
+        self.send_json({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4o"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4},
+        })
+
+    def stream(self, content, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)]
+        for i, piece in enumerate(pieces + [None]):
+            delta = {"content": piece} if piece is not None else {}
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": None if piece is not None else "stop"}],
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n")
+        self.write_chunk("data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+def start_fake_llm_server(host="127.0.0.1", port=0, latency_ms=50.0, connect_delay_ms=0.0):
+    """Start the fake server on a background thread and return it"""
+    server = FakeLLMServer((host, port), latency_ms=latency_ms, connect_delay_ms=connect_delay_ms)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible fake LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Simulated completion latency")
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0, help="Simulated handshake cost per new connection")
+    args = parser.parse_args()
+
+    server = FakeLLMServer((args.host, args.port), latency_ms=args.latency_ms, connect_delay_ms=args.connect_delay_ms)
+    print(f"🤖 Fake LLM server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
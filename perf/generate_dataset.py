@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Pulse - Synthetic Dataset Generator
+Bulk-loads a local mongod with realistic, skewed data for scale testing:
+  - users (most paired into couples), with boundaries and a shared known password
+  - moods and tasks per couple, Pareto-distributed so a few couples are very active
+  - task statuses by age, text and base64 photo proofs with log-normal sizes
+  - user_tokens consistent with approved tasks and redeemed rewards, and rewards
+
+Documents are inserted with insert_many in parallel batches. The same --seed and --anchor
+always produce the same dataset. Every user can log in as user<N>@pulse.test.
+
+Usage:
+    python perf/generate_dataset.py --users 1000000 --seed 42 --drop --indexes
+"""
+
+import argparse
+import asyncio
+import base64
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+MOOD_WEIGHTS = {
+    "horny": 20, "romantic": 16, "playful": 14, "feeling_spicy": 12, "teasing": 10, "need_attention": 8,
+    "unavailable": 6, "bratty_mood": 4, "feeling_dominant": 3, "feeling_submissive": 3,
+    "available_for_use": 2, "wanna_edge": 1, "use_me_how_you_want": 1, "worship_me": 1,
+}
+BOUNDARIES = ["no photos", "no pain", "no public", "no toys", "no roleplay", "no bondage"]
+TASK_TITLES = [
+    "Slow candlelit massage", "Send a flirty voice note", "Plan a surprise date night", "Cook their favourite dinner",
+    "Write a love letter", "Dance together in the kitchen", "Shower together", "Tease them all evening",
+    "Give a foot rub", "Recreate your first date", "Wear something they picked", "Breakfast in bed",
+]
+REWARD_TITLES = ["Breakfast in bed", "Movie night pick", "Full body massage", "Skip a chore", "Date of your choice", "Sleep in"]
+
+
+def pareto_count(rng, mean, alpha, cap):
+    """Pareto-distributed non-negative integer with the given mean, so activity is heavy-tailed"""
+    scale = mean * (alpha - 1) / alpha
+    return min(cap, int(rng.paretovariate(alpha) * scale))
+
+
+def make_id(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+class DatasetGenerator:
+    """Deterministic document factory; all randomness flows from one seeded Random"""
+    def __init__(self, args, password_hash):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.anchor = args.anchor
+        self.password_hash = password_hash
+        self.moods, self.mood_weights = zip(*MOOD_WEIGHTS.items())
+        # One random blob sliced per photo proof: realistic sizes without per-proof entropy cost
+        self.photo_blob = base64.b64encode(self.rng.randbytes(args.max_proof_kb * 1024)).decode()
+
+    def user(self, n, couple_id=None):
+        return {
+            "id": make_id(self.rng),
+            "email": f"user{n}@pulse.test",
+            "name": f"User {n}",
+            "password_hash": self.password_hash,
+            "couple_id": couple_id,
+            "boundaries": self.rng.sample(BOUNDARIES, k=min(len(BOUNDARIES), int(self.rng.expovariate(1.5)))),
+            "created_at": self.anchor - timedelta(days=self.rng.randint(0, 365)),
+        }
+
+    def proof(self, status):
+        if status not in ("completed", "approved", "rejected"):
+            return None, None
+        text = self.rng.choice(["Done 😘", "Finished it, your turn", "That was fun", None])
+        if self.rng.random() >= self.args.photo_proof_ratio:
+            return text, None
+        size = min(len(self.photo_blob), int(self.rng.lognormvariate(math.log(self.args.median_proof_kb * 1024), 0.8)))
+        return text, self.photo_blob[:size]
+
+    def task(self, couple_id, creator_id, receiver_id):
+        age = timedelta(minutes=self.rng.expovariate(1 / (60 * 24 * 30)))
+        created_at = self.anchor - age
+        duration = self.rng.choice([15, 30, 60, 60, 120, 24 * 60])
+        expires_at = created_at + timedelta(minutes=duration)
+        if expires_at > self.anchor:
+            status = self.rng.choices(["pending", "completed", "approved"], [5, 3, 2])[0]
+        else:
+            status = self.rng.choices(["approved", "expired", "rejected", "completed"], [12, 5, 1, 1])[0]
+        proof_text, proof_photo = self.proof(status)
+        return {
+            "id": make_id(self.rng),
+            "couple_id": couple_id,
+            "creator_id": creator_id,
+            "receiver_id": receiver_id,
+            "title": self.rng.choice(TASK_TITLES),
+            "description": "Make it special and take your time.",
+            "reward": None,
+            "duration_minutes": duration,
+            "status": status,
+            "proof_text": proof_text,
+            "proof_photo_base64": proof_photo,
+            "created_at": created_at,
+            "expires_at": expires_at,
+            "completed_at": created_at + timedelta(minutes=duration / 2) if proof_text or proof_photo else None,
+            "approved_at": expires_at if status in ("approved", "rejected") else None,
+            "tokens_earned": self.rng.choice([3, 5, 5, 5, 10, 20]),
+            "approval_message": None,
+        }
+
+    def mood(self, couple_id, user_id):
+        created_at = self.anchor - timedelta(minutes=self.rng.expovariate(1 / (60 * 24 * 14)))
+        return {
+            "id": make_id(self.rng),
+            "couple_id": couple_id,
+            "user_id": user_id,
+            "mood_type": self.rng.choices(self.moods, self.mood_weights)[0],
+            "intensity": self.rng.choices([1, 2, 3, 4, 5], [1, 2, 4, 3, 2])[0],
+            "expires_at": created_at + timedelta(minutes=self.rng.choice([30, 60, 60, 120, 240])),
+            "created_at": created_at,
+        }
+
+    def couple(self, n):
+        """Yield (collection, document) pairs for one couple and all of its activity"""
+        couple_id = make_id(self.rng)
+        users = [self.user(n, couple_id), self.user(n + 1, couple_id)]
+        yield "couples", {
+            "id": couple_id, "user1_id": users[0]["id"], "user2_id": users[1]["id"],
+            "pairing_code": "".join(self.rng.choices("ABCDEFGHJKLMNPQRSTUVWXYZ23456789", k=6)),
+            "created_at": max(u["created_at"] for u in users),
+        }
+        for user in users:
+            yield "users", user
+
+        earned = Counter()
+        for _ in range(pareto_count(self.rng, self.args.tasks_per_couple, 1.3, self.args.max_tasks_per_couple)):
+            creator, receiver = self.rng.sample(users, 2)
+            task = self.task(couple_id, creator["id"], receiver["id"])
+            if task["status"] == "approved":
+                earned[receiver["id"]] += task["tokens_earned"]
+            yield "tasks", task
+
+        for _ in range(pareto_count(self.rng, self.args.moods_per_couple, 1.5, self.args.max_tasks_per_couple)):
+            yield "moods", self.mood(couple_id, self.rng.choice(users)["id"])
+
+        spent = Counter()
+        for _ in range(pareto_count(self.rng, self.args.rewards_per_couple, 2.0, 200)):
+            creator, redeemer = self.rng.sample(users, 2)
+            cost = self.rng.choice([5, 10, 15, 25, 50])
+            redeemed = spent[redeemer["id"]] + cost <= earned[redeemer["id"]] and self.rng.random() < 0.4
+            if redeemed:
+                spent[redeemer["id"]] += cost
+            yield "rewards", {
+                "id": make_id(self.rng),
+                "couple_id": couple_id,
+                "creator_id": creator["id"],
+                "title": self.rng.choice(REWARD_TITLES),
+                "description": "Redeem whenever you like.",
+                "tokens_cost": cost,
+                "is_redeemed": redeemed,
+                "redeemed_by": redeemer["id"] if redeemed else None,
+                "redeemed_at": self.anchor - timedelta(days=self.rng.randint(0, 30)) if redeemed else None,
+                "created_at": self.anchor - timedelta(days=self.rng.randint(0, 90)),
+            }
+
+        for user in users:
+            if earned[user["id"]]:
+                yield "user_tokens", {
+                    "id": make_id(self.rng),
+                    "couple_id": couple_id,
+                    "user_id": user["id"],
+                    "tokens": earned[user["id"]] - spent[user["id"]],
+                    "lifetime_tokens": earned[user["id"]],
+                    "updated_at": self.anchor,
+                }
+
+    def documents(self):
+        paired_users = int(self.args.users * self.args.paired_ratio) // 2 * 2
+        for n in range(0, paired_users, 2):
+            yield from self.couple(n)
+        for n in range(paired_users, self.args.users):
+            yield "users", self.user(n)
+
+
+class BatchWriter:
+    """Buffers documents per collection and runs up to `workers` insert_many batches at once"""
+    def __init__(self, db, batch_size, workers):
+        self.db = db
+        self.batch_size = batch_size
+        self.semaphore = asyncio.Semaphore(workers)
+        self.buffers = defaultdict(list)
+        self.pending = set()
+        self.inserted = Counter()
+        self.bytes = Counter()
+
+    async def add(self, collection, doc):
+        buffer = self.buffers[collection]
+        buffer.append(doc)
+        if len(buffer) >= self.batch_size:
+            await self.flush(collection)
+
+    async def flush(self, collection):
+        docs, self.buffers[collection] = self.buffers[collection], []
+        if not docs:
+            return
+        await self.semaphore.acquire()  # Backpressure: generation waits while all workers are busy
+        task = asyncio.create_task(self.insert(collection, docs))
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def insert(self, collection, docs):
+        try:
+            await self.db[collection].insert_many(docs, ordered=False)
+            self.inserted[collection] += len(docs)
+            if collection == "tasks":
+                self.bytes["proofs"] += sum(len(d["proof_photo_base64"] or "") for d in docs)
+        finally:
+            self.semaphore.release()
+
+    async def close(self):
+        for collection in list(self.buffers):
+            await self.flush(collection)
+        await asyncio.gather(*self.pending)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--paired-ratio", type=float, default=0.9, help="share of users linked into couples")
+    parser.add_argument("--tasks-per-couple", type=float, default=40, help="mean; the distribution is heavy-tailed")
+    parser.add_argument("--moods-per-couple", type=float, default=30, help="mean; the distribution is heavy-tailed")
+    parser.add_argument("--rewards-per-couple", type=float, default=4)
+    parser.add_argument("--max-tasks-per-couple", type=int, default=20000)
+    parser.add_argument("--photo-proof-ratio", type=float, default=0.3)
+    parser.add_argument("--median-proof-kb", type=int, default=60)
+    parser.add_argument("--max-proof-kb", type=int, default=500)
+    parser.add_argument("--password", default="password123", help="password of every generated user")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor", type=datetime.fromisoformat,
+                        default=datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+                        help="'now' of the dataset (default: today 00:00 UTC); fix it to reproduce a dataset exactly")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default=os.environ.get("DB_NAME", "pulse_scale"))
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=8, help="concurrent insert_many batches")
+    parser.add_argument("--drop", action="store_true", help="drop the database first")
+    parser.add_argument("--indexes", action="store_true", help="build server.DATABASE_INDEXES after loading")
+    args = parser.parse_args()
+
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ.setdefault("DB_NAME", args.db)
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+
+    client = AsyncIOMotorClient(args.mongo_url, maxPoolSize=args.workers * 2)
+    db = client[args.db]
+    if args.drop:
+        await client.drop_database(args.db)
+        print(f"🗑️  Dropped {args.db}")
+
+    print(f"🚀 Generating {args.users:,} users into {args.db} (seed {args.seed}, anchor {args.anchor.isoformat()})")
+    generator = DatasetGenerator(args, server.get_password_hash(args.password))
+    writer = BatchWriter(db, args.batch_size, args.workers)
+
+    start = last_report = time.perf_counter()
+    generated = 0
+    for collection, doc in generator.documents():
+        await writer.add(collection, doc)
+        generated += 1
+        if time.perf_counter() - last_report >= 5:
+            last_report = time.perf_counter()
+            print(f"   {generated:,} documents generated, {sum(writer.inserted.values()):,} inserted "
+                  f"({sum(writer.inserted.values()) / (last_report - start):,.0f} docs/s)")
+    await writer.close()
+    load_seconds = time.perf_counter() - start
+
+    print(f"\n📊 Loaded in {load_seconds:.1f}s ({sum(writer.inserted.values()) / load_seconds:,.0f} docs/s)")
+    for collection, count in sorted(writer.inserted.items()):
+        print(f"   {collection:12} {count:>12,}")
+    print(f"   photo proofs {writer.bytes['proofs'] / 1024 / 1024:>10,.1f} MB")
+
+    if args.indexes:
+        start = time.perf_counter()
+        for collection, keys, options in server.DATABASE_INDEXES:
+            await db[collection].create_index(keys, **options)
+        print(f"\n🗂️  Built {len(server.DATABASE_INDEXES)} indexes in {time.perf_counter() - start:.1f}s")
+
+    print(f"\n✅ Log in as user0@pulse.test / {args.password}")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Pulse - LLM Connection Reuse Benchmark
+Compares a fresh OpenAI client per call (the old one-LlmChat-per-request pattern) with the
+backend's pooled keep-alive client, against the local fake LLM server.
+
+Usage:
+    python perf/llm_connection_benchmark.py --calls 200 --concurrency 4 --connect-delay-ms 30
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from fake_llm_server import start_fake_llm_server
+
+
+def server_stats(server):
+    """Connection/request counters; the stats request itself opens one connection"""
+    with urllib.request.urlopen(server.base_url.replace("/v1", "/stats")) as response:
+        return json.loads(response.read())
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def run_calls(call, calls, concurrency):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return latencies, time.perf_counter() - start
+
+
+def report(name, latencies, elapsed, connections, requests):
+    print(f"\n📊 {name}")
+    print(f"   calls: {len(latencies)}  wall: {elapsed:.2f}s  throughput: {len(latencies) / elapsed:.1f}/s")
+    print(f"   latency p50: {percentile(latencies, 0.5) * 1000:.1f}ms  p95: {percentile(latencies, 0.95) * 1000:.1f}ms  mean: {statistics.mean(latencies) * 1000:.1f}ms")
+    print(f"   connections opened: {connections} for {requests} requests")
+    return {"p50_ms": percentile(latencies, 0.5) * 1000, "mean_ms": statistics.mean(latencies) * 1000, "connections": connections}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--connect-delay-ms", type=float, default=30.0, help="Simulated TCP+TLS handshake cost")
+    args = parser.parse_args()
+
+    fake = start_fake_llm_server(latency_ms=args.latency_ms, connect_delay_ms=args.connect_delay_ms)
+    os.environ["OPENAI_API_KEY"] = "fake"
+    os.environ["OPENAI_BASE_URL"] = fake.base_url
+    os.environ["LLM_CLIENT"] = "pooled"
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.concurrency)
+    os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", "pulse_benchmark")
+
+    sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+    import httpx
+    from openai import AsyncOpenAI
+    import server
+
+    system_message, user_prompt = server.build_suggestion_prompts("horny", 3, [], False)
+    messages = [{"role": "system", "content": system_message}, {"role": "user", "content": user_prompt}]
+
+    async def fresh_client_call():
+        client = AsyncOpenAI(api_key="fake", base_url=fake.base_url, max_retries=0, http_client=httpx.AsyncClient())
+        try:
+            await client.chat.completions.create(model="gpt-4o", max_tokens=500, messages=messages)
+        finally:
+            await client.close()
+
+    async def pooled_call():
+        await server.call_llm(system_message, user_prompt)
+
+    print(f"🚀 {args.calls} calls, concurrency {args.concurrency}, latency {args.latency_ms}ms, handshake {args.connect_delay_ms}ms")
+
+    before = server_stats(fake)
+    latencies, elapsed = await run_calls(fresh_client_call, args.calls, args.concurrency)
+    after = server_stats(fake)
+    fresh = report("Fresh client per call", latencies, elapsed, after["connections"] - before["connections"] - 1, after["requests"] - before["requests"])
+
+    before = after
+    latencies, elapsed = await run_calls(pooled_call, args.calls, args.concurrency)
+    after = server_stats(fake)
+    pooled = report("Pooled keep-alive client", latencies, elapsed, after["connections"] - before["connections"] - 1, after["requests"] - before["requests"])
+    await server.llm_client_pool.close()
+
+    print(f"\n✅ Connections saved: {fresh['connections'] - pooled['connections']}  "
+          f"mean latency saved: {fresh['mean_ms'] - pooled['mean_ms']:.1f}ms per call")
+    fake.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Pulse - Load Test Harness
+Simulates N couples running the full app flow against the backend with a local mongod and
+the fake LLM server, while both partners listen on /ws/{user_id}:
+
+    mood -> AI suggestion -> task -> proof -> approve -> reward -> redeem (+ reads)
+
+Each API call is timed per route template, and each websocket notification is timed from
+the start of the request that triggered it to its arrival at the partner's socket.
+Reports throughput and p50/p95/p99 per route and per websocket message type.
+
+Modes:
+  asgi     (default) drive server.app in-process through httpx's ASGI transport and a
+           minimal in-process ASGI websocket client; no sockets, no extra dependencies
+  uvicorn  serve server.app with uvicorn inside this process and connect over TCP
+           (needs the `websockets` package)
+  --url    target an already running backend instead (configure its LLM yourself)
+
+Usage:
+    python perf/load_test.py --couples 50 --iterations 10 --llm-latency-ms 300 --json load.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyRecorder:
+    """Raw latency samples and error counts per label"""
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, label, seconds, ok=True):
+        self.samples[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def report(self, title, elapsed):
+        rows = {}
+        print(f"\n📊 {title}")
+        print(f"   {'label':44} {'count':>7} {'err':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        for label in sorted(self.samples):
+            values = self.samples[label]
+            row = {
+                "count": len(values),
+                "errors": self.errors[label],
+                "throughput": round(len(values) / elapsed, 2),
+                "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+                "max_ms": round(max(values) * 1000, 2),
+            }
+            rows[label] = row
+            print(f"   {label:44} {row['count']:>7} {row['errors']:>5} {row['throughput']:>8} {row['p50_ms']:>8} "
+                  f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+        return rows
+
+
+class AsgiWebSocket:
+    """Minimal in-process ASGI websocket client: feeds connect/disconnect events and collects sends"""
+    def __init__(self, app, path):
+        self.app = app
+        self.path = path
+        self.to_app = asyncio.Queue()
+        self.messages = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.task = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(b"host", b"loadtest")], "client": ("127.0.0.1", 0), "server": ("loadtest", 80),
+            "subprotocols": [],
+        }
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                self.messages.put_nowait((time.perf_counter(), message.get("text") or message["bytes"].decode()))
+            elif message["type"] in ("websocket.accept", "websocket.close"):
+                self.accepted.set()
+
+        self.to_app.put_nowait({"type": "websocket.connect"})
+        self.task = asyncio.create_task(self.app(scope, self.to_app.get, send))
+        await self.accepted.wait()
+
+    async def close(self):
+        self.to_app.put_nowait({"type": "websocket.disconnect", "code": 1000})
+        await asyncio.wait([self.task], timeout=1)
+
+
+class TcpWebSocket:
+    """Same interface over a real socket, using the websockets client library"""
+    def __init__(self, url):
+        self.url = url
+        self.messages = asyncio.Queue()
+        self.connection = None
+        self.reader = None
+
+    async def connect(self):
+        import websockets
+        self.connection = await websockets.connect(self.url, max_size=None)
+
+        async def read():
+            async for text in self.connection:
+                self.messages.put_nowait((time.perf_counter(), text))
+
+        self.reader = asyncio.create_task(read())
+
+    async def close(self):
+        await self.connection.close()
+        self.reader.cancel()
+
+
+class Couple:
+    """Two registered and linked users, each with a websocket listener"""
+    def __init__(self, harness, index):
+        self.harness = harness
+        self.index = index
+        self.users = []
+        self.sockets = []
+
+    async def setup(self):
+        run = self.harness.run_id
+        for n in range(2):
+            response = await self.harness.call("POST", "/api/auth/register", "POST /api/auth/register", json={
+                "email": f"load_{run}_{self.index}_{n}@pulse.test", "name": f"Load {self.index}.{n}", "password": "loadtest123"
+            })
+            data = response.json()
+            self.users.append({"id": data["user"]["id"], "headers": {"Authorization": f"Bearer {data['access_token']}"}})
+
+        code = (await self.harness.call("GET", "/api/pairing/code", "GET /api/pairing/code", headers=self.users[0]["headers"])).json()["pairing_code"]
+        await self.harness.call("POST", "/api/pairing/link", "POST /api/pairing/link", headers=self.users[1]["headers"], json={"pairing_code": code})
+
+        for user in self.users:
+            websocket = self.harness.open_websocket(user["id"])
+            await websocket.connect()
+            self.sockets.append(websocket)
+
+    async def expect(self, user_index, message_type, since):
+        """Wait for a message type on a partner's socket and record its delivery latency"""
+        messages = self.sockets[user_index].messages
+        deadline = since + self.harness.args.ws_timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            try:
+                received_at, text = await asyncio.wait_for(messages.get(), timeout=max(remaining, 0.001))
+            except asyncio.TimeoutError:
+                self.harness.ws_latency.record(f"ws {message_type}", self.harness.args.ws_timeout, ok=False)
+                return
+            try:
+                message = json.loads(text)
+            except ValueError:
+                continue
+            if message.get("type") == message_type:
+                self.harness.ws_latency.record(f"ws {message_type}", received_at - since)
+                return
+
+    async def step(self, user_index, method, path, label, expect=None, **kwargs):
+        """One API call by a partner, optionally followed by the websocket message it should trigger"""
+        start = time.perf_counter()
+        response = await self.harness.call(method, path, label, headers=self.users[user_index]["headers"], **kwargs)
+        if expect and response.status_code < 400:
+            await self.expect(1 - user_index, expect, start)
+        if self.harness.args.think_ms:
+            await asyncio.sleep(self.harness.args.think_ms / 1000)
+        return response
+
+    async def flow(self):
+        a, b = 0, 1
+        await self.step(a, "POST", "/api/moods", "POST /api/moods", expect="mood_update",
+                        json={"mood_type": "horny", "intensity": 3, "duration_minutes": 60})
+        suggestion = (await self.step(a, "POST", "/api/ai/suggest-task", "POST /api/ai/suggest-task",
+                                      params={"mood_type": "romantic", "intensity": 3})).json()
+
+        task = await self.step(a, "POST", "/api/tasks", "POST /api/tasks", expect="new_task", json={
+            "title": suggestion.get("title", "Load test task"),
+            "description": suggestion.get("description", "Generated by the load test"),
+            "duration_minutes": 60, "tokens_earned": 5
+        })
+        task_id = task.json()["id"]
+        await self.step(b, "GET", "/api/tasks/active", "GET /api/tasks/active")
+        await self.step(b, "PATCH", f"/api/tasks/{task_id}/proof", "PATCH /api/tasks/{task_id}/proof",
+                        expect="task_completed", json={"proof_text": "Done"})
+        await self.step(a, "PATCH", f"/api/tasks/{task_id}/approve", "PATCH /api/tasks/{task_id}/approve",
+                        expect="task_approved", json={"approved": True, "message": "Perfect"})
+
+        reward = await self.step(a, "POST", "/api/rewards", "POST /api/rewards", expect="new_reward",
+                                 json={"title": "Breakfast in bed", "description": "Load test reward", "tokens_cost": 5})
+        await self.step(b, "POST", "/api/rewards/redeem", "POST /api/rewards/redeem", expect="reward_redeemed",
+                        json={"reward_id": reward.json()["id"]})
+
+        for path in ("/api/tokens", "/api/couple/tokens", "/api/moods", "/api/tasks", "/api/rewards"):
+            await self.step(b, "GET", path, f"GET {path}")
+
+    async def close(self):
+        for websocket in self.sockets:
+            await websocket.close()
+
+
+class Harness:
+    def __init__(self, args, http, open_websocket):
+        self.args = args
+        self.http = http
+        self.open_websocket = open_websocket
+        self.run_id = uuid.uuid4().hex[:8]
+        self.http_latency = LatencyRecorder()
+        self.ws_latency = LatencyRecorder()
+        self.recording = False
+
+    async def call(self, method, path, label, **kwargs):
+        start = time.perf_counter()
+        response = await self.http.request(method, path, **kwargs)
+        if self.recording:
+            self.http_latency.record(label, time.perf_counter() - start, ok=response.status_code < 400)
+        elif response.status_code >= 400:
+            raise RuntimeError(f"Setup call {label} failed: {response.status_code} {response.text[:200]}")
+        return response
+
+
+async def run(args, harness):
+    couples = [Couple(harness, i) for i in range(args.couples)]
+    start = time.perf_counter()
+    for batch in range(0, len(couples), args.setup_concurrency):
+        await asyncio.gather(*(c.setup() for c in couples[batch:batch + args.setup_concurrency]))
+    await asyncio.sleep(0.5)  # let every socket finish registering with its couple
+    print(f"👥 {len(couples)} couples registered, linked and listening in {time.perf_counter() - start:.1f}s")
+
+    async def couple_loop(couple):
+        for _ in range(args.iterations):
+            await couple.flow()
+
+    harness.recording = True
+    start = time.perf_counter()
+    await asyncio.gather(*(couple_loop(c) for c in couples))
+    elapsed = time.perf_counter() - start
+    harness.recording = False
+
+    total_requests = sum(len(v) for v in harness.http_latency.samples.values())
+    print(f"⏱️  {args.iterations} flows x {len(couples)} couples: {total_requests} requests in {elapsed:.1f}s "
+          f"({total_requests / elapsed:.1f} req/s)")
+    results = {
+        "elapsed_seconds": round(elapsed, 2),
+        "requests_per_second": round(total_requests / elapsed, 2),
+        "routes": harness.http_latency.report("HTTP routes", elapsed),
+        "websocket": harness.ws_latency.report("Websocket deliveries (request start -> partner socket)", elapsed),
+    }
+
+    for couple in couples:
+        await couple.close()
+    return results
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--couples", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=5, help="full flows per couple")
+    parser.add_argument("--think-ms", type=float, default=0, help="pause between steps of a flow")
+    parser.add_argument("--setup-concurrency", type=int, default=20)
+    parser.add_argument("--ws-timeout", type=float, default=5.0, help="seconds before a delivery counts as lost")
+    parser.add_argument("--mode", choices=["asgi", "uvicorn"], default="asgi")
+    parser.add_argument("--url", help="target a running backend instead of an in-process one")
+    parser.add_argument("--llm", choices=["fake", "catalog"], default="fake", help="fake LLM server or catalog-only suggestions")
+    parser.add_argument("--llm-latency-ms", type=float, default=300)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="pulse_loadtest")
+    parser.add_argument("--keep", action="store_true", help="keep the database instead of dropping it first")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    import httpx
+
+    if args.url:
+        base_url = args.url.rstrip("/")
+        ws_base = base_url.replace("http", "ws", 1)
+        async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+            harness = Harness(args, http, lambda user_id: TcpWebSocket(f"{ws_base}/ws/{user_id}"))
+            results = await run(args, harness)
+    else:
+        fake = None
+        if args.llm == "fake":
+            from fake_llm_server import start_fake_llm_server
+            fake = start_fake_llm_server("127.0.0.1", latency_ms=args.llm_latency_ms)
+            os.environ["OPENAI_API_KEY"] = "fake"
+            os.environ["OPENAI_BASE_URL"] = fake.base_url
+            os.environ["LLM_CLIENT"] = "pooled"
+        else:
+            os.environ["AI_SUGGESTION_SOURCE"] = "catalog"
+        os.environ["MONGO_URL"] = args.mongo_url
+        os.environ["DB_NAME"] = args.db
+        import server
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        if not args.keep:
+            await server.client.drop_database(args.db)
+        print(f"🚀 {args.mode} mode, {args.couples} couples, LLM: {args.llm}"
+              f"{f' ({args.llm_latency_ms:.0f}ms)' if fake else ''}, db: {args.db}")
+
+        if args.mode == "asgi":
+            await server.app.router.startup()
+            try:
+                transport = httpx.ASGITransport(app=server.app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=30) as http:
+                    harness = Harness(args, http, lambda user_id: AsgiWebSocket(server.app, f"/ws/{user_id}"))
+                    results = await run(args, harness)
+            finally:
+                await server.app.router.shutdown()
+        else:
+            import uvicorn
+            port = free_port()
+            uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, host="127.0.0.1", port=port, log_level="warning", ws="websockets"))
+            serving = asyncio.create_task(uvicorn_server.serve())
+            while not uvicorn_server.started:
+                await asyncio.sleep(0.05)
+            try:
+                async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as http:
+                    harness = Harness(args, http, lambda user_id: TcpWebSocket(f"ws://127.0.0.1:{port}/ws/{user_id}"))
+                    results = await run(args, harness)
+            finally:
+                uvicorn_server.should_exit = True
+                await serving
+
+        if fake:
+            fake.shutdown()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+
+    lost = sum(harness.ws_latency.errors.values())
+    failed = sum(harness.http_latency.errors.values())
+    print(f"\n{'✅' if not (lost or failed) else '⚠️ '} {failed} failed requests, {lost} lost websocket deliveries")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Pulse - Logging Pipeline Benchmark
+Emits an error storm from concurrent coroutines, the way LLM failures falling back to mock
+suggestions do, and compares:
+  - sync:     a handler writing from the event loop, as logging.basicConfig did
+  - queue:    the backend's queue handler with its background writer thread
+  - sampled:  the queue pipeline with per-call-site sampling enabled
+
+For each mode it reports log-call throughput, how long the writer took to drain, records
+written or dropped, and event-loop stall time measured by a 1ms ticker task. The sink can
+be slowed down per write to mimic a blocked stderr pipe or log shipper.
+
+Usage:
+    python perf/logging_benchmark.py --records 20000 --concurrency 50 --sink-latency-us 50 --json logging.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_benchmark")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+TICK_SECONDS = 0.001
+
+
+class SlowSink(logging.Handler):
+    """Formats and writes every record to /dev/null, sleeping `latency` seconds per write"""
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+        self.stream = open(os.devnull, "w")
+        self.written = 0
+
+    def emit(self, record):
+        self.stream.write(self.format(record) + "\n")
+        if self.latency:
+            time.sleep(self.latency)
+        self.written += 1
+
+
+async def ticker(lateness, stop):
+    """Sleep TICK_SECONDS at a time and record how late each wakeup is"""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_SECONDS
+        await asyncio.sleep(TICK_SECONDS)
+        lateness.append(max(0.0, loop.time() - expected))
+
+
+async def storm(logger, records, concurrency):
+    """Each worker logs an error per simulated request and yields, returning time spent in log calls"""
+    per_worker = records // concurrency
+    spent = []
+
+    async def worker(n):
+        total = 0.0
+        for i in range(per_worker):
+            start = time.perf_counter()
+            logger.error(f"Error getting AI suggestion: upstream returned 503 (worker {n}, request {i})")
+            total += time.perf_counter() - start
+            await asyncio.sleep(0)
+        spent.append(total)
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return per_worker * concurrency, sum(spent)
+
+
+async def run_mode(mode, args):
+    sink = SlowSink(args.sink_latency_us / 1_000_000)
+    logger = logging.getLogger(f"pulse.benchmark.{mode}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+    listener = None
+    queue_handler = None
+    if mode == "sync":
+        sink.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        logger.addHandler(sink)
+    else:
+        sink.setFormatter(server.JsonFormatter())
+        burst = args.sample_burst if mode == "sampled" else 0
+        queue_handler, listener = server.build_log_pipeline(sink, queue_size=args.queue_size, burst=burst, window_seconds=60)
+        logger.addHandler(queue_handler)
+        listener.start()
+
+    lateness, stop = [], asyncio.Event()
+    tick_task = asyncio.create_task(ticker(lateness, stop))
+    await asyncio.sleep(0.05)
+
+    start = time.perf_counter()
+    emitted, log_call_seconds = await storm(logger, args.records, args.concurrency)
+    storm_seconds = time.perf_counter() - start
+
+    stop.set()
+    await tick_task
+
+    drain_start = time.perf_counter()
+    if listener:
+        listener.stop()
+    drain_seconds = time.perf_counter() - drain_start
+    logger.handlers = []
+
+    lateness_ms = sorted(t * 1000 for t in lateness) or [0.0]
+    return {
+        "mode": mode,
+        "emitted": emitted,
+        "written": sink.written,
+        "dropped": queue_handler.dropped if queue_handler else 0,
+        "storm_ms": round(storm_seconds * 1000, 1),
+        "log_calls_per_second": round(emitted / log_call_seconds) if log_call_seconds else None,
+        "mean_log_call_us": round(log_call_seconds / emitted * 1_000_000, 2),
+        "drain_ms": round(drain_seconds * 1000, 1),
+        "loop_stall_p50_ms": round(statistics.median(lateness_ms), 3),
+        "loop_stall_p99_ms": round(lateness_ms[min(len(lateness_ms) - 1, int(len(lateness_ms) * 0.99))], 3),
+        "loop_stall_max_ms": round(lateness_ms[-1], 3),
+        "ticks": len(lateness)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, default=50, help="coroutines logging at the same time")
+    parser.add_argument("--sink-latency-us", type=float, default=20.0, help="extra time each write takes in the sink")
+    parser.add_argument("--queue-size", type=int, default=server.LOG_QUEUE_SIZE)
+    parser.add_argument("--sample-burst", type=int, default=server.LOG_SAMPLE_BURST, help="records per call site kept in sampled mode")
+    parser.add_argument("--modes", default="sync,queue,sampled")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    print(f"🚀 Logging benchmark: {args.records} records from {args.concurrency} coroutines, "
+          f"sink latency {args.sink_latency_us}µs per write")
+
+    results = []
+    for mode in args.modes.split(","):
+        result = asyncio.run(run_mode(mode.strip(), args))
+        results.append(result)
+        print(f"\n📝 {result['mode']}")
+        print(f"   log calls: {result['log_calls_per_second']}/s (mean {result['mean_log_call_us']}µs), storm {result['storm_ms']}ms")
+        print(f"   written {result['written']}/{result['emitted']}, dropped {result['dropped']}, drain {result['drain_ms']}ms")
+        print(f"   loop stall p50 {result['loop_stall_p50_ms']}ms, p99 {result['loop_stall_p99_ms']}ms, "
+              f"max {result['loop_stall_max_ms']}ms over {result['ticks']} ticks")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
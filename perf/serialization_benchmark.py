@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Pulse - Response Serialization Benchmark
+Measures CPU time to turn the documents behind the list endpoints into response bytes:
+  - before: untyped dicts through jsonable_encoder and the stdlib JSONResponse
+  - after:  the route's response model (pydantic-core) and ORJSONResponse, as served now
+
+It also compares encoding a websocket notification with jsonable_encoder plus json.dumps
+against encode_message. Documents are generated in memory, so no Mongo is needed.
+
+Usage:
+    python perf/serialization_benchmark.py --iterations 2000 --json serialization.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_benchmark")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+NOW = datetime.utcnow()
+
+
+def run_sync(coro):
+    """serialize_response never suspends for async routes, so drive it without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def task_doc(rng, couple_id, status=None):
+    created_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+    status = status or rng.choice(["pending", "completed", "approved", "rejected", "expired"])
+    return {
+        "id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": str(uuid.uuid4()), "receiver_id": str(uuid.uuid4()),
+        "title": "Slow candlelit massage", "description": "Take turns giving a slow massage by candlelight. " * rng.randint(1, 4),
+        "reward": None, "duration_minutes": rng.choice([15, 30, 45, 60]), "status": status,
+        "proof_text": "Done!" if status != "pending" else None, "proof_photo_base64": None,
+        "created_at": created_at, "expires_at": created_at + timedelta(hours=1),
+        "completed_at": created_at + timedelta(minutes=40) if status != "pending" else None,
+        "approved_at": created_at + timedelta(minutes=50) if status == "approved" else None,
+        "tokens_earned": 5, "approval_message": None
+    }
+
+
+def datasets(rng):
+    """(route path, documents) as each list endpoint returns them at its limit"""
+    couple_id = str(uuid.uuid4())
+    active = []
+    for _ in range(20):
+        doc = task_doc(rng, couple_id, status="pending")
+        doc.update(time_remaining_minutes=rng.randint(0, 60), is_expired=False)
+        active.append(doc)
+    return [
+        ("/api/tasks", [task_doc(rng, couple_id) for _ in range(20)]),
+        ("/api/tasks/active", active),
+        ("/api/rewards", [{
+            "id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": str(uuid.uuid4()), "title": f"Reward {i}",
+            "description": "Breakfast in bed", "tokens_cost": rng.randint(5, 50), "is_redeemed": rng.random() < 0.3,
+            "redeemed_by": None, "redeemed_at": None, "created_at": NOW - timedelta(days=rng.randint(0, 90))
+        } for i in range(50)]),
+        ("/api/moods", [{
+            "id": str(uuid.uuid4()), "couple_id": couple_id, "user_id": str(uuid.uuid4()), "mood_type": "horny",
+            "intensity": rng.randint(1, 5), "expires_at": NOW + timedelta(hours=1), "created_at": NOW
+        } for _ in range(10)]),
+    ]
+
+
+def response_field(path):
+    for route in server.app.routes:
+        if getattr(route, "path", None) == path and "GET" in route.methods:
+            return route.response_field
+    raise LookupError(path)
+
+
+def cpu_per_call(fn, iterations):
+    fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"🚀 Serialization benchmark: {args.iterations} iterations per case")
+
+    results = []
+    for path, docs in datasets(rng):
+        field = response_field(path)
+
+        def before():
+            return JSONResponse(run_sync(serialize_response(response_content=docs))).body
+
+        def after():
+            return ORJSONResponse(run_sync(serialize_response(field=field, response_content=docs))).body
+
+        assert json.loads(before()) == json.loads(after()), f"{path} responses differ"
+        before_us = cpu_per_call(before, args.iterations) * 1_000_000
+        after_us = cpu_per_call(after, args.iterations) * 1_000_000
+        results.append({
+            "case": f"GET {path}", "items": len(docs), "bytes": len(after()),
+            "before_us": round(before_us, 1), "after_us": round(after_us, 1),
+            "before_us_per_item": round(before_us / len(docs), 2), "after_us_per_item": round(after_us / len(docs), 2),
+            "speedup": round(before_us / after_us, 2)
+        })
+
+    message = {"type": "new_task", "task": task_doc(rng, str(uuid.uuid4())), "message": "New HeatTask assigned: Slow candlelit massage"}
+    assert json.loads(json.dumps(jsonable_encoder(message))) == json.loads(server.encode_message(message))
+    before_us = cpu_per_call(lambda: json.dumps(jsonable_encoder(message)), args.iterations) * 1_000_000
+    after_us = cpu_per_call(lambda: server.encode_message(message), args.iterations) * 1_000_000
+    results.append({
+        "case": "websocket new_task", "items": 1, "bytes": len(server.encode_message(message)),
+        "before_us": round(before_us, 1), "after_us": round(after_us, 1),
+        "before_us_per_item": round(before_us, 2), "after_us_per_item": round(after_us, 2),
+        "speedup": round(before_us / after_us, 2)
+    })
+
+    print(f"\n{'case':26} {'items':>5} {'bytes':>7} {'before µs':>10} {'after µs':>9} {'µs/item':>15} {'speedup':>8}")
+    for r in results:
+        print(f"{r['case']:26} {r['items']:>5} {r['bytes']:>7} {r['before_us']:>10} {r['after_us']:>9} "
+              f"{str(r['before_us_per_item']) + ' → ' + str(r['after_us_per_item']):>15} {r['speedup']:>7}x")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Pulse - Backend Cold Start Benchmark
+Measures, in fresh interpreter processes:
+  - import time of backend/server.py, with the slowest modules from `python -X importtime`
+  - time from spawning uvicorn to the first successful GET /api/health
+
+Exits non-zero when a --max-*-ms budget is exceeded, so it can gate CI.
+
+Usage:
+    python perf/startup_benchmark.py --runs 5 --max-import-ms 1500 --max-ready-ms 4000 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import server; print(time.perf_counter() - t)"
+
+
+def backend_env(mongo_url):
+    env = dict(os.environ)
+    env.setdefault("MONGO_URL", mongo_url)
+    env.setdefault("DB_NAME", "pulse_benchmark")
+    return env
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(env):
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(env, top):
+    """Cumulative import time per top-level package, slowest first"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import server"], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, check=True
+    )
+    packages = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if cumulative.strip().isdigit() and depth == 1:
+            # Only modules imported directly by server; their cumulative time includes children
+            package = name.strip().split(".")[0]
+            packages[package] = packages.get(package, 0) + int(cumulative) / 1000
+    return sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def measure_ready(env, timeout):
+    """Seconds from spawning uvicorn until /api/health answers 200"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}/api/health"
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/api/health not ready after {timeout}s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summarize(samples):
+    return {
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "min_ms": round(min(samples) * 1000, 1),
+        "max_ms": round(max(samples) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mongo-url", default="mongodb://localhost:27017")
+    parser.add_argument("--top", type=int, default=10, help="slowest imported packages to list")
+    parser.add_argument("--ready-timeout", type=float, default=30.0)
+    parser.add_argument("--max-import-ms", type=float, help="fail when the median import time exceeds this")
+    parser.add_argument("--max-ready-ms", type=float, help="fail when the median time to first request exceeds this")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    env = backend_env(args.mongo_url)
+    print(f"🚀 Cold start benchmark: {args.runs} runs, python {sys.version.split()[0]}")
+
+    imports = [measure_import(env) for _ in range(args.runs)]
+    results = {"import": summarize(imports)}
+    print(f"\n📦 import server: median {results['import']['median_ms']}ms "
+          f"(min {results['import']['min_ms']}ms, max {results['import']['max_ms']}ms)")
+
+    results["slowest_imports_ms"] = {name: round(ms, 1) for name, ms in slowest_imports(env, args.top)}
+    for name, ms in results["slowest_imports_ms"].items():
+        print(f"   {ms:8.1f}ms  {name}")
+
+    ready = [measure_ready(env, args.ready_timeout) for _ in range(args.runs)]
+    results["first_request"] = summarize(ready)
+    print(f"\n🌐 spawn → first /api/health 200: median {results['first_request']['median_ms']}ms "
+          f"(min {results['first_request']['min_ms']}ms, max {results['first_request']['max_ms']}ms)")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.json}")
+
+    failures = []
+    if args.max_import_ms and results["import"]["median_ms"] > args.max_import_ms:
+        failures.append(f"import {results['import']['median_ms']}ms > {args.max_import_ms}ms")
+    if args.max_ready_ms and results["first_request"]["median_ms"] > args.max_ready_ms:
+        failures.append(f"first request {results['first_request']['median_ms']}ms > {args.max_ready_ms}ms")
+
+    if failures:
+        print("\n❌ Budget exceeded: " + "; ".join(failures))
+        return 1
+    print("\n✅ Within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+Pulse - Websocket Fan-out Benchmark
+Opens tens of thousands of /ws/{user_id} sockets against a local uvicorn worker in steps,
+and at each step fires POST /api/moods calls whose mood_update notification must reach
+the partner's socket. Per step it measures:
+  - server RSS growth per open connection
+  - delivery latency (request start -> partner socket) p50/p95/p99 and lost messages
+  - server CPU time per notification, including the request that triggered it
+
+Client sockets are spread over several processes and loopback source addresses, so the
+client side and the ephemeral port range are not the bottleneck. Each run is appended to
+a JSON-lines results file and compared with the previous run of the same steps, so
+regressions in ConnectionManager show up as deltas.
+
+Users are seeded straight into Mongo (no bcrypt); tokens are minted with the server's key.
+Linux only: memory and CPU are read from /proc.
+
+Usage:
+    python perf/websocket_benchmark.py --steps 1000,10000,50000,100000 --messages 1000 --client-processes 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).parent.parent / "backend"
+DEFAULT_RESULTS = Path(__file__).parent / "results" / "websocket_fanout.jsonl"
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def user_id(n):
+    return f"wsbench-{n:07d}"
+
+
+def process_usage(pid):
+    """(RSS bytes, CPU seconds) of a process from /proc"""
+    with open(f"/proc/{pid}/status") as status:
+        rss_kb = next(int(line.split()[1]) for line in status if line.startswith("VmRSS:"))
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    return rss_kb * 1024, cpu_seconds
+
+
+def raise_file_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+# Listener processes
+async def listen(conn, url, user_ids, source_hosts, connect_concurrency):
+    import websockets
+
+    sockets, readers, receipts = [], [], {}
+    semaphore = asyncio.Semaphore(connect_concurrency)
+    failures = 0
+
+    async def read(websocket):
+        try:
+            async for text in websocket:
+                received_at = time.monotonic()
+                if '"mood_update"' in text:
+                    receipts[json.loads(text)["mood"]["id"]] = received_at
+        except websockets.ConnectionClosed:
+            pass
+
+    async def open_socket(index):
+        nonlocal failures
+        async with semaphore:
+            try:
+                websocket = await websockets.connect(
+                    f"{url}/ws/{user_ids[index]}", local_addr=(source_hosts[index % len(source_hosts)], 0),
+                    open_timeout=60, ping_interval=None, max_size=None
+                )
+            except Exception:
+                failures += 1
+                return
+            sockets.append(websocket)
+            readers.append(asyncio.create_task(read(websocket)))
+
+    opened = 0
+    while True:
+        command, argument = await asyncio.to_thread(conn.recv)
+        if command == "open":
+            await asyncio.gather(*(open_socket(i) for i in range(opened, argument)))
+            opened = argument
+            conn.send((len(sockets), failures))
+        elif command == "collect":
+            conn.send(receipts)
+            receipts = {}
+        elif command == "stop":
+            await asyncio.gather(*(s.close() for s in sockets), return_exceptions=True)
+            for reader in readers:
+                reader.cancel()
+            conn.send(True)
+            return
+
+
+def listener_process(conn, url, user_ids, source_hosts, connect_concurrency):
+    raise_file_limit()
+    asyncio.run(listen(conn, url, user_ids, source_hosts, connect_concurrency))
+
+
+# Server and data
+async def seed_users(args, total_users):
+    """Couples (2n, 2n + 1) inserted directly, with the server's indexes"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+    import server
+
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db]
+    await client.drop_database(args.db)
+    now = datetime.utcnow()
+    for start in range(0, total_users, 10000):
+        users, couples = [], []
+        for n in range(start, min(total_users, start + 10000), 2):
+            couple_id = f"wsbench-couple-{n // 2:07d}"
+            couples.append({"id": couple_id, "user1_id": user_id(n), "user2_id": user_id(n + 1), "pairing_code": f"{n // 2:06X}", "created_at": now})
+            for m in (n, n + 1):
+                users.append({"id": user_id(m), "email": f"{user_id(m)}@pulse.test", "name": f"Bench {m}", "password_hash": "x",
+                              "couple_id": couple_id, "boundaries": [], "created_at": now})
+        await db.users.insert_many(users, ordered=False)
+        await db.couples.insert_many(couples, ordered=False)
+    for collection, keys, options in server.DATABASE_INDEXES:
+        await db[collection].create_index(keys, **options)
+    client.close()
+
+
+def start_server(args, port):
+    env = dict(os.environ, MONGO_URL=args.mongo_url, DB_NAME=args.db, AI_SUGGESTION_SOURCE="catalog")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--ws", "websockets", "--backlog", "65535", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Server did not become healthy within 60s")
+
+
+# Benchmark steps
+async def fire_moods(args, base_url, connected_couples, rng):
+    """POST moods for random connected couples at a fixed rate; returns {mood_id: sent_at} and HTTP latencies"""
+    import httpx
+    import server
+
+    sent, http_latencies = {}, []
+    semaphore = asyncio.Semaphore(args.request_concurrency)
+
+    async def one(client, couple):
+        async with semaphore:
+            headers = {"Authorization": f"Bearer {server.create_access_token({'sub': user_id(couple * 2)})}"}
+            started = time.monotonic()
+            response = await client.post("/api/moods", headers=headers, json={"mood_type": "romantic", "intensity": 2})
+            http_latencies.append(time.monotonic() - started)
+            if response.status_code == 200:
+                sent[response.json()["mood"]["id"]] = started
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=args.request_concurrency)) as client:
+        tasks = []
+        for _ in range(args.messages):
+            tasks.append(asyncio.create_task(one(client, rng.randrange(connected_couples))))
+            await asyncio.sleep(1 / args.rate)
+        await asyncio.gather(*tasks)
+    return sent, http_latencies
+
+
+async def run_step(args, step, pipes, base_url, server_pid, baseline_rss, rng):
+    counts = [len(range(i, step, len(pipes))) for i in range(len(pipes))]
+    start = time.monotonic()
+    for pipe, count in zip(pipes, counts):
+        pipe.send(("open", count))
+    replies = [await asyncio.to_thread(pipe.recv) for pipe in pipes]
+    connections = sum(r[0] for r in replies)
+    connect_seconds = time.monotonic() - start
+    await asyncio.sleep(args.settle_seconds)
+
+    rss, cpu_before = process_usage(server_pid)
+    sent, http_latencies = await fire_moods(args, base_url, step // 2, rng)
+    await asyncio.sleep(args.settle_seconds)
+    _, cpu_after = process_usage(server_pid)
+
+    receipts = {}
+    for pipe in pipes:
+        pipe.send(("collect", None))
+        receipts.update(await asyncio.to_thread(pipe.recv))
+    latencies = [receipts[mood_id] - started for mood_id, started in sent.items() if mood_id in receipts]
+
+    result = {
+        "connections": connections,
+        "connect_failures": sum(r[1] for r in replies),
+        "connect_seconds": round(connect_seconds, 2),
+        "server_rss_mb": round(rss / 1024 / 1024, 1),
+        "kb_per_connection": round((rss - baseline_rss) / 1024 / max(connections, 1), 2),
+        "messages": len(sent),
+        "lost": len(sent) - len(latencies),
+        "cpu_ms_per_message": round((cpu_after - cpu_before) * 1000 / max(len(sent), 1), 3),
+        "http_p50_ms": round(percentile(http_latencies, 0.5) * 1000, 2) if http_latencies else None,
+    }
+    if latencies:
+        result.update({f"delivery_p{q}_ms": round(percentile(latencies, q / 100) * 1000, 2) for q in (50, 95, 99)})
+    return result
+
+
+def compare_with_previous(results_path, run, threshold):
+    """Print deltas against the last stored run with the same steps; returns regressed metrics"""
+    if not results_path.exists():
+        return []
+    previous = None
+    for line in results_path.read_text().splitlines():
+        entry = json.loads(line)
+        if entry["params"]["steps"] == run["params"]["steps"] and entry["params"]["messages"] == run["params"]["messages"]:
+            previous = entry
+    if previous is None:
+        return []
+
+    print(f"\n📈 Compared with {previous['commit']} ({previous['timestamp']})")
+    regressions = []
+    for before, after in zip(previous["steps"], run["steps"]):
+        for metric in ("kb_per_connection", "delivery_p95_ms", "cpu_ms_per_message"):
+            if not before.get(metric) or after.get(metric) is None:
+                continue
+            change = (after[metric] - before[metric]) / before[metric]
+            flag = "❌" if change > threshold else "  "
+            print(f"   {flag} {after['connections']:>7} sockets  {metric:20} {before[metric]:>10} -> {after[metric]:<10} ({change:+.0%})")
+            if change > threshold:
+                regressions.append(f"{metric} at {after['connections']} sockets")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="1000,10000", help="comma-separated socket counts")
+    parser.add_argument("--messages", type=int, default=500, help="notifications fired per step")
+    parser.add_argument("--rate", type=float, default=200, help="notifications per second")
+    parser.add_argument("--request-concurrency", type=int, default=50)
+    parser.add_argument("--client-processes", type=int, default=max(1, min(8, (os.cpu_count() or 2) // 2)))
+    parser.add_argument("--source-hosts", type=int, default=8, help="loopback source addresses 127.0.0.2..N+1")
+    parser.add_argument("--connect-concurrency", type=int, default=500, help="concurrent handshakes per client process")
+    parser.add_argument("--settle-seconds", type=float, default=2.0)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db", default="pulse_ws_benchmark")
+    parser.add_argument("--url", help="use a running server instead of spawning one (requires --server-pid)")
+    parser.add_argument("--server-pid", type=int, help="pid of the server given by --url, for memory and CPU readings")
+    parser.add_argument("--skip-seed", action="store_true", help="the wsbench-* users already exist")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--results", type=Path, default=DEFAULT_RESULTS, help="JSON-lines history of runs")
+    parser.add_argument("--regression-threshold", type=float, default=0.2)
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    steps = sorted(int(s) // 2 * 2 for s in args.steps.split(","))
+    os.environ.setdefault("MONGO_URL", args.mongo_url)
+    os.environ.setdefault("DB_NAME", args.db)
+    import server  # noqa: F401  configures logging; keep per-request client logs out of the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(f"🔓 File descriptor limit raised to {raise_file_limit()}")
+
+    if not args.skip_seed:
+        start = time.monotonic()
+        await seed_users(args, steps[-1])
+        print(f"🌱 Seeded {steps[-1]:,} users in {time.monotonic() - start:.1f}s")
+
+    server_process = None
+    if args.url:
+        base_url, server_pid = args.url.rstrip("/"), args.server_pid
+    else:
+        port = socket.socket()
+        port.bind(("127.0.0.1", 0))
+        port_number = port.getsockname()[1]
+        port.close()
+        server_process = start_server(args, port_number)
+        base_url, server_pid = f"http://127.0.0.1:{port_number}", server_process.pid
+    ws_url = base_url.replace("http", "ws", 1)
+
+    baseline_rss, _ = process_usage(server_pid)
+    print(f"🚀 Server pid {server_pid} at {base_url}, baseline RSS {baseline_rss / 1024 / 1024:.1f}MB, "
+          f"{args.client_processes} client processes")
+
+    source_hosts = [f"127.0.0.{i + 2}" for i in range(args.source_hosts)]
+    all_users = [user_id(n) for n in range(steps[-1])]
+    pipes, processes = [], []
+    context = multiprocessing.get_context("spawn")
+    for i in range(args.client_processes):
+        parent, child = context.Pipe()
+        process = context.Process(target=listener_process, daemon=True, args=(
+            child, ws_url, all_users[i::args.client_processes], source_hosts, args.connect_concurrency
+        ))
+        process.start()
+        pipes.append(parent)
+        processes.append(process)
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"\n{'sockets':>8} {'fail':>5} {'rss MB':>8} {'KB/conn':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'lost':>5} {'cpu ms/msg':>10}")
+    try:
+        for step in steps:
+            result = await run_step(args, step, pipes, base_url, server_pid, baseline_rss, rng)
+            results.append(result)
+            print(f"{result['connections']:>8} {result['connect_failures']:>5} {result['server_rss_mb']:>8} "
+                  f"{result['kb_per_connection']:>8} {result.get('delivery_p50_ms', '-'):>8} {result.get('delivery_p95_ms', '-'):>8} "
+                  f"{result.get('delivery_p99_ms', '-'):>8} {result['lost']:>5} {result['cpu_ms_per_message']:>10}")
+    finally:
+        for pipe in pipes:
+            pipe.send(("stop", None))
+        for pipe, process in zip(pipes, processes):
+            pipe.recv()
+            process.join(timeout=10)
+        if server_process:
+            server_process.terminate()
+            server_process.wait()
+
+    commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BACKEND_DIR).stdout.strip()
+    run = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": commit or "unknown",
+        "params": {"steps": steps, "messages": args.messages, "rate": args.rate, "client_processes": args.client_processes},
+        "steps": results,
+    }
+    regressions = compare_with_previous(args.results, run, args.regression_threshold)
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    with args.results.open("a") as history:
+        history.write(json.dumps(run) + "\n")
+    print(f"\n💾 Appended to {args.results}")
+
+    if regressions:
+        print("❌ Regressions: " + "; ".join(regressions))
+        if args.fail_on_regression:
+            sys.exit(1)
+    else:
+        print("✅ No regressions against the previous run")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
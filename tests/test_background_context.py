@@ -0,0 +1,52 @@
+"""
+Background work started from a request must not inherit the request's DB-time accumulator
+or log correlation, or its Mongo time is added to a request whose metrics were already
+recorded. The active span is the one thing it keeps, so its spans join the request's trace.
+"""
+
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_tests")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+def run_from_request(span):
+    """Start a background job the way a handler does and return what it saw"""
+    seen = {}
+
+    async def job():
+        seen["db_time"] = server.request_db_time.get()
+        seen["log_context"] = server.log_context.get()
+        seen["span"] = server.current_span.get()
+
+    async def request():
+        server.request_db_time.set({"path": "/api/moods", "seconds": 0.0, "operations": 0})
+        server.log_context.set({"request_id": "abc"})
+        server.current_span.set(span)
+        await server.run_in_background(job())
+        # The request's own context is untouched
+        assert server.request_db_time.get()["path"] == "/api/moods"
+        assert server.current_span.get() is span
+
+    asyncio.run(request())
+    return seen
+
+
+def test_background_job_does_not_inherit_request_state():
+    seen = run_from_request(None)
+    assert seen["db_time"] is None
+    assert seen["log_context"] is None
+    assert seen["span"] is None
+
+
+def test_background_job_keeps_the_trace_link():
+    span = server.Span("POST /api/moods", "a" * 32)
+    seen = run_from_request(span)
+    assert seen["db_time"] is None
+    assert seen["span"] is span
@@ -0,0 +1,178 @@
+"""
+Micro-benchmarks for the helpers on every request path, with Motor replaced by an in-memory
+fake so only the helper's own cost is measured.
+
+Each benchmark records ops/sec through pytest-benchmark and peak bytes allocated per call
+through tracemalloc (shown in extra_info). Peak allocations are checked against the
+committed perf/results/hot_path_allocations.json, and a benchmark missing from it is
+reported as a warning; run with UPDATE_ALLOCATION_BASELINE=1 to rewrite it.
+
+Timing depends on the machine, so timing baselines are not committed; save one on the
+machine that will compare against it, using pytest-benchmark's own storage:
+
+    pytest tests/test_hot_path_benchmarks.py --benchmark-storage=perf/results/benchmarks --benchmark-autosave
+    pytest tests/test_hot_path_benchmarks.py --benchmark-storage=perf/results/benchmarks \\
+        --benchmark-compare --benchmark-compare-fail=mean:15%
+"""
+
+import json
+import os
+import sys
+import tracemalloc
+import warnings
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_benchmarks")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+from fastapi.security import HTTPAuthorizationCredentials  # noqa: E402
+
+ALLOCATION_BASELINE = Path(__file__).parent.parent / "perf" / "results" / "hot_path_allocations.json"
+ALLOCATION_TOLERANCE = 1.25
+
+USER = {"id": "user-a", "email": "a@pulse.test", "name": "A", "couple_id": "couple-1", "boundaries": ["no photos"]}
+PARTNER = {"id": "user-b", "email": "b@pulse.test", "name": "B", "couple_id": "couple-1", "boundaries": []}
+
+
+class FakeCollection:
+    """find_one over an in-memory dict keyed by id, returning copies like Motor does"""
+    def __init__(self, docs):
+        self.docs = {doc["id"]: doc for doc in docs}
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query.get("id"))
+        return dict(doc) if doc else None
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.users = FakeCollection([USER, PARTNER])
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = 0
+
+    async def send_text(self, message):
+        self.sent += 1
+
+
+def run_sync(coro):
+    """Drive a coroutine that never suspends (true with the fakes) without an event loop"""
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    raise RuntimeError("coroutine suspended; the fake Motor layer should complete immediately")
+
+
+def peak_bytes_per_call(fn, calls=200, repeats=5):
+    """
+    Peak traced bytes over `calls` calls, lowest of `repeats` runs: tracemalloc also counts
+    allocations from other threads (the log writer), which only ever add to a run's peak
+    """
+    fn()  # warm caches so one-off allocations are not counted
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeats):
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            for _ in range(calls):
+                fn()
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(max(0, peak - base))
+    finally:
+        tracemalloc.stop()
+    return min(peaks)
+
+
+@pytest.fixture(scope="module")
+def allocation_results():
+    results = {}
+    yield results
+    if os.environ.get("UPDATE_ALLOCATION_BASELINE"):
+        ALLOCATION_BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        ALLOCATION_BASELINE.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+@pytest.fixture
+def measure(benchmark, allocation_results, request):
+    """Benchmark fn and check its peak allocation against the stored baseline"""
+    def run(fn):
+        name = request.node.name
+        peak = peak_bytes_per_call(fn)
+        allocation_results[name] = peak
+        benchmark.extra_info["peak_bytes_200_calls"] = peak
+        result = benchmark(fn)
+
+        if not os.environ.get("UPDATE_ALLOCATION_BASELINE"):
+            baseline = json.loads(ALLOCATION_BASELINE.read_text()).get(name) if ALLOCATION_BASELINE.exists() else None
+            if baseline is None:
+                warnings.warn(f"{name} has no allocation baseline in {ALLOCATION_BASELINE}, so its peak was not checked; "
+                              "run with UPDATE_ALLOCATION_BASELINE=1 to record one")
+            else:
+                assert peak <= baseline * ALLOCATION_TOLERANCE, f"{name} peak allocation {peak}B exceeds baseline {baseline}B"
+        return result
+    return run
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    monkeypatch.setattr(server, "db", FakeDatabase())
+
+
+@pytest.fixture
+def token():
+    return server.create_access_token({"sub": USER["id"]})
+
+
+def test_create_access_token(measure):
+    assert measure(lambda: server.create_access_token({"sub": USER["id"]}))
+
+
+def test_jwt_decode(measure, token):
+    payload = measure(lambda: server.jwt.decode(token, server.SECRET_KEY, algorithms=[server.ALGORITHM]))
+    assert payload["sub"] == USER["id"]
+
+
+def test_get_current_user(measure, fake_db, token):
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    user = measure(lambda: run_sync(server.get_current_user(credentials)))
+    assert user["id"] == USER["id"]
+
+
+def test_send_to_partner(measure, fake_db):
+    manager = server.ConnectionManager()
+    partner_socket = FakeWebSocket()
+    manager.active_connections[PARTNER["id"]] = partner_socket
+    manager.couple_connections[USER["couple_id"]] = [USER["id"], PARTNER["id"]]
+    task = server.Task(couple_id="couple-1", creator_id=USER["id"], receiver_id=PARTNER["id"], title="T", description="D",
+                       duration_minutes=60, expires_at=server.datetime.utcnow())
+    message = {"type": "new_task", "task": task.dict(), "message": "New HeatTask assigned: T"}
+
+    measure(lambda: run_sync(manager.send_to_partner(USER["id"], message)))
+    assert partner_socket.sent > 0
+
+
+def test_task_dict(measure):
+    expires_at = server.datetime.utcnow()
+
+    def build():
+        return server.Task(
+            couple_id="couple-1", creator_id=USER["id"], receiver_id=PARTNER["id"], title="Slow candlelit massage",
+            description="Take your time", duration_minutes=60, expires_at=expires_at
+        ).dict()
+
+    assert measure(build)["status"] == "pending"
+
+
+def test_get_mock_ai_suggestion(measure):
+    suggestion = measure(lambda: server.get_mock_ai_suggestion("horny", 3, ["no photos"]))
+    assert suggestion["title"]
@@ -0,0 +1,188 @@
+"""
+Query-plan regression suite for the Mongo queries in backend/server.py.
+
+Each handler's query shape is run through explain() against a local mongod loaded with a
+generated dataset, using the indexes declared in server.DATABASE_INDEXES. A shape fails
+when its winning plan contains a COLLSCAN or a blocking in-memory SORT, or when a shape
+marked as covered fetches documents. Keys and documents examined per returned document
+are printed for every shape (run with -s), and written as JSON to QUERY_PLAN_REPORT if set.
+
+Requires a mongod at MONGO_URL (default mongodb://localhost:27017); skipped otherwise.
+The dataset only carries DATABASE_INDEXES, so a change to that list should come with the
+report from a run against it:
+
+    QUERY_PLAN_REPORT=perf/results/query_plans.json pytest tests/test_query_plans.py -s
+"""
+
+import json
+import os
+import random
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = "pulse_query_plans"
+
+os.environ.setdefault("MONGO_URL", MONGO_URL)
+os.environ.setdefault("DB_NAME", DB_NAME)
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+pymongo = pytest.importorskip("pymongo")
+import server  # noqa: E402
+
+SEED = 1234
+COUPLES = 1000
+NOW = datetime.utcnow()
+
+
+def build_dataset(db):
+    """Couples with a skewed number of tasks, moods and rewards; returns sample ids for the shapes"""
+    rng = random.Random(SEED)
+    users, couples, tasks, moods, rewards, tokens = [], [], [], [], [], []
+
+    for i in range(COUPLES):
+        couple_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        pair = [str(uuid.UUID(int=rng.getrandbits(128))) for _ in range(2)]
+        couples.append({"id": couple_id, "user1_id": pair[0], "user2_id": pair[1], "pairing_code": f"C{i:05d}", "created_at": NOW})
+        for n, user_id in enumerate(pair):
+            users.append({"id": user_id, "email": f"user{i}_{n}@example.com", "name": f"User {i}", "password_hash": "x", "couple_id": couple_id, "boundaries": []})
+            tokens.append({"id": str(uuid.uuid4()), "couple_id": couple_id, "user_id": user_id, "tokens": rng.randint(0, 200), "lifetime_tokens": 500})
+
+        # Pareto-distributed activity: a few couples hold most of the tasks
+        for t in range(min(3000, int(rng.paretovariate(1.2) * 3))):
+            created_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 90))
+            tasks.append({
+                "id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": pair[t % 2], "receiver_id": pair[1 - t % 2],
+                "title": f"Task {t}", "description": "Do something nice", "duration_minutes": 60,
+                "status": rng.choices(["pending", "completed", "approved", "rejected", "expired"], [2, 1, 5, 1, 3])[0],
+                "created_at": created_at, "expires_at": created_at + timedelta(hours=rng.choice([1, 24, 24 * 120])),
+                "tokens_earned": 5
+            })
+        for m in range(int(rng.paretovariate(1.5) * 2)):
+            created_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 30))
+            moods.append({"id": str(uuid.uuid4()), "couple_id": couple_id, "user_id": pair[m % 2], "mood_type": "horny",
+                          "intensity": 3, "created_at": created_at, "expires_at": created_at + timedelta(hours=rng.choice([1, 24 * 60]))})
+        for r in range(int(rng.paretovariate(2.0))):
+            rewards.append({"id": str(uuid.uuid4()), "couple_id": couple_id, "creator_id": pair[r % 2], "title": f"Reward {r}",
+                            "description": "A treat", "tokens_cost": 10, "is_redeemed": rng.random() < 0.3,
+                            "created_at": NOW - timedelta(days=rng.randint(0, 90))})
+
+    for name, docs in [("users", users), ("couples", couples), ("tasks", tasks), ("moods", moods), ("rewards", rewards), ("user_tokens", tokens)]:
+        db[name].insert_many(docs)
+    db.pairing_codes.insert_many([
+        {"code": f"P{i:05d}", "user_id": users[i]["id"], "created_at": NOW, "expires_at": NOW + timedelta(days=1)} for i in range(0, len(users), 7)
+    ])
+    db.ai_suggestion_jobs.insert_many([{"id": str(uuid.uuid4()), "status": "ready", "created_at": NOW} for _ in range(500)])
+    db.ai_suggestion_cache.insert_many([{"key": f"key{i}", "variants": [], "generated": 5, "expires_at": NOW + timedelta(days=7)} for i in range(500)])
+    db.schema_migrations.insert_many([{"version": v, "status": "applied"} for v in range(1, 4)])
+
+    # The busiest couple is the worst case for every per-couple query
+    task_counts = Counter(t["couple_id"] for t in tasks)
+    heavy_couple = max(couples, key=lambda c: task_counts[c["id"]])
+    return {
+        "couple_id": heavy_couple["id"],
+        "user_id": heavy_couple["user1_id"],
+        "email": users[0]["email"],
+        "task_id": next(t["id"] for t in tasks if t["couple_id"] == heavy_couple["id"]),
+        "reward_id": rewards[0]["id"],
+        "reward_couple_id": rewards[0]["couple_id"],
+        "pairing_code": "P00007",
+        "pairing_user_id": users[7]["id"],
+        "job_id": "missing-job",
+    }
+
+
+# name -> (collection, filter, projection, sort, limit, covered); find_one shapes use limit 1.
+# Update and delete filters that match a find shape here share its plan.
+QUERY_SHAPES = {
+    "get_current_user": lambda s: ("users", {"id": s["user_id"]}, {"_id": 0}, None, 1, False),
+    "login_by_email": lambda s: ("users", {"email": s["email"]}, {"_id": 0}, None, 1, False),
+    "partner_lookup": lambda s: ("users", {"couple_id": s["couple_id"], "id": {"$ne": s["user_id"]}}, {"_id": 0}, None, 1, False),
+    "pairing_code_by_user": lambda s: ("pairing_codes", {"user_id": s["pairing_user_id"], "expires_at": {"$gt": NOW}}, {"_id": 0, "code": 1}, None, 1, False),
+    "pairing_link_by_code": lambda s: ("pairing_codes", {"code": s["pairing_code"], "expires_at": {"$gt": NOW}}, {"_id": 0}, None, 1, False),
+    "user_tokens": lambda s: ("user_tokens", {"user_id": s["user_id"], "couple_id": s["couple_id"]}, {"_id": 0}, None, 1, False),
+    "couple_tokens": lambda s: ("user_tokens", {"couple_id": s["couple_id"]}, {"_id": 0}, None, 2, False),
+    "suggestion_cache": lambda s: ("ai_suggestion_cache", {"key": "key1"}, {"_id": 0}, None, 1, False),
+    "suggestion_job": lambda s: ("ai_suggestion_jobs", {"id": s["job_id"]}, {"_id": 0}, None, 1, False),
+    "active_moods": lambda s: ("moods", {"couple_id": s["couple_id"], "expires_at": {"$gt": NOW}}, {"_id": 0}, [("created_at", -1)], 10, False),
+    "task_history": lambda s: ("tasks", {"couple_id": s["couple_id"]}, {"_id": 0}, [("created_at", -1)], 20, False),
+    "retrieval_index_load": lambda s: ("tasks", {"couple_id": s["couple_id"]}, {"_id": 0, "id": 1, "title": 1, "description": 1, "duration_minutes": 1, "status": 1}, [("created_at", -1)], 500, False),
+    "task_by_id": lambda s: ("tasks", {"id": s["task_id"]}, {"_id": 0}, None, 1, False),
+    "active_tasks": lambda s: ("tasks", {"couple_id": s["couple_id"], "status": {"$in": ["pending", "completed"]}, "expires_at": {"$gt": NOW}}, {"_id": 0}, [("created_at", -1)], 20, False),
+    "expired_pending_tasks": lambda s: ("tasks", {"couple_id": s["couple_id"], "status": "pending", "expires_at": {"$lt": NOW}}, {"_id": 0}, None, 100, False),
+    "rewards": lambda s: ("rewards", {"couple_id": s["couple_id"]}, {"_id": 0}, [("created_at", -1)], 50, False),
+    "reward_by_id": lambda s: ("rewards", {"id": s["reward_id"], "couple_id": s["reward_couple_id"]}, {"_id": 0}, None, 1, False),
+    "applied_migrations": lambda s: ("schema_migrations", {"status": "applied"}, {"_id": 0, "version": 1}, None, 0, False),
+}
+
+
+def plan_stages(plan):
+    """Every stage name in an explain plan tree, for classic and slot-based engine output"""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("queryPlan", "inputStage", "outerStage", "innerStage"):
+        if key in plan:
+            stages += plan_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        stages += plan_stages(child)
+    return stages
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    client = pymongo.MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except pymongo.errors.PyMongoError:
+        pytest.skip(f"No mongod reachable at {MONGO_URL}")
+
+    client.drop_database(DB_NAME)
+    db = client[DB_NAME]
+    samples = build_dataset(db)
+    for collection, keys, options in server.DATABASE_INDEXES:
+        db[collection].create_index(keys, **options)
+
+    report = {}
+    yield db, samples, report
+
+    for name, row in report.items():
+        print(f"{name:24} {row['winning_stages']:60} returned={row['returned']:<4} "
+              f"keys/doc={row['keys_per_returned']:<7} docs/doc={row['docs_per_returned']}")
+    if os.environ.get("QUERY_PLAN_REPORT"):
+        report_path = Path(os.environ["QUERY_PLAN_REPORT"])
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_path.write_text(json.dumps(report, indent=2))
+    client.drop_database(DB_NAME)
+    client.close()
+
+
+@pytest.mark.parametrize("name", list(QUERY_SHAPES))
+def test_query_uses_index(name, dataset):
+    db, samples, report = dataset
+    collection, query, projection, sort, limit, covered = QUERY_SHAPES[name](samples)
+
+    cursor = db[collection].find(query, projection).limit(limit)
+    if sort:
+        cursor = cursor.sort(sort)
+    explain = cursor.explain()
+
+    stages = plan_stages(explain["queryPlanner"]["winningPlan"])
+    stats = explain["executionStats"]
+    returned = stats["nReturned"]
+    report[name] = {
+        "winning_stages": " <- ".join(stages),
+        "returned": returned,
+        "keys_examined": stats["totalKeysExamined"],
+        "docs_examined": stats["totalDocsExamined"],
+        "keys_per_returned": round(stats["totalKeysExamined"] / max(returned, 1), 2),
+        "docs_per_returned": round(stats["totalDocsExamined"] / max(returned, 1), 2),
+    }
+
+    assert "COLLSCAN" not in stages, f"{name} scans {collection}: {stages}"
+    assert "SORT" not in stages, f"{name} sorts in memory: {stages}"
+    if covered:
+        assert stats["totalDocsExamined"] == 0, f"{name} should be covered by an index but fetched documents: {stages}"
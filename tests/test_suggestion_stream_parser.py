@@ -0,0 +1,110 @@
+"""
+Unit tests for SuggestionStreamParser, the incremental JSON scanner behind streamed AI
+suggestions. Every payload is fed whole, split at each offset, and in seeded random chunks;
+the concatenated deltas for each streamed field must equal what json.loads decodes.
+"""
+
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_tests")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+
+PAYLOADS = {
+    "plain": '{"title": "Slow massage", "description": "Take your time", "default_duration_minutes": 30}',
+    "escapes": r'{"title": "Say \"please\"", "description": "Line one\nline two\t\\ back\/slash", "default_duration_minutes": 15}',
+    "unicode_escapes": r'{"title": "Caf\u00e9 date", "description": "Kiss \ud83d\ude18 then \ud83d\udd25", "default_duration_minutes": 20}',
+    "raw_unicode": '{"title": "Café 🔥", "description": "Blow a kiss 😘", "default_duration_minutes": 20}',
+    "nested_before": '{"meta": {"title": "not this", "tags": ["a\\"}", "{b"]}, "score": 3, "title": "After nested", '
+                     '"description": "Still found", "default_duration_minutes": 45}',
+    "nested_after": '{"title": "First", "extra": [1, {"description": "ignored"}, "x]"], "description": "Second", "ok": true}',
+    "surrounding_text": 'Here you go:\n```json\n{"title": "Wrapped", "description": "In a fence"}\n```',
+    "escaped_key": r'{"ti\u0074le": "Escaped key", "descr\u0069ption": "Works"}',
+}
+
+
+def feed_chunks(chunks):
+    parser = server.SuggestionStreamParser()
+    streamed = {}
+    for chunk in chunks:
+        for field, delta in parser.feed(chunk):
+            streamed[field] = streamed.get(field, "") + delta
+    return parser, streamed
+
+
+def expected_fields(payload):
+    start, end = payload.find("{"), payload.rfind("}")
+    decoded = json.loads(payload[start:end + 1])
+    return {field: decoded[field] for field in server.SuggestionStreamParser.STREAMED_FIELDS if field in decoded}
+
+
+def chunkings(payload, rng, count=100):
+    yield [payload]
+    yield list(payload)
+    for offset in range(1, len(payload)):
+        yield [payload[:offset], payload[offset:]]
+    for _ in range(count):
+        cuts = sorted(rng.sample(range(1, len(payload)), min(len(payload) - 1, rng.randint(1, 12))))
+        yield [payload[a:b] for a, b in zip([0] + cuts, cuts + [len(payload)])]
+
+
+@pytest.mark.parametrize("name", sorted(PAYLOADS))
+def test_deltas_match_json_for_any_chunking(name):
+    payload = PAYLOADS[name]
+    expected = expected_fields(payload)
+    rng = random.Random(name)
+    for chunks in chunkings(payload, rng):
+        parser, streamed = feed_chunks(chunks)
+        assert streamed == expected, chunks
+        assert parser.state == "done"
+
+
+@pytest.mark.parametrize("name", sorted(PAYLOADS))
+def test_result_parses_whole_object(name):
+    parser, _ = feed_chunks([PAYLOADS[name]])
+    start, end = PAYLOADS[name].find("{"), PAYLOADS[name].rfind("}")
+    assert parser.result() == json.loads(PAYLOADS[name][start:end + 1])
+
+
+def test_surrogate_pairs_are_joined_and_encodable():
+    payload = PAYLOADS["unicode_escapes"]
+    for offset in range(1, len(payload)):
+        _, streamed = feed_chunks([payload[:offset], payload[offset:]])
+        assert streamed["description"] == "Kiss \U0001f618 then \U0001f525"
+        server.encode_message({"type": "ai_suggestion_delta", "delta": streamed["description"]})
+
+
+@pytest.mark.parametrize("escaped, decoded", [
+    (r"\ud83d", "\ufffd"),
+    (r"\ud83d!", "\ufffd!"),
+    (r"\ud83d\n", "\ufffd\n"),
+    (r"\ud83d\u00e9", "\ufffd\u00e9"),
+    (r"\ude18", "\ufffd"),
+    (r"\ud83d\ud83d\ude18", "\ufffd\U0001f618"),
+])
+def test_unpaired_surrogates_become_replacement_characters(escaped, decoded):
+    _, streamed = feed_chunks(['{"title": "', escaped, '", "description": "x"}'])
+    assert streamed["title"] == decoded
+    assert streamed["description"] == "x"
+    server.encode_message({"delta": streamed["title"]})
+
+
+def test_incomplete_stream_yields_partial_deltas_and_no_result():
+    parser, streamed = feed_chunks(['{"title": "Half', ' a title", "descrip'])
+    assert streamed == {"title": "Half a title"}
+    assert parser.state != "done"
+    assert parser.result() is None
+
+
+def test_text_after_object_is_ignored():
+    parser, streamed = feed_chunks(['{"title": "Done"} {"title": "again"}'])
+    assert streamed == {"title": "Done"}
+    assert parser.state == "done"
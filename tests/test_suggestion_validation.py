@@ -0,0 +1,48 @@
+"""
+Unit tests for clean_suggestion, which every LLM suggestion passes before it is served,
+cached, pooled or stored on a job. Anything it returns must fit the AISuggestion model.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "pulse_tests")
+sys.path.insert(0, str(Path(__file__).parent.parent / "backend"))
+
+import server  # noqa: E402
+
+
+@pytest.mark.parametrize("duration, minutes", [(30, 30), (30.0, 30), (29.6, 30), ("45", 45), (" 15 ", 15), ("20.4", 20)])
+def test_duration_is_coerced_to_whole_minutes(duration, minutes):
+    cleaned = server.clean_suggestion({"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": duration})
+    assert cleaned == {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": minutes}
+    server.AISuggestion(**cleaned)
+
+
+@pytest.mark.parametrize("suggestion", [
+    None,
+    ["title", "description", "default_duration_minutes"],
+    {"title": "Slow dance", "description": "In the kitchen"},
+    {"title": None, "description": "In the kitchen", "default_duration_minutes": 30},
+    {"title": "  ", "description": "In the kitchen", "default_duration_minutes": 30},
+    {"title": "Slow dance", "description": {"text": "nested"}, "default_duration_minutes": 30},
+    {"title": "Slow dance", "description": 42, "default_duration_minutes": 30},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": None},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": True},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": "half an hour"},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": "nan"},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": "inf"},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": 0},
+    {"title": "Slow dance", "description": "In the kitchen", "default_duration_minutes": [30]},
+])
+def test_unusable_suggestions_are_rejected(suggestion):
+    assert server.clean_suggestion(suggestion) is None
+
+
+def test_extra_fields_are_dropped():
+    cleaned = server.clean_suggestion({"title": "T", "description": "D", "default_duration_minutes": 10, "reasoning": "..."})
+    assert set(cleaned) == {"title", "description", "default_duration_minutes"}